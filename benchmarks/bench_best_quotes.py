@@ -0,0 +1,78 @@
+"""
+N 个市场的最优价差：两两组合 vs BestQuotes
+
+两两组合为每个 base/quote 维护 N(N-1)/2 条交易对记录，一次行情更新要重算
+该市场参与的 N-1 个组合；BestQuotes 只维护一份有序的买一/卖一。
+两种方式每次更新后都取出该 base/quote 的最大价差。
+
+    python benchmarks/bench_best_quotes.py
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from seekoptrader.arbitrage.spread.monitor.best import BestQuotes
+
+
+def pairwise_best(bid, ask, pairs):
+    best = None
+    for i, j in pairs:
+        for b, a in ((bid[i], ask[j]), (bid[j], ask[i])):
+            if b and a:
+                spread_pct = (b - a) / a
+                if best is None or spread_pct > best:
+                    best = spread_pct
+    return best
+
+
+def bench(venues, updates=20_000):
+    rng = random.Random(venues)
+    ticks = []
+    for _ in range(updates):
+        mid = rng.uniform(99, 101)
+        ticks.append((rng.randrange(venues), mid - 0.05, mid + 0.05))
+
+    pairs = [(i, j) for i in range(venues) for j in range(i + 1, venues)]
+    venue_pairs = [[p for p in pairs if v in p] for v in range(venues)]
+    bid, ask = [0.0] * venues, [0.0] * venues
+    pairwise = {p: None for p in pairs}
+    start = time.perf_counter()
+    for venue, b, a in ticks:
+        bid[venue], ask[venue] = b, a
+        # 只重算该市场参与的组合，再在全部组合中取最大值
+        for i, j in venue_pairs[venue]:
+            pairwise[i, j] = pairwise_best(bid, ask, ((i, j),))
+        expected = max((v for v in pairwise.values() if v is not None), default=None)
+    pairwise_cost = time.perf_counter() - start
+
+    quotes = BestQuotes([f"venue{i}" for i in range(venues)])
+    start = time.perf_counter()
+    for venue, b, a in ticks:
+        quotes.update(venue, b, a, 0.0)
+        best = quotes.best()
+    best_cost = time.perf_counter() - start
+
+    assert abs(best[0] - expected) < 1e-12
+    return {
+        "venues": venues,
+        "pairwise_us": pairwise_cost / updates * 1e6,
+        "best_us": best_cost / updates * 1e6,
+    }
+
+
+def main():
+    print(f"{'venues':>8} {'pairwise':>12} {'best quotes':>12} {'speedup':>8}")
+    for venues in (2, 5, 10, 20):
+        r = bench(venues)
+        print(
+            f"{r['venues']:>8} {r['pairwise_us']:>10.2f}us {r['best_us']:>10.2f}us "
+            f"{r['pairwise_us'] / r['best_us']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
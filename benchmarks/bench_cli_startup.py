@@ -0,0 +1,134 @@
+"""
+命令行启动耗时：各子命令的导入耗时与预算对比
+
+每个场景在独立的子进程中以 `python -X importtime` 运行，统计全部导入的累计耗时，
+并检查不应被加载的模块（例如 --help 不加载 ccxt/textual，--headless 不加载 textual）。
+任一场景超出预算或加载了不应加载的模块时以非零状态退出，可直接用于 CI。
+不需要访问交易所。
+
+    python benchmarks/bench_cli_startup.py
+    python benchmarks/bench_cli_startup.py --repeat 5 --scale 1.5
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PACKAGE = os.path.join(ROOT, "seekoptrader")
+MAIN = os.path.join(PACKAGE, "__main__.py")
+
+# --help 只需要 click
+HELP_FORBIDDEN = ("ccxt", "textual", "numpy", "asyncio")
+
+# (名称, 命令行参数或导入代码, 导入预算 ms, 不应加载的模块)
+# 以 "import:" 开头的场景只导入对应子命令实际运行时加载的模块，不连接交易所
+SCENARIOS = [
+    ("--help", ["--help"], 120, HELP_FORBIDDEN),
+    ("spread --help", ["spread", "--help"], 120, HELP_FORBIDDEN),
+    ("triangle --help", ["triangle", "--help"], 120, HELP_FORBIDDEN),
+    ("multi --help", ["multi", "--help"], 120, HELP_FORBIDDEN),
+    (
+        "spread --headless",
+        "import:from arbitrage.spread.monitor import TickerMonitor, create_monitor; "
+        "import seekoptrader.stream",
+        1500,
+        ("textual",),
+    ),
+    (
+        "triangle --headless",
+        "import:from arbitrage.triangle.monitor import Monitor; "
+        "from arbitrage.triangle.cycles import CycleMonitor; "
+        "import seekoptrader.stream",
+        1500,
+        ("textual",),
+    ),
+    (
+        "spread (ui)",
+        "import:import app; from arbitrage.spread.panel.ticker import TickerPanel",
+        2000,
+        (),
+    ),
+    (
+        "triangle (ui)",
+        "import:import app; from arbitrage.triangle.panel import Panel",
+        2000,
+        (),
+    ),
+]
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出
+    :return: (顶层导入的累计耗时 ms, 已加载的模块集合)
+    """
+    total = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules.add(name.strip())
+        # 顶层导入的模块名前只有一个空格，嵌套导入会多出缩进
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return total / 1e3, modules
+
+
+def run_scenario(command):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    if isinstance(command, str):
+        argv = [sys.executable, "-X", "importtime", "-c", command[len("import:") :]]
+    else:
+        argv = [sys.executable, "-X", "importtime", MAIN, *command]
+    result = subprocess.run(
+        argv, cwd=PACKAGE, env=env, capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def main(args):
+    failures = []
+    print(f"{'scenario':<22}{'import ms':>12}{'budget ms':>12}  status")
+    for name, command, budget, forbidden in SCENARIOS:
+        samples = []
+        for _ in range(args.repeat):
+            elapsed, modules = run_scenario(command)
+            samples.append(elapsed)
+        elapsed = statistics.median(samples)
+        budget *= args.scale
+
+        loaded = [
+            module
+            for module in forbidden
+            if any(m == module or m.startswith(module + ".") for m in modules)
+        ]
+        status = "ok"
+        if elapsed > budget:
+            status = "over budget"
+        if loaded:
+            status = f"loaded {', '.join(loaded)}"
+        if status != "ok":
+            failures.append(name)
+        print(f"{name:<22}{elapsed:>12.1f}{budget:>12.0f}  {status}")
+
+    if failures:
+        print(f"startup regression: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="runs per scenario, median is reported"
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiply all budgets, e.g. on slower machines",
+    )
+    main(parser.parse_args())
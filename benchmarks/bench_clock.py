@@ -0,0 +1,184 @@
+"""
+时钟偏差估计的模拟对比：ClockEstimator 与原来每 10 秒一次的单样本 rtt/2 对时
+
+以虚拟时间模拟一条有抖动的网络：REST 对时的上行、下行延迟各自独立抖动，偶尔出现
+单向的延迟尖峰（往返不对称），websocket 消息按泊松过程到达并带有交易所的事件时间戳。
+本地时钟相对交易所有固定偏差和频偏，可选地在中途跳变或由本地时间填充事件时间戳。
+在每条消息到达时比较两种估计与真实偏差的差距，并统计 REST 对时次数。不需要访问交易所。
+
+    python benchmarks/bench_clock.py
+    python benchmarks/bench_clock.py --scenario step --duration 7200 --seeds 20
+"""
+
+import os
+import sys
+import math
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from seekoptrader import utils
+from seekoptrader.utils import ClockEstimator
+
+SCENARIOS = ("jitter", "step", "local-timestamps")
+LEGACY_INTERVAL = 10
+# 交易所时间的起点，毫秒
+EXCHANGE_EPOCH = 1.7e12
+
+
+class VirtualTime:
+    """代替 seekoptrader.utils 中的 time 模块，本地时间和单调时钟都由模拟推进"""
+
+    def __init__(self, offset, drift, step=0, step_at=math.inf):
+        """
+        :param offset: 本地时钟相对交易所的初始偏差，毫秒
+        :param drift: 本地时钟频偏，毫秒/秒
+        :param step: 本地时钟在 step_at 秒时跳变的幅度，毫秒
+        """
+        self.now = 0.0
+        self.offset = offset
+        self.drift = drift
+        self.step = step
+        self.step_at = step_at
+
+    def true_offset(self, at=None):
+        at = self.now if at is None else at
+        return self.offset + self.drift * at + (self.step if at >= self.step_at else 0)
+
+    def exchange_time(self, at):
+        return EXCHANGE_EPOCH + at * 1e3
+
+    def local_time(self, at):
+        return self.exchange_time(at) + self.true_offset(at)
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.local_time(self.now) / 1e3
+
+
+def one_way_delay(rng, low=5, high=30, spike=0.2, spike_high=100):
+    """单向延迟，毫秒"""
+    delay = rng.uniform(low, high)
+    if rng.random() < spike:
+        delay += rng.uniform(0, spike_high)
+    return delay
+
+
+def fetch_time(clock, rng, at):
+    """
+    在 at 秒发起一次 REST 对时
+    :return: (返回时刻, 往返中点的本地时间, 往返时间, 交易所时间)
+    """
+    up, down = one_way_delay(rng), one_way_delay(rng)
+    rtt = up + down
+    server_time = int(clock.exchange_time(at + up / 1e3))
+    return at + rtt / 1e3, clock.local_time(at) + rtt / 2, rtt, server_time
+
+
+def simulate(scenario, args, seed):
+    rng = random.Random(seed)
+    clock = VirtualTime(
+        offset=rng.uniform(-200, 200),
+        drift=args.drift_ppm / 1e3,
+        step=args.step if scenario == "step" else 0,
+        step_at=args.duration / 2 if scenario == "step" else math.inf,
+    )
+    utils.time, real_time = clock, utils.time
+    try:
+        estimator = ClockEstimator()
+        legacy = None
+        errors = {"legacy": [], "estimator": []}
+        requests = {"legacy": 0, "estimator": 0}
+        next_sync = {"legacy": 0.0, "estimator": 0.0}
+
+        at = 0.0
+        while at < args.duration:
+            at += rng.expovariate(args.rate)
+            # 到期的对时，估计器发现矛盾时提前对时
+            if estimator.resync.is_set():
+                next_sync["estimator"] = min(next_sync["estimator"], at)
+            while next_sync["legacy"] <= at:
+                done, _, rtt, server_time = fetch_time(clock, rng, next_sync["legacy"])
+                legacy = clock.local_time(done) - (server_time + rtt / 2)
+                requests["legacy"] += 1
+                next_sync["legacy"] += LEGACY_INTERVAL
+            while next_sync["estimator"] <= at:
+                done, local_time, rtt, server_time = fetch_time(
+                    clock, rng, next_sync["estimator"]
+                )
+                clock.now = done
+                estimator.add_sample(local_time, rtt, server_time)
+                requests["estimator"] += 1
+                next_sync["estimator"] = done + estimator.interval
+
+            # 一条 websocket 消息：事件发生在 at 之前一个单向延迟
+            clock.now = at
+            event_at = at - one_way_delay(rng, low=3, high=40) / 1e3
+            if scenario == "local-timestamps":
+                timestamp = clock.local_time(at)
+            else:
+                timestamp = clock.exchange_time(event_at)
+            estimator.observe(timestamp)
+
+            truth = clock.true_offset()
+            errors["legacy"].append(abs(legacy - truth))
+            errors["estimator"].append(abs(estimator.clock["time_diff"] - truth))
+    finally:
+        utils.time = real_time
+    return errors, requests
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "mean": statistics.fmean(values),
+        "p95": values[int(len(values) * 0.95)],
+        "max": values[-1],
+    }
+
+
+def main(args):
+    scenarios = args.scenario or SCENARIOS
+    print(
+        f"{'scenario':<18}{'estimator':<11}{'mean ms':>9}{'p95 ms':>9}"
+        f"{'max ms':>9}{'REST/h':>9}"
+    )
+    for scenario in scenarios:
+        errors = {"legacy": [], "estimator": []}
+        requests = {"legacy": 0, "estimator": 0}
+        for seed in range(args.seeds):
+            run_errors, run_requests = simulate(scenario, args, seed)
+            for name in errors:
+                errors[name].extend(run_errors[name])
+                requests[name] += run_requests[name]
+        hours = args.duration * args.seeds / 3600
+        for name in ("legacy", "estimator"):
+            summary = summarize(errors[name])
+            print(
+                f"{scenario:<18}{name:<11}{summary['mean']:>9.2f}{summary['p95']:>9.2f}"
+                f"{summary['max']:>9.2f}{requests[name] / hours:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=SCENARIOS,
+        help="scenario to run, repeatable, defaults to all",
+    )
+    parser.add_argument("--duration", type=float, default=3600, help="seconds")
+    parser.add_argument("--rate", type=float, default=20, help="messages per second")
+    parser.add_argument("--seeds", type=int, default=5)
+    parser.add_argument(
+        "--drift-ppm", type=float, default=10, help="local clock frequency error"
+    )
+    parser.add_argument(
+        "--step", type=float, default=250, help="clock step in ms (step scenario)"
+    )
+    main(parser.parse_args())
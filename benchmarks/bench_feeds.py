@@ -0,0 +1,350 @@
+"""
+合成行情端到端基准：OrderbookMonitor、TickerMonitor 和三角套利 Monitor
+
+用模拟的 ccxt.pro 交易所代替真实连接，按设定的 symbol 数量、消息速率和突发大小
+生成盘口/行情流，经 watch 循环驱动各 monitor 的完整处理路径，同时按帧率调用 top()。
+统计消息吞吐、单条消息处理耗时分位数、top() 耗时和内存，结果保存为 JSON 便于对比。
+不需要访问交易所。
+
+    python benchmarks/bench_feeds.py
+    python benchmarks/bench_feeds.py --symbols 2000 --rate 0 --duration 10
+    python benchmarks/bench_feeds.py --rate 5000 --burst 50 --compare results/old.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import resource
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from seekoptrader.utils import exchange_registry
+from seekoptrader.arbitrage.spread.monitor import OrderbookMonitor, TickerMonitor
+from seekoptrader.arbitrage.triangle.monitor import Monitor as TriangleMonitor
+
+SCENARIOS = ("orderbook", "ticker", "triangle")
+
+
+class SyntheticExchange:
+    """
+    模拟的 ccxt.pro 客户端
+
+    按 (base, quote) 列表生成现货市场；watch_order_book_for_symbols / watch_tickers
+    每次返回一个随机 symbol 的更新，价格为随机游走。消息按 rate 条/秒成组到达，
+    每组 burst 条紧挨着送出，rate 为 0 时不限速。
+    """
+
+    def __init__(self, id, pairs, rate=1000, burst=1, depth=5, seed=0):
+        self.id = id
+        self.name = id
+        self.pairs = pairs
+        self.rate = rate
+        self.burst = burst
+        self.depth = depth
+        self.rng = random.Random(seed)
+
+        self.markets = None
+        self.mids = {
+            f"{base}/{quote}": self.rng.uniform(1, 100) for base, quote in pairs
+        }
+        self.pending = 0
+        self.next_at = None
+        self.sent = 0
+
+    def set_markets(self, markets):
+        self.markets = {market["symbol"]: market for market in markets}
+
+    async def load_markets(self, reload=False):
+        self.set_markets(
+            {
+                "id": f"{base}{quote}",
+                "symbol": f"{base}/{quote}",
+                "base": base,
+                "quote": quote,
+                "type": "spot",
+                "spot": True,
+                "active": True,
+            }
+            for base, quote in self.pairs
+        )
+        return self.markets
+
+    async def fetch_time(self):
+        return time.time() * 1e3
+
+    async def next_message(self):
+        if self.rate and self.pending == 0:
+            now = time.monotonic()
+            if self.next_at is None:
+                self.next_at = now
+            self.next_at += self.burst / self.rate
+            if self.next_at > now:
+                await asyncio.sleep(self.next_at - now)
+            self.pending = self.burst
+        else:
+            # 同一组内或不限速时也让出事件循环，其他 watch 循环和 top() 得以运行
+            await asyncio.sleep(0)
+        self.pending = max(self.pending - 1, 0)
+        self.sent += 1
+
+    def tick(self, symbols):
+        symbol = self.rng.choice(symbols)
+        mid = self.mids[symbol] * (1 + self.rng.gauss(0, 1e-4))
+        self.mids[symbol] = mid
+        return symbol, mid
+
+    async def watch_order_book_for_symbols(self, symbols, limit=None):
+        await self.next_message()
+        symbol, mid = self.tick(symbols)
+        step = mid * 1e-4
+        depth = limit or self.depth
+        return {
+            "symbol": symbol,
+            "timestamp": time.time() * 1e3,
+            "bids": [[mid - step * (i + 1), 1.0 + i] for i in range(depth)],
+            "asks": [[mid + step * (i + 1), 1.0 + i] for i in range(depth)],
+        }
+
+    async def watch_tickers(self, symbols):
+        await self.next_message()
+        symbol, mid = self.tick(symbols)
+        step = mid * 1e-4
+        return {
+            symbol: {
+                "symbol": symbol,
+                "timestamp": time.time() * 1e3,
+                "last": mid,
+                "bid": mid - step,
+                "ask": mid + step,
+            }
+        }
+
+    async def un_watch_order_book_for_symbols(self, symbols):
+        pass
+
+    async def un_watch_tickers(self, symbols):
+        pass
+
+    async def close(self):
+        pass
+
+
+def spread_pairs(symbols):
+    return [(f"C{i}", "USDT") for i in range(symbols)]
+
+
+def triangle_pairs(symbols):
+    """每个币种与 USDT、BTC 组成交易对，每个币种对应一个 USDT-BTC-Ci 三角组合"""
+    pairs = [("BTC", "USDT")]
+    for i in range(symbols):
+        pairs.extend(((f"C{i}", "USDT"), (f"C{i}", "BTC")))
+    return pairs
+
+
+def percentiles(values, points=(50, 90, 99, 99.9)):
+    if not values:
+        return {}
+    values = sorted(values)
+    return {
+        f"p{point:g}": values[min(int(len(values) * point / 100), len(values) - 1)]
+        for point in points
+    }
+
+
+def timed(func, samples):
+    """包装处理函数，记录每次调用的耗时（微秒）"""
+    perf_counter_ns = time.perf_counter_ns
+
+    def wrapper(*args):
+        start = perf_counter_ns()
+        func(*args)
+        samples.append((perf_counter_ns() - start) / 1e3)
+
+    return wrapper
+
+
+def rss_mb():
+    """当前常驻内存，无 /proc 时退化为峰值"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def create_monitor(scenario, args, samples):
+    """
+    登记模拟交易所并创建对应的 monitor，返回 (monitor, 模拟交易所列表)
+    :param samples: 行情处理耗时的采样列表
+    """
+    if scenario == "triangle":
+        exchange = SyntheticExchange(
+            "synth", triangle_pairs(args.symbols), args.rate, args.burst, args.depth
+        )
+        exchange_registry.register(exchange.id, exchange)
+        monitor = TriangleMonitor(
+            exchange.id, use_market_cache=False, history=args.history
+        )
+        monitor.process_order_book = timed(monitor.process_order_book, samples)
+        return monitor, [exchange]
+
+    exchanges = [
+        SyntheticExchange(
+            name, spread_pairs(args.symbols), args.rate, args.burst, args.depth, seed
+        )
+        for seed, name in enumerate(("synth_a", "synth_b"))
+    ]
+    for exchange in exchanges:
+        exchange_registry.register(exchange.id, exchange)
+    monitor_class = OrderbookMonitor if scenario == "orderbook" else TickerMonitor
+    monitor = monitor_class(
+        "synth_a.spot",
+        "synth_b.spot",
+        backend=args.backend,
+        use_market_cache=False,
+        history=args.history,
+    )
+    if scenario == "orderbook":
+        monitor.process_order_book = timed(monitor.process_order_book, samples)
+    else:
+        monitor.process_ticker = timed(monitor.process_ticker, samples)
+    return monitor, exchanges
+
+
+async def run_scenario(scenario, args):
+    samples = []
+    rss_start = rss_mb()
+    monitor, exchanges = create_monitor(scenario, args, samples)
+
+    await monitor.load_markets()
+    rss_loaded = rss_mb()
+    monitor.start()
+
+    top_costs = []
+    interval = 1 / args.fps
+    started_at = time.perf_counter()
+    try:
+        while time.perf_counter() - started_at < args.duration:
+            await asyncio.sleep(interval)
+            start = time.perf_counter_ns()
+            monitor.top(args.topn)
+            top_costs.append((time.perf_counter_ns() - start) / 1e3)
+        elapsed = time.perf_counter() - started_at
+        rss_end = rss_mb()
+    finally:
+        await monitor.stop()
+
+    offered = sum(exchange.sent for exchange in exchanges)
+    return {
+        "messages": len(samples),
+        "offered": offered,
+        "messages_per_sec": len(samples) / elapsed,
+        "process_us": percentiles(samples),
+        "top_us": percentiles(top_costs),
+        "top_calls": len(top_costs),
+        # 同一进程中依次运行各场景，内存取本场景内的增量
+        "memory": {
+            "markets_mb": rss_loaded - rss_start,
+            "running_mb": rss_end - rss_loaded,
+            "rss_mb": rss_end,
+        },
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    print(f"\ncompared with {baseline_path}:")
+    for scenario, result in results.items():
+        base = baseline.get(scenario)
+        if base is None:
+            continue
+        rate = result["messages_per_sec"] / base["messages_per_sec"]
+        p99 = result["process_us"].get("p99", 0) / (base["process_us"].get("p99") or 1)
+        top = result["top_us"].get("p50", 0) / (base["top_us"].get("p50") or 1)
+        print(
+            f"{scenario:>10}: throughput x{rate:.2f}  "
+            f"process p99 x{p99:.2f}  top p50 x{top:.2f}"
+        )
+
+
+def main(args):
+    scenarios = args.scenario or SCENARIOS
+    results = {}
+    for scenario in scenarios:
+        result = asyncio.run(run_scenario(scenario, args))
+        results[scenario] = result
+        process, top = result["process_us"], result["top_us"]
+        print(
+            f"{scenario:>10}: {result['messages_per_sec']:>10.0f} msg/s  "
+            f"process p50 {process.get('p50', 0):.1f}us p99 {process.get('p99', 0):.1f}us  "
+            f"top p50 {top.get('p50', 0):.1f}us  "
+            f"rss {result['memory']['markets_mb'] + result['memory']['running_mb']:+.1f}MB"
+        )
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: value for key, value in vars(args).items() if key != "compare"},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        os.path.dirname(__file__),
+        "results",
+        f"bench_feeds-{time.strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=SCENARIOS,
+        help="scenario to run, repeatable, defaults to all",
+    )
+    parser.add_argument(
+        "--symbols", type=int, default=500, help="symbols per synthetic exchange"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=2000,
+        help="messages per second per exchange, 0 for unlimited",
+    )
+    parser.add_argument(
+        "--burst", type=int, default=1, help="messages delivered back to back"
+    )
+    parser.add_argument("--depth", type=int, default=5, help="order book levels")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per run")
+    parser.add_argument("--topn", type=int, default=20)
+    parser.add_argument("--fps", type=float, default=5, help="top() calls per second")
+    parser.add_argument(
+        "--backend",
+        choices=("dict", "columnar"),
+        default="dict",
+        help="spread monitor backend",
+    )
+    parser.add_argument(
+        "--history",
+        action="store_true",
+        help="keep opportunity history (duration/persistence columns)",
+    )
+    parser.add_argument("--output", default=None, help="JSON result path")
+    parser.add_argument(
+        "--compare", default=None, help="previous JSON result to compare with"
+    )
+    main(parser.parse_args())
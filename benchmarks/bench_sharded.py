@@ -0,0 +1,111 @@
+"""
+多进程分片吞吐基准
+
+每个工作进程负责一部分交易对，用合成 orderbook 驱动 OrderbookMonitor 的
+process_order_book / flush，价差写入共享内存结果表；统计总吞吐随进程数的变化。
+
+    python benchmarks/bench_sharded.py --pairs 2000 --duration 3
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from seekoptrader.arbitrage.spread.monitor import OrderbookMonitor
+from seekoptrader.arbitrage.spread.monitor.columnar import ResultBoard
+from seekoptrader.arbitrage.spread.monitor.sharded import split_slots
+
+
+def make_pairs(count):
+    return [(f"C{i}/USDT", f"C{i}/USDT:USDT") for i in range(count)]
+
+
+def worker(pair_symbols, slots, board_name, workers, index, duration, results):
+    board = ResultBoard(
+        len(pair_symbols), OrderbookMonitor.columns, workers=workers, name=board_name
+    )
+    monitor = OrderbookMonitor("binance.spot", "binance.swap.linear")
+    monitor.attach(pair_symbols, slots, board)
+
+    rng = random.Random(index)
+    books = []
+    for slot in slots:
+        symbol_a, symbol_b = pair_symbols[slot]
+        for symbol, side in ((symbol_a, "a"), (symbol_b, "b")):
+            price = 100 + rng.random()
+            books.append(
+                (
+                    {
+                        "symbol": symbol,
+                        "bids": [[price, 1.0]],
+                        "asks": [[price * 1.001, 1.0]],
+                        "timestamp": time.time() * 1e3,
+                    },
+                    side,
+                )
+            )
+
+    messages = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            order_book, side = books[rng.randrange(len(books))]
+            monitor.process_order_book(order_book, side, 0)
+        monitor.flush()
+        messages += 1000
+
+    results.put(messages)
+    monitor.store = None
+    board.close()
+
+
+def bench(pairs, workers, duration):
+    context = multiprocessing.get_context("spawn")
+    pair_symbols = make_pairs(pairs)
+    worker_slots = split_slots([[slot] for slot in range(pairs)], workers)
+    board = ResultBoard(pairs, OrderbookMonitor.columns, workers=workers)
+    results = context.Queue()
+
+    processes = [
+        context.Process(
+            target=worker,
+            args=(pair_symbols, slots, board.name, workers, i, duration, results),
+        )
+        for i, slots in enumerate(worker_slots)
+    ]
+    for process in processes:
+        process.start()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+
+    active = int(board.active.sum())
+    board.close()
+    return total / duration, active
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=3)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    workers = 1
+    baseline = None
+    print(f"{'workers':>8} {'msg/s':>12} {'scaling':>8}")
+    while workers <= args.max_workers:
+        throughput, active = bench(args.pairs, workers, args.duration)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>12.0f} {throughput / baseline:>7.2f}x")
+        assert active == args.pairs
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
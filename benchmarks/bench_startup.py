@@ -0,0 +1,55 @@
+"""
+启动耗时：冷启动（从交易所下载市场数据）与热启动（本地缓存）对比
+
+需要能访问交易所 REST 接口。
+
+    python benchmarks/bench_startup.py --market-a binance.spot --market-b okx.spot
+    python benchmarks/bench_startup.py --triangle binance
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from seekoptrader import utils
+from seekoptrader.arbitrage.spread.monitor import TickerMonitor
+from seekoptrader.arbitrage.triangle.monitor import Monitor as TriangleMonitor
+
+
+async def measure(create_monitor):
+    monitor = create_monitor()
+    try:
+        await monitor.load_markets()
+        return monitor.startup
+    finally:
+        if isinstance(monitor, TriangleMonitor):
+            await utils.release_exchange(monitor.exchange, monitor)
+        else:
+            await utils.release_exchange(monitor.exchange_a, monitor)
+            await utils.release_exchange(monitor.exchange_b, monitor)
+
+
+async def main(args):
+    if args.triangle:
+        create_monitor = lambda: TriangleMonitor(args.triangle)
+    else:
+        create_monitor = lambda: TickerMonitor(args.market_a, args.market_b)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        utils.market_cache.cache_dir = cache_dir
+        for label in ("cold", "warm"):
+            startup = await measure(create_monitor)
+            assert startup["warm"] == (label == "warm")
+            print(f"{label:>5}: load_markets {startup['load_markets_ms']:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--market-a", default="binance.spot")
+    parser.add_argument("--market-b", default="okx.spot")
+    parser.add_argument("--triangle", default=None, help="exchange name")
+    asyncio.run(main(parser.parse_args()))
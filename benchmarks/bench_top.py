@@ -0,0 +1,87 @@
+"""
+top(n) 微基准：完整排序 vs RankIndex 增量排名
+
+模拟面板每秒刷新一次的场景：两次刷新之间只有一部分数据的价差发生变化，
+然后读取前 n 名。
+
+    python benchmarks/bench_top.py
+"""
+
+import os
+import sys
+import random
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "seekoptrader"))
+
+from arbitrage.ranking import RankIndex
+
+
+def sort_top(pair_data, n):
+    data = list(pair_data.values())
+    return sorted(data, key=lambda x: x["spread_pct"], reverse=True)[
+        : min(n, len(data))
+    ]
+
+
+def bench(size, top_n=20, refreshes=50, changed_ratio=0.01):
+    rng = random.Random(size)
+    names = [f"PAIR{i}/USDT-PAIR{i}/USDT:USDT" for i in range(size)]
+    pair_data = {
+        name: {"pair_name": name, "spread_pct": rng.random()} for name in names
+    }
+    ranking = RankIndex()
+    for name, data in pair_data.items():
+        ranking.update(name, data["spread_pct"])
+
+    changed = max(1, int(size * changed_ratio))
+    updates = [
+        [(rng.choice(names), rng.random()) for _ in range(changed)]
+        for _ in range(refreshes)
+    ]
+
+    sort_cost = 0.0
+    rank_cost = 0.0
+    update_cost = 0.0
+    for batch in updates:
+        for name, spread_pct in batch:
+            pair_data[name]["spread_pct"] = spread_pct
+
+        start = time.perf_counter()
+        expected = sort_top(pair_data, top_n)
+        sort_cost += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for name, spread_pct in batch:
+            ranking.update(name, spread_pct)
+        update_cost += time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = [pair_data[name] for name in ranking.top(top_n)]
+        rank_cost += time.perf_counter() - start
+
+        assert [r["spread_pct"] for r in result] == [r["spread_pct"] for r in expected]
+
+    return {
+        "size": size,
+        "sort_ms": sort_cost / refreshes * 1e3,
+        "rank_top_ms": rank_cost / refreshes * 1e3,
+        "rank_update_ms": update_cost / refreshes * 1e3,
+    }
+
+
+def main():
+    print(
+        f"{'size':>8} {'sorted top':>12} {'rank top':>12} {'rank update':>12} {'speedup':>8}"
+    )
+    for size in (10_000, 100_000):
+        r = bench(size)
+        total = r["rank_top_ms"] + r["rank_update_ms"]
+        print(
+            f"{r['size']:>8} {r['sort_ms']:>10.3f}ms {r['rank_top_ms']:>10.3f}ms "
+            f"{r['rank_update_ms']:>10.3f}ms {r['sort_ms'] / total:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
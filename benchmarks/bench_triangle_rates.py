@@ -0,0 +1,74 @@
+"""
+三角汇率计算基准：逐个三角组合的标量计算 vs TriangleEngine 向量化批量计算
+
+    python benchmarks/bench_triangle_rates.py --markets 2000 --messages 20000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from seekoptrader.arbitrage.triangle.monitor import Monitor
+
+from bench_triangles import make_markets
+
+
+def make_monitor(markets, backend):
+    monitor = Monitor("binance", backend=backend)
+    monitor.triangles = monitor.find_triangles(markets)
+    monitor.init_data(monitor.triangles)
+    return monitor
+
+
+def run(monitor, messages, refresh_every):
+    start = time.perf_counter()
+    for i, order_book in enumerate(messages):
+        monitor.process_order_book(order_book)
+        if i % refresh_every == refresh_every - 1:
+            monitor.top(20)
+    top = monitor.top(20)
+    return (time.perf_counter() - start) / len(messages) * 1e6, top
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--markets", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument(
+        "--refresh-every", type=int, default=1000, help="messages between top() calls"
+    )
+    args = parser.parse_args()
+
+    markets = make_markets(args.markets)
+    rng = random.Random(0)
+    symbols = list(make_monitor(markets, "dict").symbol_map)
+    messages = []
+    for _ in range(args.messages):
+        price = rng.uniform(1, 100)
+        messages.append(
+            {
+                "symbol": rng.choice(symbols),
+                "bids": [[price, 1.0]],
+                "asks": [[price * 1.001, 1.0]],
+                "timestamp": time.time() * 1e3,
+            }
+        )
+
+    print(f"symbols: {len(symbols)}, messages: {len(messages)}")
+    results = {}
+    for backend in ("dict", "columnar"):
+        monitor = make_monitor(markets, backend)
+        cost, top = run(monitor, messages, args.refresh_every)
+        results[backend] = (cost, [row["name"] for row in top])
+        print(f"{backend:>9}: {cost:8.2f}us/message")
+
+    assert results["dict"][1] == results["columnar"][1], "top rows differ"
+    print(f"speedup: {results['dict'][0] / results['columnar'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
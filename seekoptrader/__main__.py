@@ -1,43 +1,137 @@
-from ccxt.pro import Exchange
+import json
 import click
 
-from textual.app import App, ComposeResult
-from textual.widgets import Header, Footer
+# 各子命令在函数内导入依赖：--help 不加载 ccxt、textual 和 asyncio，--headless 不加载 textual
 
-from arbitrage.spread.panel import TickerPanel, OrderbookPanel
-from arbitrage.triangle.panel import Panel as TrianglePanel
 
+def run_headless(monitor_panel, monitor_params, output, events, metrics_port=None):
+    """不启动界面，按面板对应的监控把结果以 NDJSON 输出"""
+    import asyncio
 
-class MonitorApp(App):
-    CSS = """
-        #content {
-            overflow-x: auto;
-            overflow-y: auto;
-        }
-        """
+    from arbitrage.spread.monitor import (
+        BestQuoteMonitor,
+        OrderbookMonitor,
+        TickerMonitor,
+        create_monitor,
+    )
+    from arbitrage.triangle.cycles import CycleMonitor
+    from arbitrage.triangle.monitor import Monitor as TriangleMonitor
+    from seekoptrader.metrics import metrics, serve_metrics
+    from seekoptrader.stream import stream_monitor
+
+    params = dict(monitor_params)
+    top_n = params.pop("top_n")
+    fps = params.pop("fps", 5)
+
+    def create():
+        if monitor_panel == "triangle":
+            max_length = params.pop("max_length", 3)
+            if max_length > 3:
+                return CycleMonitor(max_length=max_length, **params)
+            return TriangleMonitor(**params)
+        elif monitor_panel == "best":
+            return BestQuoteMonitor(**params)
+        elif monitor_panel == "orderbook":
+            return create_monitor(OrderbookMonitor, **params)
+        return create_monitor(TickerMonitor, **params)
+
+    key = "name" if monitor_panel == "triangle" else "pair_name"
+
+    async def main():
+        if metrics_port:
+            await serve_metrics(port=metrics_port)
+            metrics.start()
+        await stream_monitor(create(), top_n, key, output, events, fps)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
 
-    def __init__(self, title, monitor_panel, monitor_params):
-        self.TITLE = title
 
-        super().__init__()
+def headless_options(func):
+    func = click.option(
+        "--events",
+        type=click.Choice(["snapshot", "change"], case_sensitive=False),
+        default="snapshot",
+        show_default=True,
+        help="Headless output: full top-N snapshots or per-row change events",
+    )(func)
+    func = click.option(
+        "--output",
+        default="-",
+        show_default=True,
+        help="Headless output target: - for stdout, unix:<path> or a file path",
+    )(func)
+    func = click.option(
+        "--headless",
+        is_flag=True,
+        default=False,
+        help="Stream NDJSON instead of starting the terminal UI",
+    )(func)
+    return func
 
-        self.monitor_panel = monitor_panel
-        self.monitor_params = monitor_params
 
-    def create_monitor_panel(self, id):
-        if self.monitor_panel == "ticker":
-            return TickerPanel(id=id)
-        elif self.monitor_panel == "orderbook":
-            return OrderbookPanel(id=id)
-        elif self.monitor_panel == "triangle":
-            return TrianglePanel(id=id)
-        else:
-            raise ValueError(f"Unsupported panel type: {self.monitor_panel}")
+def feed_log_options(func):
+    func = click.option(
+        "--replay-speed",
+        type=click.FloatRange(min=0),
+        default=1.0,
+        show_default=True,
+        help="Replay speed multiplier, 0 replays as fast as possible",
+    )(func)
+    func = click.option(
+        "--replay",
+        type=click.Path(exists=True, dir_okay=False),
+        default=None,
+        help="Replay a recorded feed log instead of the live exchange feeds",
+    )(func)
+    func = click.option(
+        "--record",
+        type=click.Path(dir_okay=False),
+        default=None,
+        help="Append every received order book/ticker to a binary feed log",
+    )(func)
+    return func
 
-    def compose(self) -> ComposeResult:
-        yield Header()
-        yield Footer()
-        yield self.create_monitor_panel(id="content")
+
+def history_options(func):
+    func = click.option(
+        "--history-dir",
+        type=click.Path(file_okay=False),
+        default=None,
+        help="Spill full history segments to memory-mapped files in this directory",
+    )(func)
+    func = click.option(
+        "--history-threshold",
+        type=float,
+        default=0.001,
+        show_default=True,
+        help="Spread (or triangle rate - 1) above which an opportunity is present",
+    )(func)
+    func = click.option(
+        "--history",
+        is_flag=True,
+        default=False,
+        help="Keep per-pair spread history and show opportunity duration/persistence",
+    )(func)
+    return func
+
+
+def metrics_options(func):
+    func = click.option(
+        "--metrics-port",
+        type=click.IntRange(1, 65535),
+        default=None,
+        help="Serve Prometheus text metrics on 127.0.0.1:<port>",
+    )(func)
+    func = click.option(
+        "--status",
+        is_flag=True,
+        default=False,
+        help="Show message rates, processing latency and event-loop lag",
+    )(func)
+    return func
 
 
 @click.group()
@@ -58,10 +152,112 @@ def cli():
     show_default=True,
     help="Number of top items to monitor",
 )
-def triangle(exchange_name, topn):
+@click.option(
+    "--market-cache/--no-market-cache",
+    default=True,
+    show_default=True,
+    help="Load market metadata from the local cache when it is fresh",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["dict", "columnar"], case_sensitive=False),
+    default="dict",
+    show_default=True,
+    help="Triangle rate engine, columnar requires numpy",
+)
+@click.option(
+    "--max-length",
+    type=click.IntRange(3, 6),
+    default=3,
+    show_default=True,
+    help="Maximum number of legs per cycle, values above 3 monitor multi-leg cycles",
+)
+@click.option(
+    "--universe",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only subscribe to the K most liquid triangles or cycles, re-ranked periodically",
+)
+@click.option(
+    "--universe-metric",
+    type=click.Choice(["volume", "spread"], case_sensitive=False),
+    default="volume",
+    show_default=True,
+    help="Liquidity ranking: 24h quote volume or bid/ask spread",
+)
+@click.option(
+    "--fps",
+    type=click.FloatRange(min=0, min_open=True),
+    default=5,
+    show_default=True,
+    help="Maximum panel refresh rate, panels only refresh when data changed",
+)
+@headless_options
+@feed_log_options
+@history_options
+@metrics_options
+def triangle(
+    exchange_name,
+    topn,
+    market_cache,
+    backend,
+    max_length,
+    universe,
+    universe_metric,
+    fps,
+    headless,
+    output,
+    events,
+    record,
+    replay,
+    replay_speed,
+    history,
+    history_threshold,
+    history_dir,
+    status,
+    metrics_port,
+):
+    if max_length > 3 and backend != "dict":
+        raise click.BadParameter(
+            "multi-leg cycles only support the dict backend", param_hint="--backend"
+        )
+    if replay and universe:
+        raise click.BadParameter(
+            "not supported when replaying a feed log", param_hint="--universe"
+        )
+    if max_length > 3 and history:
+        raise click.BadParameter(
+            "not supported for multi-leg cycles", param_hint="--history"
+        )
     title = f"三角套利监控: {exchange_name}"
-    monitor_parmas = {"exchange_name": exchange_name, "top_n": topn}
-    MonitorApp(title, "triangle", monitor_params=monitor_parmas).run()
+    monitor_parmas = {
+        "exchange_name": exchange_name,
+        "top_n": topn,
+        "use_market_cache": market_cache,
+        "backend": backend,
+        "max_length": max_length,
+        "universe": universe,
+        "universe_metric": universe_metric,
+        "fps": fps,
+        "record": record,
+        "replay": replay,
+        "replay_speed": replay_speed,
+        "history": history,
+        "history_threshold": history_threshold,
+        "history_dir": history_dir,
+    }
+    if headless:
+        run_headless("triangle", monitor_parmas, output, events, metrics_port)
+        return
+    from app import MonitorApp
+
+    MonitorApp(
+        title,
+        "triangle",
+        monitor_params=monitor_parmas,
+        status=status,
+        metrics_port=metrics_port,
+    ).run()
 
 
 @cli.command("spread")
@@ -86,6 +282,12 @@ def triangle(exchange_name, topn):
     required=True,
     help="Market A structure: exchange.type[.subtype], e.g. binance.spot, okx.future.linear",
 )
+@click.option(
+    "--markets",
+    default=None,
+    help="Compare the best bid/ask across N markets, comma-separated "
+    "(e.g. binance.spot,okx.spot,bybit.spot), replaces --market-a/--market-b",
+)
 @click.option(
     "--quote-currency", default="USDT", show_default=True, help="Base quote currency"
 )
@@ -101,17 +303,268 @@ def triangle(exchange_name, topn):
     show_default=True,
     help="Number of top items to monitor",
 )
-def spread(panel, market_a, market_b, quote_currency, symbols, topn):
+@click.option(
+    "--backend",
+    type=click.Choice(["dict", "columnar"], case_sensitive=False),
+    default="dict",
+    show_default=True,
+    help="Pair data storage backend, columnar requires numpy",
+)
+@click.option(
+    "--coalesce/--no-coalesce",
+    default=True,
+    show_default=True,
+    help="Recompute spreads once per refresh instead of once per message",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Number of worker processes, results are shared through shared memory",
+)
+@click.option(
+    "--notional",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Target notional in quote currency for the VWAP spread (orderbook only)",
+)
+@click.option(
+    "--market-cache/--no-market-cache",
+    default=True,
+    show_default=True,
+    help="Load market metadata from the local cache when it is fresh",
+)
+@click.option(
+    "--universe",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only subscribe to the K most liquid pairs, re-ranked periodically",
+)
+@click.option(
+    "--universe-metric",
+    type=click.Choice(["volume", "spread"], case_sensitive=False),
+    default="volume",
+    show_default=True,
+    help="Liquidity ranking: 24h quote volume or bid/ask spread",
+)
+@click.option(
+    "--fps",
+    type=click.FloatRange(min=0, min_open=True),
+    default=5,
+    show_default=True,
+    help="Maximum panel refresh rate, panels only refresh when data changed",
+)
+@headless_options
+@feed_log_options
+@history_options
+@metrics_options
+def spread(
+    panel,
+    market_a,
+    market_b,
+    markets,
+    quote_currency,
+    symbols,
+    topn,
+    backend,
+    coalesce,
+    workers,
+    notional,
+    market_cache,
+    universe,
+    universe_metric,
+    fps,
+    headless,
+    output,
+    events,
+    record,
+    replay,
+    replay_speed,
+    history,
+    history_threshold,
+    history_dir,
+    status,
+    metrics_port,
+):
     symbols = set(symbols.split(",")) if symbols else None
+    if symbols:
+        malformed = sorted(symbol for symbol in symbols if "-" not in symbol)
+        if malformed:
+            raise click.BadParameter(
+                f"expected <base>-<quote>, got {', '.join(malformed)}",
+                param_hint="--symbols",
+            )
+    if (record or replay) and workers > 1:
+        raise click.BadParameter(
+            "feed logs are not supported with multiple workers", param_hint="--workers"
+        )
+    if replay and universe:
+        raise click.BadParameter(
+            "not supported when replaying a feed log", param_hint="--universe"
+        )
+    if history and workers > 1:
+        raise click.BadParameter(
+            "history is not supported with multiple workers", param_hint="--workers"
+        )
+    if markets:
+        if (
+            workers > 1
+            or backend != "dict"
+            or notional is not None
+            or universe
+            or record
+            or replay
+            or history
+        ):
+            raise click.BadParameter(
+                "--workers, --backend columnar, --notional, --universe, "
+                "--record, --replay and --history are not supported with multiple markets",
+                param_hint="--markets",
+            )
+        markets = markets.split(",")
+        if len(markets) < 2:
+            raise click.BadParameter("at least two markets", param_hint="--markets")
+        monitor_params = {
+            "markets": markets,
+            "feed": panel,
+            "quote_currency": quote_currency,
+            "symbols": symbols,
+            "top_n": topn,
+            "coalesce": coalesce,
+            "use_market_cache": market_cache,
+            "fps": fps,
+        }
+        if headless:
+            run_headless("best", monitor_params, output, events, metrics_port)
+            return
+        title = f"最优报价监控: {' '.join(markets)}"
+        from app import MonitorApp
+
+        MonitorApp(
+            title,
+            "best",
+            monitor_params=monitor_params,
+            status=status,
+            metrics_port=metrics_port,
+        ).run()
+        return
+
     monitor_params = {
         "market_a": market_a,
         "market_b": market_b,
         "quote_currency": quote_currency,
         "symbols": symbols,
         "top_n": topn,
+        "backend": backend,
+        "coalesce": coalesce,
+        "workers": workers,
+        "use_market_cache": market_cache,
+        "universe": universe,
+        "universe_metric": universe_metric,
+        "fps": fps,
+        "record": record,
+        "replay": replay,
+        "replay_speed": replay_speed,
+        "history": history,
+        "history_threshold": history_threshold,
+        "history_dir": history_dir,
     }
+    if notional is not None:
+        if panel != "orderbook":
+            raise click.BadParameter(
+                "only supported by the orderbook panel", param_hint="--notional"
+            )
+        monitor_params["notional"] = notional
+    if headless:
+        run_headless(panel, monitor_params, output, events, metrics_port)
+        return
     title = f"交易监控: A-{market_a} B-{market_b}"
-    MonitorApp(title, panel, monitor_params=monitor_params).run()
+    from app import MonitorApp
+
+    MonitorApp(
+        title,
+        panel,
+        monitor_params=monitor_params,
+        status=status,
+        metrics_port=metrics_port,
+    ).run()
+
+
+def parse_job(spec, topn):
+    """解析 <panel>:<市场或交易所>... 形式的任务，例如 ticker:binance.spot:okx.spot、triangle:okx"""
+    panel, *args = spec.split(":")
+    if panel in ("ticker", "orderbook") and len(args) == 2:
+        return {"panel": panel, "market_a": args[0], "market_b": args[1], "top_n": topn}
+    elif panel == "triangle" and len(args) == 1:
+        return {"panel": panel, "exchange_name": args[0], "top_n": topn}
+    elif panel == "best" and len(args) >= 2:
+        return {"panel": panel, "markets": args, "top_n": topn}
+    raise click.BadParameter(
+        f"invalid job {spec!r}, expected ticker:<market_a>:<market_b>, "
+        "orderbook:<market_a>:<market_b>, best:<market>:<market>... "
+        "or triangle:<exchange>",
+        param_hint="JOBS",
+    )
+
+
+@cli.command("multi")
+@click.argument("jobs", nargs=-1)
+@click.option(
+    "--config",
+    type=click.File(),
+    default=None,
+    help="JSON file with a list of jobs, each a dict of panel and monitor parameters",
+)
+@click.option(
+    "--layout",
+    type=click.Choice(["tabs", "grid"], case_sensitive=False),
+    default="tabs",
+    show_default=True,
+    help="Show panels in tabs (only the active tab refreshes) or in a grid",
+)
+@click.option(
+    "--topn",
+    type=int,
+    default=20,
+    show_default=True,
+    help="Number of top items to monitor per panel",
+)
+@click.option(
+    "--fps",
+    type=click.FloatRange(min=0, min_open=True),
+    default=5,
+    show_default=True,
+    help="Maximum panel refresh rate, panels only refresh when data changed",
+)
+@metrics_options
+def multi(jobs, config, layout, topn, fps, status, metrics_port):
+    """
+    Run several monitors in one app, e.g.
+
+    \b
+    multi ticker:binance.spot:okx.spot orderbook:okx.spot:okx.swap.linear triangle:okx
+    """
+    monitor_jobs = [{**parse_job(spec, topn), "fps": fps} for spec in jobs]
+    if config is not None:
+        for job in json.load(config):
+            if job.get("panel") not in ("ticker", "orderbook", "triangle", "best"):
+                raise click.BadParameter(
+                    f"invalid panel in job {job!r}", param_hint="--config"
+                )
+            monitor_jobs.append({"top_n": topn, "fps": fps, **job})
+    if not monitor_jobs:
+        raise click.UsageError("at least one job is required")
+
+    from app import MultiMonitorApp
+
+    MultiMonitorApp(
+        f"多任务监控: {len(monitor_jobs)} 个面板",
+        monitor_jobs,
+        layout=layout,
+        status=status,
+        metrics_port=metrics_port,
+    ).run()
 
 
 def main():
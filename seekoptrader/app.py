@@ -0,0 +1,148 @@
+from textual.app import App, ComposeResult
+from textual.containers import Grid
+from textual.widgets import Header, Footer, TabbedContent, TabPane
+
+from seekoptrader.metrics import metrics, serve_metrics
+
+
+class MonitorApp(App):
+    CSS = """
+        #content {
+            overflow-x: auto;
+            overflow-y: auto;
+        }
+        #status {
+            dock: bottom;
+            height: 12;
+            border-top: solid $primary;
+        }
+        """
+
+    def __init__(
+        self, title, monitor_panel, monitor_params, status=False, metrics_port=None
+    ):
+        """
+        :param status: 在底部显示运行指标面板
+        :param metrics_port: 在本地该端口提供 Prometheus 格式的 metrics
+        """
+        self.TITLE = title
+
+        super().__init__()
+
+        self.monitor_panel = monitor_panel
+        self.monitor_params = monitor_params
+        self.status = status
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+
+    def create_monitor_panel(self, id, monitor_panel=None, monitor_params=None):
+        # 面板按需导入，只加载本次用到的监控
+        monitor_panel = monitor_panel or self.monitor_panel
+        if monitor_panel == "ticker":
+            from arbitrage.spread.panel.ticker import TickerPanel
+
+            return TickerPanel(id=id, monitor_params=monitor_params)
+        elif monitor_panel == "orderbook":
+            from arbitrage.spread.panel.orderbook import OrderbookPanel
+
+            return OrderbookPanel(id=id, monitor_params=monitor_params)
+        elif monitor_panel == "triangle":
+            from arbitrage.triangle.panel import Panel as TrianglePanel
+
+            return TrianglePanel(id=id, monitor_params=monitor_params)
+        elif monitor_panel == "best":
+            from arbitrage.spread.panel.best import BestQuotePanel
+
+            return BestQuotePanel(id=id, monitor_params=monitor_params)
+        else:
+            raise ValueError(f"Unsupported panel type: {monitor_panel}")
+
+    def set_status(self, panel, status):
+        self.sub_title = status
+
+    def compose_status(self):
+        if self.status:
+            from arbitrage.status import StatusPanel
+
+            yield StatusPanel(id="status")
+
+    def compose(self) -> ComposeResult:
+        yield Header()
+        yield Footer()
+        yield from self.compose_status()
+        yield self.create_monitor_panel(id="content")
+
+    async def on_mount(self):
+        if self.metrics_port:
+            self.metrics_server = await serve_metrics(port=self.metrics_port)
+            metrics.start()
+
+
+class MultiMonitorApp(MonitorApp):
+    """
+    在一个应用中同时运行多个监控面板
+
+    所有面板共用进程内的交易所连接，相同交易所和 symbol 的行情只订阅一次；
+    不可见的面板只接收行情，不刷新表格。
+    """
+
+    CSS = """
+        .content {
+            overflow-x: auto;
+            overflow-y: auto;
+        }
+        #grid {
+            grid-size: 2;
+        }
+        #grid > .content {
+            border: solid $primary;
+        }
+        #status {
+            dock: bottom;
+            height: 12;
+            border-top: solid $primary;
+        }
+        """
+
+    def __init__(self, title, jobs, layout="tabs", **kwargs):
+        """
+        :param jobs: 监控任务列表，每项为 {"panel": 面板类型, **monitor_params}
+        :param layout: tabs 或 grid
+        """
+        super().__init__(title, "multi", monitor_params={}, **kwargs)
+        self.jobs = jobs
+        self.layout = layout
+
+    def set_status(self, panel, status):
+        panel.border_subtitle = status
+
+    def compose_panels(self):
+        for i, job in enumerate(self.jobs):
+            params = dict(job)
+            panel = self.create_monitor_panel(
+                f"panel-{i}", params.pop("panel"), monitor_params=params
+            )
+            panel.add_class("content")
+            panel.border_title = job_title(job)
+            yield panel
+
+    def compose(self) -> ComposeResult:
+        yield Header()
+        yield Footer()
+        yield from self.compose_status()
+        if self.layout == "grid":
+            with Grid(id="grid"):
+                yield from self.compose_panels()
+        else:
+            with TabbedContent():
+                for i, panel in enumerate(self.compose_panels()):
+                    with TabPane(panel.border_title, id=f"job-{i}"):
+                        yield panel
+
+
+def job_title(job):
+    if job["panel"] == "triangle":
+        return f"三角套利: {job['exchange_name']}"
+    elif job["panel"] == "best":
+        return f"最优报价: {' '.join(job['markets'])}"
+    return f"{job['panel']}: A-{job['market_a']} B-{job['market_b']}"
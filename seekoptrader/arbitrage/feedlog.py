@@ -0,0 +1,286 @@
+import os
+import math
+import mmap
+import json
+import time
+import zlib
+import struct
+import asyncio
+
+from collections import defaultdict
+
+from seekoptrader.utils import exchange_registry
+
+# 文件头，版本变化时修改最后一个字节
+MAGIC = b"SOTFEED\x01"
+
+# 记录头：类型、来源、买盘档数、卖盘档数、symbol 编号、负载字节数、
+# 本地接收时间、交易所时间戳、接收时的时钟偏差（均为毫秒）
+RECORD = struct.Struct("<BBHHIIddd")
+
+# 记录类型：
+#   SYMBOL     - 登记 symbol 编号，负载为 UTF-8 的 symbol
+#   MARKETS    - 市场元数据快照，负载为 zlib 压缩的 JSON，回放时无需访问交易所
+#   ORDER_BOOK - 盘口，负载为买盘和卖盘各档的 (价格, 数量)，float64
+#   TICKER     - 行情，负载为 (最新价, 买一价, 卖一价)，float64，缺失为 NaN
+SYMBOL, MARKETS, ORDER_BOOK, TICKER = range(4)
+
+# monitor 订阅的行情类型对应的记录类型
+FEED_KINDS = {"orderbook": ORDER_BOOK, "ticker": TICKER}
+
+LEVEL = struct.Struct("<dd")
+QUOTE = struct.Struct("<ddd")
+
+
+class FeedRecorder:
+    """
+    行情录制
+
+    把 monitor 收到的每条盘口和行情追加写入二进制日志，symbol 以编号代替，
+    价格和数量按 float64 原样保存。写入经过大块缓冲，不在行情处理路径上做系统调用。
+    """
+
+    def __init__(self, path, buffer_size=1 << 20):
+        self.path = path
+        self.symbol_ids = {}
+        if os.path.exists(path) and os.path.getsize(path):
+            # 追加到已有日志时沿用其中的 symbol 编号
+            with FeedLog(path) as log:
+                self.symbol_ids = dict(log.symbol_ids())
+        self.file = open(path, "ab", buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def symbol_id(self, symbol):
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.symbol_ids[symbol] = len(self.symbol_ids)
+            payload = symbol.encode()
+            self.file.write(
+                RECORD.pack(SYMBOL, 0, 0, 0, symbol_id, len(payload), 0, 0, 0)
+            )
+            self.file.write(payload)
+        return symbol_id
+
+    def markets(self, exchange, markets):
+        """
+        :param markets: 市场列表，回放时恢复到同名交易所的客户端上
+        """
+        payload = zlib.compress(
+            json.dumps({"exchange": exchange.id, "markets": markets}).encode()
+        )
+        self.file.write(
+            RECORD.pack(MARKETS, 0, 0, 0, 0, len(payload), time.time() * 1e3, 0, 0)
+        )
+        self.file.write(payload)
+
+    def order_book(self, order_book, source=0, time_diff=0):
+        symbol_id = self.symbol_id(order_book["symbol"])
+        bids, asks = order_book["bids"], order_book["asks"]
+        levels = [LEVEL.pack(level[0], level[1]) for level in bids]
+        levels.extend(LEVEL.pack(level[0], level[1]) for level in asks)
+        self.file.write(
+            RECORD.pack(
+                ORDER_BOOK,
+                source,
+                len(bids),
+                len(asks),
+                symbol_id,
+                len(levels) * LEVEL.size,
+                time.time() * 1e3,
+                order_book["timestamp"] or 0,
+                time_diff,
+            )
+        )
+        self.file.write(b"".join(levels))
+
+    def ticker(self, symbol, ticker, source=0, time_diff=0):
+        symbol_id = self.symbol_id(symbol)
+        self.file.write(
+            RECORD.pack(
+                TICKER,
+                source,
+                0,
+                0,
+                symbol_id,
+                QUOTE.size,
+                time.time() * 1e3,
+                ticker["timestamp"] or 0,
+                time_diff,
+            )
+        )
+        self.file.write(
+            QUOTE.pack(
+                *(
+                    math.nan if value is None else value
+                    for value in (ticker["last"], ticker["bid"], ticker["ask"])
+                )
+            )
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class FeedLog:
+    """
+    行情日志读取
+
+    通过 mmap 映射整个文件，记录头和价格数组用 struct.unpack_from 直接从映射区解析，
+    逐条还原为 ccxt 格式的盘口或行情。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a feed log: {path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def records(self):
+        """
+        逐条返回记录头和负载位置：
+        (类型, 来源, symbol 编号, 接收时间, 时间戳, 时钟偏差, 负载偏移, 负载字节数, 买盘档数, 卖盘档数)
+        """
+        buffer = self.buffer
+        offset, end = len(MAGIC), len(buffer)
+        while offset + RECORD.size <= end:
+            kind, source, n_bids, n_asks, symbol_id, size, received, timestamp, diff = (
+                RECORD.unpack_from(buffer, offset)
+            )
+            offset += RECORD.size
+            if offset + size > end:
+                # 录制被中断时最后一条记录可能不完整
+                break
+            yield (
+                kind,
+                source,
+                symbol_id,
+                received,
+                timestamp,
+                diff,
+                offset,
+                size,
+                n_bids,
+                n_asks,
+            )
+            offset += size
+
+    def symbol_ids(self):
+        for kind, _, symbol_id, _, _, _, offset, size, _, _ in self.records():
+            if kind == SYMBOL:
+                yield self.buffer[offset : offset + size].decode(), symbol_id
+
+    def markets(self):
+        """:return: {交易所 id: 市场列表}"""
+        markets = defaultdict(dict)
+        for kind, _, _, _, _, _, offset, size, _, _ in self.records():
+            if kind == MARKETS:
+                data = json.loads(zlib.decompress(self.buffer[offset : offset + size]))
+                for market in data["markets"]:
+                    markets[data["exchange"]][market["symbol"]] = market
+        return {exchange: list(items.values()) for exchange, items in markets.items()}
+
+    def __iter__(self):
+        """
+        按录制顺序返回行情消息
+        :return: (类型, 来源, 接收时间, 时钟偏差, 消息)，消息为 ccxt 格式的盘口或行情
+        """
+        symbols = []
+        buffer = self.buffer
+        for (
+            kind,
+            source,
+            symbol_id,
+            received,
+            timestamp,
+            time_diff,
+            offset,
+            size,
+            n_bids,
+            n_asks,
+        ) in self.records():
+            if kind == SYMBOL:
+                symbols.append(buffer[offset : offset + size].decode())
+            elif kind == ORDER_BOOK:
+                values = struct.unpack_from(f"<{size // 8}d", buffer, offset)
+                split = n_bids * 2
+                message = {
+                    "symbol": symbols[symbol_id],
+                    "timestamp": timestamp,
+                    "bids": [list(values[i : i + 2]) for i in range(0, split, 2)],
+                    "asks": [
+                        list(values[i : i + 2]) for i in range(split, len(values), 2)
+                    ],
+                }
+                yield kind, source, received, time_diff, message
+            elif kind == TICKER:
+                last, bid, ask = (
+                    None if value != value else value
+                    for value in QUOTE.unpack_from(buffer, offset)
+                )
+                message = {
+                    "symbol": symbols[symbol_id],
+                    "timestamp": timestamp,
+                    "last": last,
+                    "bid": bid,
+                    "ask": ask,
+                }
+                yield kind, source, received, time_diff, message
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+
+def preload_markets(path, exchanges):
+    """
+    把日志中的市场快照恢复到交易所客户端上，之后 load_markets 直接复用，不访问交易所
+    """
+    with FeedLog(path) as log:
+        markets = log.markets()
+    for exchange in set(exchanges):
+        if exchange.id not in markets:
+            raise ValueError(f"No {exchange.id} markets recorded in {path}")
+        shared = exchange_registry.get(exchange)
+        loaded = list(exchange.markets.values()) if exchange.markets else []
+        exchange.set_markets(loaded + markets[exchange.id])
+        shared.market_types["*"] = True
+
+
+async def replay_feed(monitor, path, speed=1.0, batch=1000):
+    """
+    回放行情日志，消息经 monitor.replay_message 进入与实时行情相同的处理路径
+
+    消息的时间戳按回放时刻平移，elapsed_time 与录制时一致。
+    :param speed: 回放倍速，1 为按录制时的节奏，0 为尽快回放
+    :param batch: 尽快回放时每处理 batch 条消息让出一次事件循环，面板得以刷新
+    :return: 回放的消息数量
+    """
+    count = 0
+    with FeedLog(path) as log:
+        started_at = time.monotonic()
+        first_received = None
+        for kind, source, received, time_diff, message in log:
+            if first_received is None:
+                first_received = received
+            if speed:
+                delay = (received - first_received) / 1e3 / speed - (
+                    time.monotonic() - started_at
+                )
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif count % batch == 0:
+                await asyncio.sleep(0)
+
+            message["timestamp"] += time.time() * 1e3 - received
+            monitor.replay_message(kind, source, message, time_diff)
+            count += 1
+    return count
@@ -0,0 +1,463 @@
+import os
+import re
+import json
+import math
+import mmap
+import struct
+
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖，仅机会历史和 columnar 后端需要
+    np = None
+
+# 分辨率：原始采样、1 秒、1 分钟
+RAW, SECOND, MINUTE = range(3)
+BUCKET_WIDTHS = {SECOND: 1000, MINUTE: 60000}
+
+# 原始采样：时间（毫秒）、价差、可成交数量（未知为 NaN）
+RAW_COLUMNS = (("timestamp", "<f8"), ("spread", "<f4"), ("size", "<f4"))
+# 降采样：桶起点（毫秒）、最大价差、平均价差、高于阈值的时长（毫秒）、采样数；
+# 两次采样之间整段没有采样的桶合并为一行：采样数为 0，最大和平均价差为 NaN，
+# 高于阈值的时长为这段时间的总时长（上一次采样低于阈值时不写）
+BUCKET_COLUMNS = (
+    ("timestamp", "<f8"),
+    ("max", "<f4"),
+    ("mean", "<f4"),
+    ("above", "<f4"),
+    ("count", "<i4"),
+)
+SCHEMAS = {RAW: RAW_COLUMNS, SECOND: BUCKET_COLUMNS, MINUTE: BUCKET_COLUMNS}
+
+# 溢出文件头，版本变化时修改最后一个字节
+MAGIC = b"SOTHIST\x01"
+# 段头：分辨率、槽位、样本数，之后按列依次存放各列的 count 个值
+SEGMENT = struct.Struct("<BII")
+
+
+class Ring:
+    """
+    列式环形缓冲
+
+    每列是 (槽位数, capacity) 的预分配数组，各槽位独立循环写入。
+    溢出总是发生在某个槽位写满一圈时，因此 [0, head) 始终是尚未溢出的数据。
+    """
+
+    def __init__(self, size, capacity, resolution, spill=None):
+        self.capacity = capacity
+        self.resolution = resolution
+        self.spill = spill
+        self.columns = {
+            name: np.zeros((size, capacity), dtype=dtype)
+            for name, dtype in SCHEMAS[resolution]
+        }
+        self.heads = np.zeros(size, dtype=np.intp)
+        self.counts = np.zeros(size, dtype=np.int64)
+
+    def append(self, slots, values):
+        """
+        :param slots: 不重复的槽位数组
+        :param values: 列名 -> 与 slots 对齐的数组
+        """
+        heads = self.heads[slots]
+        for name, column in self.columns.items():
+            column[slots, heads] = values[name]
+        heads += 1
+        full = heads == self.capacity
+        if full.any():
+            if self.spill is not None:
+                for slot in slots[full].tolist():
+                    self.spill_slot(slot, self.capacity)
+            heads[full] = 0
+        self.heads[slots] = heads
+        self.counts[slots] += 1
+
+    def spill_slot(self, slot, count):
+        self.spill.write(
+            self.resolution,
+            slot,
+            count,
+            [column[slot, :count] for column in self.columns.values()],
+        )
+
+    def flush(self):
+        """把各槽位尚未写满一圈的数据也写入溢出文件"""
+        if self.spill is None:
+            return
+        for slot in np.flatnonzero(self.heads).tolist():
+            self.spill_slot(slot, int(self.heads[slot]))
+        self.heads[:] = 0
+
+    def series(self, slot):
+        """内存中保留的数据，按时间顺序"""
+        count = min(int(self.counts[slot]), self.capacity)
+        head = int(self.heads[slot])
+        order = np.arange(head - count, head) % self.capacity
+        return {name: column[slot, order] for name, column in self.columns.items()}
+
+
+class Buckets:
+    """一个降采样级别：每个槽位当前未结束的桶，以及已结束的桶组成的环形缓冲"""
+
+    def __init__(self, size, capacity, resolution, spill=None):
+        self.width = BUCKET_WIDTHS[resolution]
+        self.ring = Ring(size, capacity, resolution, spill)
+        self.start = np.full(size, -1.0)
+        self.max = np.full(size, -np.inf)
+        self.sum = np.zeros(size)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.above = np.zeros(size)
+
+    def roll(self, slots, times):
+        """
+        时间进入新桶的槽位结束当前桶
+        :return: (进入新桶的掩码, 这些槽位原来的桶起点)
+        """
+        starts = np.floor(times / self.width) * self.width
+        rolled = starts != self.start[slots]
+        rolled_slots = slots[rolled]
+        previous = self.start[rolled_slots]
+        closing = rolled_slots[self.count[rolled_slots] > 0]
+        if len(closing):
+            self.ring.append(
+                closing,
+                {
+                    "timestamp": self.start[closing],
+                    "max": self.max[closing],
+                    "mean": self.sum[closing] / self.count[closing],
+                    "above": self.above[closing],
+                    "count": self.count[closing],
+                },
+            )
+
+        self.start[rolled_slots] = starts[rolled]
+        self.max[rolled_slots] = -np.inf
+        self.sum[rolled_slots] = 0
+        self.count[rolled_slots] = 0
+        self.above[rolled_slots] = 0
+        return rolled, previous
+
+    def update(self, slots, now, spreads, last_time, held):
+        """
+        写入一批采样
+        :param slots: 不重复的槽位
+        :param last_time: 各槽位上一次采样的时间
+        :param held: 上一次采样高于阈值为 1，否则为 0，该状态保持到 now
+
+        保持的时间依次计入旧桶（到桶结束为止）、中间整段没有采样的桶（合并为一行）和新桶。
+        """
+        bucket_end = self.start[slots] + self.width
+        self.above[slots] += (
+            np.maximum(np.minimum(now, bucket_end) - last_time, 0) * held
+        )
+        rolled, previous = self.roll(slots, now)
+
+        new_start = self.start[slots]
+        gap_start = previous + self.width
+        gap = (previous >= 0) & (new_start[rolled] > gap_start) & (held[rolled] > 0)
+        if gap.any():
+            self.ring.append(
+                slots[rolled][gap],
+                {
+                    "timestamp": gap_start[gap],
+                    "max": np.nan,
+                    "mean": np.nan,
+                    "above": new_start[rolled][gap] - gap_start[gap],
+                    "count": 0,
+                },
+            )
+
+        carried = np.where(rolled, now - np.maximum(new_start, last_time), 0) * held
+        self.max[slots] = np.maximum(self.max[slots], spreads)
+        self.sum[slots] += spreads
+        self.count[slots] += 1
+        self.above[slots] += carried
+
+
+class SpillFile:
+    """
+    溢出文件
+
+    按固定大小预分配并 mmap 映射，写满一圈的环形缓冲段依次追加；当前文件写满后换下一个，
+    只保留最近 max_files 个文件，磁盘占用同样有上限。
+    """
+
+    def __init__(self, directory, prefix, file_size=64 << 20, max_files=16):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.file_size = file_size
+        self.max_files = max_files
+        self.files = deque()
+        self.index = 0
+        self.path = None
+        self.buffer = None
+        self.offset = 0
+
+    def open_next(self):
+        self.close()
+        self.path = os.path.join(self.directory, f"{self.prefix}-{self.index:06d}.hist")
+        self.index += 1
+        with open(self.path, "wb+") as f:
+            f.truncate(self.file_size)
+            self.buffer = mmap.mmap(f.fileno(), self.file_size)
+        self.buffer[: len(MAGIC)] = MAGIC
+        self.offset = len(MAGIC)
+        self.files.append(self.path)
+        while len(self.files) > self.max_files:
+            os.remove(self.files.popleft())
+
+    def write(self, resolution, slot, count, columns):
+        payload = b"".join(column.tobytes() for column in columns)
+        end = self.offset + SEGMENT.size + len(payload)
+        if self.buffer is None or end > self.file_size:
+            self.open_next()
+            end = self.offset + SEGMENT.size + len(payload)
+        SEGMENT.pack_into(self.buffer, self.offset, resolution, slot, count)
+        self.buffer[self.offset + SEGMENT.size : end] = payload
+        self.offset = end
+
+    def close(self):
+        """关闭当前文件，截去未使用的部分"""
+        if self.buffer is None:
+            return
+        self.buffer.flush()
+        self.buffer.close()
+        self.buffer = None
+        os.truncate(self.path, self.offset)
+
+
+def read_spill(path):
+    """
+    读取溢出文件
+    :return: 逐段返回 (分辨率, 槽位, {列名: 数组})
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"Not a history spill file: {path}")
+    offset = len(MAGIC)
+    while offset + SEGMENT.size <= len(data):
+        resolution, slot, count = SEGMENT.unpack_from(data, offset)
+        if count == 0:
+            break
+        offset += SEGMENT.size
+        columns = {}
+        for name, dtype in SCHEMAS[resolution]:
+            column = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            columns[name] = column
+            offset += column.nbytes
+        yield resolution, slot, columns
+
+
+class OpportunityHistory:
+    """
+    机会历史
+
+    每个槽位（交易对或三角组合）的价差时间序列，保存在预分配的列式环形缓冲中：
+    原始采样 (时间, 价差, 可成交数量)，以及 1 秒、1 分钟两级降采样
+    (最大价差, 平均价差, 高于阈值的时长)。各级缓冲写满一圈时整段溢出到 mmap 文件，
+    未设置溢出目录时直接覆盖，内存占用只与槽位数和 capacity 有关，与运行时长无关。
+
+    价差高于 threshold 视为机会存在。两次采样之间按前一次的状态保持：
+    - 持续时间：当前这次机会从出现到现在的时长
+    - 占比：最近约 window 秒内机会存在的时间比例（按时间加权的指数滑动平均）
+    二者由每个槽位的几个状态量直接算出，读取是 O(1) 的。
+
+    批量重算的路径（coalesce、columnar）用 record 一次写入所有重算过的槽位；
+    逐条行情重算的路径用 add 暂存，由调用方定期 flush()，暂存满 max_pending 条时也会写入。
+    """
+
+    def __init__(
+        self,
+        names,
+        threshold=0.001,
+        capacity=64,
+        spill_dir=None,
+        label="history",
+        window=60,
+        max_pending=4096,
+    ):
+        """
+        :param names: 各槽位的名称，溢出时一并写入 <前缀>.names.json
+        :param capacity: 各级环形缓冲每个槽位保留的条数
+        :param spill_dir: 溢出目录，None 表示不溢出
+        :param label: 溢出文件名前缀
+        :param window: 占比的时间窗口（秒）
+        """
+        if np is None:
+            raise ImportError(
+                "Opportunity history requires numpy, install it with `pip install numpy`"
+            )
+        size = len(names)
+        self.threshold = threshold
+        self.window = window * 1e3
+
+        self.spill = None
+        if spill_dir is not None:
+            prefix = f"{re.sub(r'[^0-9A-Za-z.]+', '_', label)}-{os.getpid()}"
+            self.spill = SpillFile(spill_dir, prefix)
+            with open(os.path.join(spill_dir, f"{prefix}.names.json"), "w") as f:
+                json.dump(list(names), f)
+
+        self.raw = Ring(size, capacity, RAW, self.spill)
+        self.seconds = Buckets(size, capacity, SECOND, self.spill)
+        self.minutes = Buckets(size, capacity, MINUTE, self.spill)
+
+        self.first_time = np.zeros(size)
+        self.last_time = np.zeros(size)
+        self.last_above = np.zeros(size, dtype=bool)
+        self.run_start = np.zeros(size)
+        self.persistence = np.zeros(size)
+
+        self.pending = []
+        self.max_pending = max_pending
+
+    def add(self, slot, now, spread, size=math.nan):
+        """暂存一条采样"""
+        self.pending.append((slot, now, spread, size))
+        if len(self.pending) >= self.max_pending:
+            self.flush()
+
+    def flush(self):
+        """写入暂存的采样，同一槽位的多条按先后分轮写入，每轮内槽位不重复"""
+        if not self.pending:
+            return
+        slots, times, spreads, sizes = (np.array(c) for c in zip(*self.pending))
+        self.pending = []
+        slots = slots.astype(np.intp)
+
+        order = np.argsort(slots, kind="stable")
+        ordered = slots[order]
+        first = np.ones(len(slots), dtype=bool)
+        first[1:] = ordered[1:] != ordered[:-1]
+        group_start = np.maximum.accumulate(np.where(first, np.arange(len(slots)), 0))
+        rank = np.empty(len(slots), dtype=np.intp)
+        rank[order] = np.arange(len(slots)) - group_start
+        for round_ in range(rank.max() + 1):
+            selected = rank == round_
+            self.record(
+                slots[selected], times[selected], spreads[selected], sizes[selected]
+            )
+
+    def record(self, slots, now, spreads, sizes=None):
+        """
+        :param slots: 本次重算过的槽位，不可重复
+        :param now: 本地时间（毫秒），标量或与 slots 对齐的数组
+        :param spreads: 与 slots 对齐的价差
+        :param sizes: 与 slots 对齐的可成交数量，None 表示没有数量信息
+        """
+        slots = np.asarray(slots, dtype=np.intp)
+        if not len(slots):
+            return
+        now = np.broadcast_to(np.asarray(now, dtype=np.float64), slots.shape)
+        spreads = np.asarray(spreads, dtype=np.float64)
+        above = spreads > self.threshold
+        last_time = self.last_time[slots]
+        last_above = self.last_above[slots]
+        seen = last_time > 0
+
+        started = above & ~last_above
+        self.run_start[slots[started]] = now[started]
+        decay = np.where(seen, np.exp(-(now - last_time) / self.window), 1.0)
+        self.persistence[slots] = self.persistence[slots] * decay + (1 - decay) * (
+            last_above
+        )
+        self.first_time[slots[~seen]] = now[~seen]
+        self.last_time[slots] = now
+        self.last_above[slots] = above
+
+        self.raw.append(
+            slots,
+            {
+                "timestamp": now,
+                "spread": spreads,
+                "size": math.nan if sizes is None else sizes,
+            },
+        )
+
+        # 上一次采样的状态保持到 now，两级降采样各自按桶切分
+        held = np.where(seen & last_above, 1.0, 0.0)
+        self.seconds.update(slots, now, spreads, last_time, held)
+        self.minutes.update(slots, now, spreads, last_time, held)
+
+    def duration(self, slot, now):
+        """当前这次机会已持续的毫秒数，没有机会时为 0"""
+        if not self.last_above[slot]:
+            return 0.0
+        return now - self.run_start[slot].item()
+
+    def persistence_at(self, slot, now):
+        """最近约 window 内机会存在的时间比例"""
+        last_time = self.last_time[slot].item()
+        if not last_time:
+            return 0.0
+        decay = math.exp(-(now - last_time) / self.window)
+        persistence = self.persistence[slot].item() * decay + (1 - decay) * bool(
+            self.last_above[slot]
+        )
+        # 滑动平均从 0 开始，刚开始采样时按已覆盖的权重修正
+        coverage = 1 - math.exp(-(now - self.first_time[slot].item()) / self.window)
+        return persistence / coverage if coverage > 0 else persistence
+
+    def annotate(self, slots, rows, now):
+        """
+        为 top() 的结果行加上 duration（毫秒）和 persistence（0-1）
+
+        只读取已写入的状态，不写入暂存的采样，需要时由调用方先 flush()；
+        与逐个调用 duration / persistence_at 的结果相同
+        """
+        slots = np.asarray(slots, dtype=np.intp)
+        if not len(slots):
+            return
+        last_time = self.last_time[slots]
+        last_above = self.last_above[slots]
+        durations = np.where(last_above, now - self.run_start[slots], 0.0)
+        decay = np.exp(-(now - last_time) / self.window)
+        persistence = self.persistence[slots] * decay + (1 - decay) * last_above
+        coverage = 1 - np.exp(-(now - self.first_time[slots]) / self.window)
+        persistence = np.divide(
+            persistence, coverage, out=persistence, where=coverage > 0
+        )
+        persistence[last_time == 0] = 0.0
+        for row, duration, value in zip(rows, durations.tolist(), persistence.tolist()):
+            row["duration"] = duration
+            row["persistence"] = value
+
+    def series(self, slot, resolution=RAW):
+        """内存中保留的某个槽位的历史，按时间顺序"""
+        self.flush()
+        if resolution == RAW:
+            return self.raw.series(slot)
+        buckets = self.seconds if resolution == SECOND else self.minutes
+        return buckets.ring.series(slot)
+
+    def close(self):
+        """把尚未溢出的数据写入溢出文件并关闭"""
+        self.flush()
+        if self.spill is None:
+            return
+        for ring in (self.raw, self.seconds.ring, self.minutes.ring):
+            ring.flush()
+        self.spill.close()
+
+
+def format_duration(ms):
+    if ms < 1000:
+        return f"{ms:.0f}ms"
+    if ms < 60000:
+        return f"{ms / 1000:.1f}s"
+    return f"{int(ms // 60000)}m{int(ms % 60000 // 1000):02d}s"
+
+
+# 面板中机会历史的列
+HISTORY_COLUMNS = ("持续", "占比")
+
+
+def history_cells(row):
+    duration = row["duration"]
+    return [
+        format_duration(duration) if duration else "-",
+        f"{row['persistence'] * 100:.0f}%",
+    ]
@@ -0,0 +1,37 @@
+from sortedcontainers import SortedList
+
+
+class RankIndex:
+    """
+    按分数降序维护的排名索引
+
+    分数变化时增量更新（O(log N)），top(n) 只需读取前 n 个元素，
+    避免每次刷新都对全部数据做一次完整排序。
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self.ranked = SortedList()
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __contains__(self, key):
+        return key in self.scores
+
+    def update(self, key, score):
+        old_score = self.scores.get(key)
+        if old_score is not None:
+            if old_score == score:
+                return
+            self.ranked.remove((-old_score, key))
+        self.scores[key] = score
+        self.ranked.add((-score, key))
+
+    def remove(self, key):
+        score = self.scores.pop(key, None)
+        if score is not None:
+            self.ranked.remove((-score, key))
+
+    def top(self, n):
+        return [key for _, key in self.ranked.islice(0, n)]
@@ -0,0 +1,95 @@
+import asyncio
+
+
+class TopWatcher:
+    """
+    按帧读取有变化的 top-N
+
+    monitor.wait_changed() 只表示收到了新行情，排名之外的交易对更新同样会触发。
+    每帧最多调用一次 top(n)，与上一次返回的结果比较，名次和各行内容都没有变化、
+    也没有新的提示时继续等待，调用方不做渲染或输出。
+    """
+
+    def __init__(self, monitor, top_n, fps=5):
+        self.monitor = monitor
+        self.top_n = top_n
+        self.interval = 1 / fps
+        self.last = None
+        self.skipped = 0
+
+    async def next(self, visible=None):
+        """
+        :param visible: 返回是否需要刷新的函数，不可见时只接收行情，不读取排名
+        :return: (rows, notices)
+        """
+        monitor = self.monitor
+        while True:
+            await asyncio.sleep(self.interval)
+            if visible is not None and not visible():
+                continue
+            await monitor.wait_changed()
+            rows = monitor.top(self.top_n)
+            notices = monitor.pop_notices()
+            # 三角监控的 dict 后端直接返回内部的行，需要拷贝后再保存
+            snapshot = [dict(row) for row in rows]
+            if snapshot != self.last or notices:
+                self.last = snapshot
+                return rows, notices
+            self.skipped += 1
+
+
+class TableRenderer:
+    """
+    DataTable 差量渲染
+
+    以行身份（交易对或组合名称）作为 row key，缓存每行上一次渲染的单元格；
+    刷新时只对内容变化的单元格调用 update_cell。排名变化时行不会被逐格改写，
+    只更新名次列，再按名次列重排一次。
+    """
+
+    def __init__(self, table, column_keys):
+        """
+        :param column_keys: 列 key，第一列为名次
+        """
+        self.table = table
+        self.column_keys = column_keys
+        self.cells = {}
+        self.order = []
+
+    def render(self, rows):
+        """
+        :param rows: 按名次排列的 (row_key, cells) 列表，cells 为已格式化的单元格
+        :return: 本次更新的单元格数量
+        """
+        table = self.table
+        updated = 0
+        order = []
+        for row_key, cells in rows:
+            order.append(row_key)
+            last = self.cells.get(row_key)
+            if last is None:
+                table.add_row(*cells, key=row_key)
+                self.cells[row_key] = list(cells)
+                updated += len(cells)
+                continue
+            for i, cell in enumerate(cells):
+                if last[i] != cell:
+                    table.update_cell(row_key, self.column_keys[i], cell)
+                    last[i] = cell
+                    updated += 1
+
+        if len(order) != len(self.cells):
+            keep = set(order)
+            for row_key in [key for key in self.cells if key not in keep]:
+                table.remove_row(row_key)
+                del self.cells[row_key]
+
+        if order != self.order:
+            table.sort(self.column_keys[0])
+            self.order = order
+        return updated
+
+    def clear(self):
+        self.table.clear()
+        self.cells.clear()
+        self.order = []
@@ -1,2 +1,4 @@
 from .orderbook import OrderbookMonitor
 from .ticker import TickerMonitor
+from .best import BestQuoteMonitor
+from .sharded import ShardedMonitor, create_monitor
@@ -1,159 +1,243 @@
+import math
 import time
 import traceback
 import asyncio
 import itertools
 
-from typing import Tuple, Dict
+from typing import List, Tuple
 from collections import defaultdict
 
-from seekoptrader.utils import create_exchange
+from seekoptrader.metrics import metrics
+from seekoptrader.utils import (
+    create_exchange,
+    clock_estimator,
+    exchange_clock,
+    exchange_registry,
+    index_markets,
+    load_markets,
+    market_cache,
+    refresh_markets,
+    release_exchange,
+    sync_clock,
+)
 
+from ...feedlog import (
+    FEED_KINDS,
+    ORDER_BOOK,
+    FeedRecorder,
+    preload_markets,
+    replay_feed,
+)
+from ...history import OpportunityHistory
+from ...ranking import RankIndex
+from ...subscription import SubscriptionPlanner
+from ...universe import fetch_scores, rank_by_liquidity
+from .columnar import ColumnarPairStore, np
 
-class MonitorBase:
-    def __init__(self, market_a, market_b, symbols=None, quote_currency="USDT"):
-        self.exchange_a_name, self.type_a, self.subtype_a = self.parse_market(market_a)
-        self.exchange_b_name, self.type_b, self.subtype_b = self.parse_market(market_b)
+# 交易对的两侧，行情日志中以下标记录
+SIDES = ("a", "b")
 
-        self.exchange_a = create_exchange(self.exchange_a_name)
-        self.exchange_b = create_exchange(self.exchange_b_name)
 
-        if symbols is not None:
-            self.symbols = symbols
-            self.quote_currency = None
-        else:
-            self.quote_currency = quote_currency
+def parse_market(market):
+    market_params = market.split(".")
+    if len(market_params) == 2:
+        exchange_name, type_ = market_params
+        return exchange_name, type_, None
+    elif len(market_params) == 3:
+        exchange_name, type_, subtype = market_params
+        return exchange_name, type_, subtype
+    else:
+        raise ValueError(
+            "Market parameter must match format as follows:"
+            "\t- <exchange>.<type> (e.g. binance.spot)"
+            "\t- <exchange>.<type>.<subtype> (e.g. okx.swap.linear)"
+        )
+
+
+def symbol_markets(index, type_, subtype, quote_currency=None, symbols=()):
+    """
+    从 index_markets 的索引中选出要监控的市场
+    :param quote_currency: 计价货币，为 None 时按 symbols 选取
+    :param symbols: <base>-<quote> 格式的交易对列表
+    :return: {(base, quote): [symbol, ...]}
+    """
+    if quote_currency is not None:
+        return index.get((type_, subtype, quote_currency), {})
+
+    markets = {}
+    for symbol in symbols:
+        if "-" not in symbol:
+            # 格式不对的条目直接跳过，命令行参数在解析时已经校验
+            continue
+        base, quote = symbol.rsplit("-", 1)
+        matched = index.get((type_, subtype, quote), {}).get((base, quote))
+        if matched:
+            markets[base, quote] = matched
+    return markets
+
+
+class FeedMonitorBase:
+    """
+    订阅行情的 monitor 的公共部分
 
-        self.symbol_map = defaultdict(dict)
-        self.pair_data: Dict[Tuple[str, str], dict] = {}
+    各行情来源按下标区分（两个市场的 monitor 为 'a'/'b'，多市场的 monitor 为市场序号），
+    每个来源有自己的订阅批次规划和订阅集合。这里负责对时、启动和迁移 watch 循环、
+    共享连接上的订阅计数、coalesce 统计以及停止时的清理，
+    子类实现 monitor（一个订阅批次的 watch 循环）和 unwatch。
+    """
+
+    # 订阅的行情类型，共享连接按此统计各 symbol 的订阅方
+    feed = None
+
+    def __init__(self, sources, label, coalesce=True, use_market_cache=True):
+        """
+        :param sources: [(来源下标, 交易所实例)]
+        :param label: 运行指标中价差重算耗时的名称
+        """
+        self.sources = list(sources)
+
+        # coalesce 模式下行情只标记脏槽位，价差在 top() 读取前统一重算一次
+        self.coalesce = coalesce
+        self.dirty = set()
+        self.stats = {"updates": 0, "recomputes": 0}
+        self.label = label
+        self.calculate_stats = metrics.calculate[label]
+        # 有新行情时置位，面板据此按帧率刷新，没有变化时不刷新
+        self.changed = asyncio.Event()
+
+        self.planners = {
+            index: SubscriptionPlanner(exchange.id) for index, exchange in self.sources
+        }
         self.monitor_tasks = []
         self.running = False
+        self.subscribed = {index: set() for index, _ in self.sources}
 
-        self.latencies = defaultdict(dict)
+        self.market_cache = market_cache if use_market_cache else None
+        self.startup = {}
+        self.created_at = time.perf_counter()
+        self.notices = []
+
+    def shared_exchanges(self):
+        """各来源用到的交易所，同一客户端只出现一次"""
+        return list(dict.fromkeys(exchange for _, exchange in self.sources))
 
     async def sync_time(self, exchange):
+        # 对时间隔由共享的时钟估计按稳定程度调整
+        estimator = clock_estimator(exchange)
         while self.running:
             try:
-                start_time = time.time() * 1000
-                server_time = await exchange.fetch_time()
-                end_time = time.time() * 1000
-
-                rtt = end_time - start_time
-                latency = rtt / 2
-                time_diff = end_time - (server_time + latency)
-
-                self.latencies[exchange.name.lower()] = {
-                    "latency": latency,
-                    "time_diff": time_diff,
-                }
+                # 其他 monitor 刚对过时则直接复用
+                await sync_clock(exchange, max_age=estimator.interval / 2)
             except Exception as e:
                 print(f"Excpetion: {traceback.format_exc()}")
-            await asyncio.sleep(10)
+            await estimator.wait()
 
-    def parse_market(self, market):
-        market_params = market.split(".")
-        if len(market_params) == 2:
-            exchange_name, type_ = market_params
-            return exchange_name, type_, None
-        elif len(market_params) == 3:
-            exchange_name, type_, subtype = market_params
-            return exchange_name, type_, subtype
-        else:
-            raise ValueError(
-                "Market parameter must match format as follows:"
-                "\t- <exchange>.<type> (e.g. binance.spot)"
-                "\t- <exchange>.<type>.<subtype> (e.g. okx.swap.linear)"
+    async def monitor(self, exchange, index, shard):
+        raise NotImplementedError("Method is not implemented")
+
+    async def watch_shard(self, exchange, index, shard):
+        """运行一个批次的 watch 循环，批次被 replan 清空丢弃后移除其运行指标"""
+        try:
+            await self.monitor(exchange, index, shard)
+        finally:
+            if not shard.symbols:
+                metrics.drop(exchange.id, self.feed, shard)
+
+    async def unwatch(self, exchange, symbols):
+        """取消不再需要的订阅，交易所不支持时保留连接，行情到达后直接忽略"""
+        raise NotImplementedError("Method is not implemented")
+
+    def feed_symbols(self, index):
+        """来源 index 要订阅的 symbol"""
+        return self.symbol_map[index]
+
+    def start_feeds(self):
+        """按 feed_symbols 订阅各来源的行情，并启动对时和批次迁移任务"""
+        self.monitor_tasks.extend(
+            asyncio.create_task(self.sync_time(exchange))
+            for exchange in self.shared_exchanges()
+        )
+        self.monitor_tasks.append(asyncio.create_task(self.rebalance()))
+        for index, exchange in self.sources:
+            symbols = self.feed_symbols(index)
+            self.subscribed[index] = set(symbols)
+            exchange_registry.subscribe(exchange, self.feed, self.subscribed[index])
+            self.monitor_tasks.extend(
+                asyncio.create_task(self.watch_shard(exchange, index, shard))
+                for shard in self.planners[index].plan(symbols)
             )
 
-    async def load_markets(self):
-        await self.exchange_a.load_markets()
-        await self.exchange_b.load_markets()
-
-        def format_markets(markets, type_, subtype):
-            new_markets = defaultdict(list)
-            for m in markets.values():
-                if (
-                    m["type"] == type_
-                    and (subtype is None or m[subtype])
-                    and (
-                        m["quote"] == self.quote_currency
-                        or (
-                            self.quote_currency is None
-                            and f"{m['base']}-{m['quote']}" in self.symbols
-                        )
+    async def rebalance(self, interval=10):
+        """定期按实际消息速率把负载过高的 watch 循环中的热点 symbol 迁移到其他批次"""
+        while self.running:
+            await asyncio.sleep(interval)
+            for index, exchange in self.sources:
+                planner = self.planners[index]
+                moves = planner.rebalance()
+                if not moves:
+                    continue
+                # 先取消原批次的订阅，再由目标批次重新订阅，避免同一 symbol 被推送两份；
+                # 共享连接上其他 monitor 仍在订阅的 symbol 不取消
+                moved = exchange_registry.exclusive(
+                    exchange, self.feed, [symbol for symbol, _ in moves]
+                )
+                if moved:
+                    await self.unwatch(exchange, moved)
+                for shard in planner.assign(moves):
+                    self.monitor_tasks.append(
+                        asyncio.create_task(self.watch_shard(exchange, index, shard))
                     )
-                ):
-                    new_markets[m["base"], m["quote"]].append(m["symbol"])
-            return new_markets
 
-        markets_a = format_markets(self.exchange_a.markets, self.type_a, self.subtype_a)
-        markets_b = format_markets(self.exchange_b.markets, self.type_b, self.subtype_b)
+    async def resubscribe(self, index, exchange, symbols):
+        """更新共享连接上的订阅计数，取消已没有任何使用方订阅的 symbol"""
+        symbols = set(symbols)
+        subscribed = self.subscribed[index]
+        exchange_registry.subscribe(exchange, self.feed, symbols - subscribed)
+        removable = exchange_registry.unsubscribe(
+            exchange, self.feed, subscribed - symbols
+        )
+        self.subscribed[index] = symbols
+        if removable:
+            await self.unwatch(exchange, removable)
 
-        keys = set(markets_a.keys()).intersection(set(markets_b.keys()))
-        pairs = [
-            {
-                "base": base,
-                "quote": quote,
-                "symbols_a": markets_a[(base, quote)],
-                "symbols_b": markets_b[(base, quote)],
-            }
-            for base, quote in keys
-        ]
-        self.symbol_map = self._build_symbol_map(pairs)
+    async def flush_history(self, interval=0.02):
+        """逐条行情暂存到 opportunities 的价差历史在后台定期写入，读取排名时不再写入"""
+        while self.running:
+            await asyncio.sleep(interval)
+            self.opportunities.flush()
 
-    def _build_symbol_map(self, pairs):
-        symbol_map = defaultdict(dict)
-        for pair in pairs:
-            for symbol_a, symbol_b in itertools.product(
-                pair["symbols_a"], pair["symbols_b"]
-            ):
-                pair_name = f"{symbol_a}-{symbol_b}"
-                if symbol_a not in symbol_map["a"]:
-                    symbol_map["a"][symbol_a] = {
-                        "index": "a",
-                        "pair_names": [pair_name],
-                    }
-                else:
-                    symbol_map["a"][symbol_a]["pair_names"].append(pair_name)
-                if symbol_b not in symbol_map["b"]:
-                    symbol_map["b"][symbol_b] = {
-                        "index": "b",
-                        "pair_names": [pair_name],
-                    }
-                else:
-                    symbol_map["b"][symbol_b]["pair_names"].append(pair_name)
-        return symbol_map
-
-    async def monitor(self, exchange, index, symbols):
-        raise NotImplementedError("Method is not implemented")
+    async def wait_changed(self):
+        """等待下一次行情更新，两次调用之间的更新合并为一次"""
+        await self.changed.wait()
+        self.changed.clear()
 
-    def top(self, n):
-        data = list(self.pair_data.values())
-        return sorted(data, key=lambda x: x["spread_pct"], reverse=True)[
-            : min(n, len(data))
-        ]
+    def pending(self):
+        """尚未重算的脏槽位数量"""
+        return len(self.dirty)
 
-    def start(self):
-        self.running = True
+    def coalesce_stats(self):
+        updates, recomputes = self.stats["updates"], self.stats["recomputes"]
+        return {
+            "updates": updates,
+            "recomputes": recomputes,
+            "saved": updates - recomputes - self.pending(),
+        }
 
-        batch_size = 50
-        a_symbols = list(self.symbol_map["a"].keys())
-        b_symbols = list(self.symbol_map["b"].keys())
-        self.monitor_tasks = [
-            asyncio.create_task(self.sync_time(self.exchange_a)),
-            asyncio.create_task(self.sync_time(self.exchange_b)),
-            *[
-                asyncio.create_task(
-                    self.monitor(self.exchange_a, "a", a_symbols[i : i + batch_size])
-                )
-                for i in range(0, len(a_symbols), batch_size)
-            ],
-            *[
-                asyncio.create_task(
-                    self.monitor(self.exchange_b, "b", b_symbols[i : i + batch_size])
-                )
-                for i in range(0, len(b_symbols), batch_size)
-            ],
-        ]
+    def notice(self, message):
+        """需要告知使用者的提示：面板以通知显示，无界面模式输出为 notice 事件"""
+        self.notices.append(message)
+        self.changed.set()
+
+    def pop_notices(self):
+        notices, self.notices = self.notices, []
+        return notices
+
+    def mark_first_row(self, rows):
+        if rows and "first_row_ms" not in self.startup:
+            self.startup["first_row_ms"] = (time.perf_counter() - self.created_at) * 1e3
+
+    def cleanup(self):
+        """watch 循环全部退出后释放录制文件等资源"""
 
     async def stop(self):
         """优雅关闭"""
@@ -164,6 +248,442 @@ class MonitorBase:
             await asyncio.gather(*self.monitor_tasks, return_exceptions=True)
         except asyncio.CancelledError:
             pass
+        self.cleanup()
+
+        # 共享连接上仍有其他使用方时，取消只有本 monitor 订阅的 symbol
+        for index, exchange in self.sources:
+            try:
+                if exchange_registry.refs(exchange) > 1:
+                    await self.resubscribe(index, exchange, ())
+            except Exception:
+                print(f"Excpetion: {traceback.format_exc()}")
+        for _, exchange in self.sources:
+            await release_exchange(exchange, self)
+
+
+class MonitorBase(FeedMonitorBase):
+    # 交易对数据中的数值字段，columnar 后端据此预分配数组
+    columns = ()
+    # 按市场区分的字段前缀，字段名为 f"{field}_{index}"
+    side_fields = ()
+    # opportunity_sizes 用到的字段
+    size_fields = ()
+
+    def __init__(
+        self,
+        market_a,
+        market_b,
+        symbols=None,
+        quote_currency="USDT",
+        backend="dict",
+        coalesce=True,
+        use_market_cache=True,
+        universe=None,
+        universe_metric="volume",
+        record=None,
+        replay=None,
+        replay_speed=1.0,
+        history=False,
+        history_threshold=0.001,
+        history_dir=None,
+    ):
+        """
+        :param universe: 只订阅流动性最好的 universe 个交易对，None 表示全部订阅
+        :param universe_metric: 流动性评分方式，volume 或 spread
+        :param record: 把收到的行情录制到该行情日志
+        :param replay: 从该行情日志回放，代替交易所的实时行情
+        :param replay_speed: 回放倍速，0 为尽快回放
+        :param history: 记录各交易对的价差历史，排名结果附带机会的持续时间和占比
+        :param history_threshold: 价差（spread_pct）高于该值视为存在机会
+        :param history_dir: 价差历史的溢出目录，None 表示不写文件
+        """
+        if replay and universe:
+            raise ValueError("universe is not supported when replaying a feed log")
+        self.exchange_a_name, self.type_a, self.subtype_a = self.parse_market(market_a)
+        self.exchange_b_name, self.type_b, self.subtype_b = self.parse_market(market_b)
+
+        self.exchange_a = create_exchange(self.exchange_a_name, self)
+        self.exchange_b = create_exchange(self.exchange_b_name, self)
+        super().__init__(
+            (("a", self.exchange_a), ("b", self.exchange_b)),
+            f"{self.feed} {market_a}/{market_b}",
+            coalesce,
+            use_market_cache,
+        )
+
+        self.symbols = symbols
+        self.quote_currency = quote_currency if symbols is None else None
+
+        # symbol_map[index][symbol] 为该 symbol 所在交易对的槽位元组，
+        # index（'a' 或 'b'）即该 symbol 在交易对中所处的一侧
+        self.symbol_map = {"a": {}, "b": {}}
+        self.pair_symbols: List[Tuple[str, str]] = []
+        self.pair_data: List[dict] = []
+        self.side_keys = {
+            index: tuple(f"{field}_{index}" for field in self.side_fields)
+            for index in ("a", "b")
+        }
+        self.ranking = RankIndex()
+
+        if backend not in ("dict", "columnar"):
+            raise ValueError(f"Unsupported backend: {backend}")
+        self.backend = backend
+        self.store = None
+
+        # 同一交易所的各 monitor 共享一份时钟偏差，sync_clock 原地更新
+        self.latencies = {
+            exchange.name.lower(): exchange_clock(exchange)
+            for exchange in (self.exchange_a, self.exchange_b)
+        }
+
+        self.universe = universe
+        self.universe_metric = universe_metric
+        self.universe_slots = None
+
+        self.record = record
+        self.recorder = None
+        self.replay = replay
+        self.replay_speed = replay_speed
+
+        self.history = history
+        self.history_threshold = history_threshold
+        self.history_dir = history_dir
+        self.opportunities = None
+
+        self.market_indexes = {}
+
+    def parse_market(self, market):
+        return parse_market(market)
+
+    async def load_markets(self):
+        start_time = time.perf_counter()
+        exchanges = (self.exchange_a, self.exchange_b)
+        if self.replay:
+            # 回放时市场来自日志，也不需要对时
+            preload_markets(self.replay, exchanges)
+            exchanges = ()
+        # 首次对时与市场加载、解析并行进行
+        clock_sync = asyncio.gather(
+            *(sync_clock(exchange) for exchange in exchanges),
+            return_exceptions=True,
+        )
+        try:
+            warm_a, warm_b = await asyncio.gather(
+                load_markets(self.exchange_a, self.type_a, self.market_cache),
+                load_markets(self.exchange_b, self.type_b, self.market_cache),
+            )
+
+            self.pair_symbols = await asyncio.to_thread(self._match_pairs)
+            self.symbol_map = self._build_symbol_map(self.pair_symbols)
+            self._init_pair_data()
+            if self.history:
+                self.opportunities = OpportunityHistory(
+                    [self.pair_name(slot) for slot in range(len(self.pair_symbols))],
+                    self.history_threshold,
+                    spill_dir=self.history_dir,
+                    label=self.label,
+                )
+            if self.universe:
+                self.apply_universe(await self.select_universe())
+        except BaseException:
+            # 市场加载失败时取消并回收尚未完成的对时请求
+            clock_sync.cancel()
+            await asyncio.gather(clock_sync, return_exceptions=True)
+            raise
+
+        self.startup = {
+            "warm": warm_a and warm_b,
+            "load_markets_ms": (time.perf_counter() - start_time) * 1e3,
+        }
+        await clock_sync
+
+    def _match_pairs(self):
+        self.market_indexes = {
+            "a": index_markets(self.exchange_a.markets),
+            "b": index_markets(self.exchange_b.markets),
+        }
+
+        def format_markets(index, type_, subtype):
+            return symbol_markets(
+                index, type_, subtype, self.quote_currency, self.symbols
+            )
+
+        markets_a = format_markets(
+            self.market_indexes["a"], self.type_a, self.subtype_a
+        )
+        markets_b = format_markets(
+            self.market_indexes["b"], self.type_b, self.subtype_b
+        )
+
+        keys = set(markets_a.keys()).intersection(set(markets_b.keys()))
+        return [
+            (symbol_a, symbol_b)
+            for key in keys
+            for symbol_a, symbol_b in itertools.product(markets_a[key], markets_b[key])
+        ]
+
+    async def reconcile_markets(self):
+        """使用缓存启动时，后台下载最新的市场数据，更新缓存并检查交易对是否变化"""
+        await refresh_markets(self.exchange_a, self.market_cache)
+        await refresh_markets(self.exchange_b, self.market_cache)
+
+        current = set(self.pair_symbols)
+        fresh = set(self._match_pairs())
+        if fresh != current:
+            self.notice(
+                f"{self.exchange_a_name}/{self.exchange_b_name} 市场列表已更新："
+                f"新增 {len(fresh - current)} 个交易对，"
+                f"下线 {len(current - fresh)} 个交易对，重启后生效"
+            )
+
+    def _build_symbol_map(self, pair_symbols, slots=None):
+        """预编译路由表：symbol -> 交易对槽位元组，行情到达时直接按槽位更新"""
+        if slots is None:
+            slots = range(len(pair_symbols))
+
+        symbol_map = {"a": defaultdict(list), "b": defaultdict(list)}
+        for slot in slots:
+            symbol_a, symbol_b = pair_symbols[slot]
+            symbol_map["a"][symbol_a].append(slot)
+            symbol_map["b"][symbol_b].append(slot)
+        return {
+            index: {symbol: tuple(slots) for symbol, slots in routes.items()}
+            for index, routes in symbol_map.items()
+        }
+
+    def _init_pair_data(self, board=None):
+        if self.backend == "columnar":
+            self.store = ColumnarPairStore(
+                len(self.pair_symbols), self.columns, board=board
+            )
+            self._route_symbol_map()
+        else:
+            self.pair_data = [
+                dict.fromkeys(self.columns, 0) for _ in range(len(self.pair_symbols))
+            ]
+
+    def _route_symbol_map(self):
+        for routes in self.symbol_map.values():
+            for symbol, slots in routes.items():
+                routes[symbol] = self.store.route(slots)
+
+    async def select_universe(self):
+        """批量拉取两侧行情快照，按较差一侧的流动性挑选交易对槽位"""
+        scores_a, scores_b = await asyncio.gather(
+            fetch_scores(
+                self.exchange_a,
+                {symbol_a for symbol_a, _ in self.pair_symbols},
+                self.universe_metric,
+            ),
+            fetch_scores(
+                self.exchange_b,
+                {symbol_b for _, symbol_b in self.pair_symbols},
+                self.universe_metric,
+            ),
+        )
+        items = {
+            slot: (
+                scores_a.get(symbol_a, -math.inf),
+                scores_b.get(symbol_b, -math.inf),
+            )
+            for slot, (symbol_a, symbol_b) in enumerate(self.pair_symbols)
+        }
+        return sorted(rank_by_liquidity(items, self.universe))
+
+    def apply_universe(self, slots):
+        """只保留 slots 槽位的路由，被移出的交易对不再出现在排名中"""
+        if self.universe_slots is not None:
+            pruned = sorted(set(self.universe_slots) - set(slots))
+            if self.store is not None:
+                self.store.active[pruned] = False
+            for slot in pruned:
+                self.ranking.remove(slot)
+                self.dirty.discard(slot)
+
+        self.universe_slots = slots
+        self.symbol_map = self._build_symbol_map(self.pair_symbols, slots)
+        if self.store is not None:
+            self._route_symbol_map()
+
+    async def rerank(self, interval=300):
+        """定期按流动性重新挑选交易对，在线替换订阅"""
+        while self.running:
+            await asyncio.sleep(interval)
+            try:
+                slots = await self.select_universe()
+            except Exception:
+                print(f"Excpetion: {traceback.format_exc()}")
+                continue
+            if slots == self.universe_slots:
+                continue
+
+            self.apply_universe(slots)
+            for index, exchange in (("a", self.exchange_a), ("b", self.exchange_b)):
+                for shard in self.planners[index].replan(self.symbol_map[index]):
+                    self.monitor_tasks.append(
+                        asyncio.create_task(self.watch_shard(exchange, index, shard))
+                    )
+                await self.resubscribe(index, exchange, self.symbol_map[index])
+
+    def attach(self, pair_symbols, slots, board):
+        """
+        多进程模式：只监控 pair_symbols 中的 slots 槽位，价差写入共享内存结果表
+        :param pair_symbols: 全量交易对列表，槽位编号与主进程一致
+        :param slots: 本进程负责的槽位
+        :param board: ResultBoard 实例
+        """
+        self.backend = "columnar"
+        self.pair_symbols = pair_symbols
+        self.symbol_map = self._build_symbol_map(pair_symbols, slots)
+        self._init_pair_data(board)
+
+    def pair_name(self, slot):
+        symbol_a, symbol_b = self.pair_symbols[slot]
+        return f"{symbol_a}-{symbol_b}"
+
+    def calculate_spread(self, slot):
+        raise NotImplementedError("Method is not implemented")
+
+    def calculate_spreads(self, columns, slots):
+        """columnar 后端的向量化价差计算"""
+        raise NotImplementedError("Method is not implemented")
+
+    def opportunity_sizes(self, values):
+        """
+        价差历史中记录的可成交数量，None 表示没有数量信息
+        :param values: 字段 -> 数值（pair_data 的一行）或与槽位对齐的数组（columnar 的列）
+        """
+        return None
+
+    def record_history(self, slots):
+        """把一批重算过的槽位（不重复）的价差写入价差历史"""
+        fields = ("spread_pct", *self.size_fields)
+        if self.store is not None:
+            values = {field: self.store.columns[field][slots] for field in fields}
+        else:
+            slots = list(slots)
+            rows = [self.pair_data[slot] for slot in slots]
+            values = {
+                field: np.array([row[field] for row in rows], dtype=float)
+                for field in fields
+            }
+        self.opportunities.record(
+            slots,
+            time.time() * 1e3,
+            values["spread_pct"],
+            self.opportunity_sizes(values),
+        )
+
+    def stage_history(self, slots):
+        """逐条行情重算时先暂存，读取排名前再批量写入"""
+        now = time.time() * 1e3
+        for slot in slots:
+            data = self.pair_data[slot]
+            size = self.opportunity_sizes(data)
+            self.opportunities.add(
+                slot, now, data["spread_pct"], math.nan if size is None else float(size)
+            )
+
+    def calculate_and_record(self, columns, slots):
+        self.calculate_spreads(columns, slots)
+        self.record_history(slots)
+
+    def mark_dirty(self, slots):
+        self.stats["updates"] += len(slots)
+        self.changed.set()
+        if self.store is not None:
+            self.store.touch(slots)
+        elif self.coalesce:
+            self.dirty.update(slots)
+        else:
+            for slot in slots:
+                self.calculate_spread(slot)
+            self.stats["recomputes"] += len(slots)
+            if self.opportunities is not None:
+                self.stage_history(slots)
+
+    def flush(self):
+        """重算所有脏槽位的价差"""
+        start = time.perf_counter_ns()
+        recomputes = self.stats["recomputes"]
+        if self.store is not None:
+            if self.opportunities is not None:
+                calculate = self.calculate_and_record
+            else:
+                calculate = self.calculate_spreads
+            self.stats["recomputes"] += self.store.recompute(calculate)
+        elif self.dirty:
+            for slot in self.dirty:
+                self.calculate_spread(slot)
+            self.stats["recomputes"] += len(self.dirty)
+            if self.opportunities is not None:
+                self.record_history(self.dirty)
+            self.dirty.clear()
+        if self.stats["recomputes"] != recomputes:
+            self.calculate_stats.record(time.perf_counter_ns() - start)
+
+    def pending(self):
+        if self.store is not None:
+            return int(self.store.dirty.sum())
+        return len(self.dirty)
+
+    def top(self, n):
+        self.flush()
+        if self.store is not None:
+            slots = self.store.top(n, "spread_pct")
+            rows = [self.store.row(slot) for slot in slots]
+        else:
+            slots = self.ranking.top(n)
+            rows = [dict(self.pair_data[slot]) for slot in slots]
+
+        for slot, row in zip(slots, rows):
+            row["pair_name"] = self.pair_name(slot)
+        if self.opportunities is not None:
+            # 逐条重算时暂存的采样由 flush_history 在后台写入，这里不补写
+            self.opportunities.annotate(slots, rows, time.time() * 1e3)
+
+        self.mark_first_row(rows)
+        return rows
+
+    def replay_message(self, kind, source, message, time_diff):
+        """回放一条录制的行情，见 feedlog.replay_feed"""
+        if kind != FEED_KINDS[self.feed]:
+            raise ValueError(f"Feed log does not match the {self.feed} monitor")
+        if kind == ORDER_BOOK:
+            self.process_order_book(message, SIDES[source], time_diff)
+        else:
+            self.process_ticker(message["symbol"], message, SIDES[source], time_diff)
+
+    def start(self):
+        self.running = True
+        self.monitor_tasks = []
+        if self.opportunities is not None and self.store is None and not self.coalesce:
+            self.monitor_tasks.append(asyncio.create_task(self.flush_history()))
+        if self.replay:
+            self.monitor_tasks.append(
+                asyncio.create_task(replay_feed(self, self.replay, self.replay_speed))
+            )
+            return
+        if self.record:
+            self.recorder = FeedRecorder(self.record)
+            for exchange, type_ in (
+                (self.exchange_a, self.type_a),
+                (self.exchange_b, self.type_b),
+            ):
+                self.recorder.markets(
+                    exchange,
+                    [m for m in exchange.markets.values() if m["type"] == type_],
+                )
+
+        if self.startup.get("warm"):
+            self.monitor_tasks.append(asyncio.create_task(self.reconcile_markets()))
+        if self.universe:
+            self.monitor_tasks.append(asyncio.create_task(self.rerank()))
+        self.start_feeds()
 
-        await self.exchange_a.close()
-        await self.exchange_b.close()
+    def cleanup(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.opportunities is not None:
+            self.opportunities.close()
@@ -0,0 +1,352 @@
+import time
+import asyncio
+import traceback
+
+from collections import defaultdict
+
+from sortedcontainers import SortedList
+
+from seekoptrader.metrics import metrics
+from seekoptrader.utils import (
+    create_exchange,
+    clock_estimator,
+    exchange_clock,
+    format_startup,
+    index_markets,
+    load_markets,
+    sync_clock,
+)
+
+from ...ranking import RankIndex
+from .base import FeedMonitorBase, parse_market, symbol_markets
+from .orderbook import OrderbookMonitor
+
+
+class BestQuotes:
+    """
+    一个 base/quote 在各市场的买一/卖一
+
+    买一价和卖一价分别保存在按价格排序的 SortedList 中，
+    某个市场的报价变化只需一次删除和一次插入（O(log N)），
+    最优的跨市场价差只需读取两端的元素。
+    """
+
+    __slots__ = ("sources", "bid", "ask", "elapsed_time", "bids", "asks")
+
+    def __init__(self, sources):
+        """
+        :param sources: 各报价来源的名称，按下标引用
+        """
+        self.sources = sources
+        self.bid = [0.0] * len(sources)
+        self.ask = [0.0] * len(sources)
+        self.elapsed_time = [0.0] * len(sources)
+        self.bids = SortedList()
+        self.asks = SortedList()
+
+    def update(self, source, bid, ask, elapsed_time):
+        old_bid = self.bid[source]
+        if old_bid != bid:
+            if old_bid:
+                self.bids.remove((old_bid, source))
+            if bid:
+                self.bids.add((bid, source))
+            self.bid[source] = bid
+
+        old_ask = self.ask[source]
+        if old_ask != ask:
+            if old_ask:
+                self.asks.remove((old_ask, source))
+            if ask:
+                self.asks.add((ask, source))
+            self.ask[source] = ask
+        self.elapsed_time[source] = elapsed_time
+
+    def best(self):
+        """
+        在不同市场买入（卖一价）和卖出（买一价）的最大价差
+        :return: (spread_pct, (bid, bid_source), (ask, ask_source))，报价不足时返回 None
+        """
+        if not self.bids or not self.asks:
+            return None
+
+        best_bid, best_ask = self.bids[-1], self.asks[0]
+        if best_bid[1] == best_ask[1]:
+            # 最优买卖价来自同一市场时，其中一侧退而取次优报价
+            candidates = []
+            if len(self.bids) > 1:
+                candidates.append((self.bids[-2], best_ask))
+            if len(self.asks) > 1:
+                candidates.append((best_bid, self.asks[1]))
+            if not candidates:
+                return None
+            best_bid, best_ask = max(candidates, key=lambda c: c[0][0] / c[1][0])
+        return (best_bid[0] - best_ask[0]) / best_ask[0], best_bid, best_ask
+
+
+class BestQuoteMonitor(FeedMonitorBase):
+    """
+    N 个市场的最优买卖价监控
+
+    按 base/quote 归并各市场的交易对，每个 base/quote 只维护一份 BestQuotes，
+    而不是 N² 个两两组合；行情更新为 O(log N)，排名沿用 RankIndex。
+    订阅、对时和停止等流程与两个市场的 monitor 相同，各市场以序号作为来源下标。
+    """
+
+    feed = "orderbook"
+
+    def __init__(
+        self,
+        markets,
+        symbols=None,
+        quote_currency="USDT",
+        coalesce=True,
+        use_market_cache=True,
+        feed="orderbook",
+    ):
+        """
+        :param markets: 市场列表，格式同 market_a，例如 ["binance.spot", "okx.spot"]
+        :param feed: 报价来源，orderbook 取盘口的买一/卖一，ticker 取行情中的 bid/ask
+        """
+        if len(markets) < 2:
+            raise ValueError("At least two markets are required")
+        if feed not in ("orderbook", "ticker"):
+            raise ValueError(f"Unsupported feed: {feed}")
+        self.feed = feed
+        self.markets = list(markets)
+        self.venues = [parse_market(market) for market in self.markets]
+        self.exchanges = [create_exchange(venue[0], self) for venue in self.venues]
+        super().__init__(
+            enumerate(self.exchanges),
+            f"best {' '.join(self.markets)}",
+            coalesce,
+            use_market_cache,
+        )
+
+        self.symbols = symbols
+        self.quote_currency = quote_currency if symbols is None else None
+
+        # symbol_map[venue][symbol] 为 (book, source)，即所属 base/quote 及其中的报价来源下标
+        self.symbol_map = [{} for _ in self.markets]
+        self.names = []
+        self.books = []
+        self.ranking = RankIndex()
+        self.clocks = [exchange_clock(exchange) for exchange in self.exchanges]
+
+    async def load_markets(self):
+        start_time = time.perf_counter()
+        clock_sync = asyncio.gather(
+            *(sync_clock(exchange) for exchange in self.shared_exchanges()),
+            return_exceptions=True,
+        )
+        try:
+            warm = await asyncio.gather(
+                *(
+                    load_markets(exchange, venue[1], self.market_cache)
+                    for exchange, venue in zip(self.exchanges, self.venues)
+                )
+            )
+            await asyncio.to_thread(self._match_books)
+        except BaseException:
+            # 市场加载失败时取消并回收尚未完成的对时请求
+            clock_sync.cancel()
+            await asyncio.gather(clock_sync, return_exceptions=True)
+            raise
+
+        self.startup = {
+            "warm": all(warm),
+            "load_markets_ms": (time.perf_counter() - start_time) * 1e3,
+        }
+        await clock_sync
+
+    def _match_books(self):
+        """按 base/quote 归并各市场的交易对，至少在两个市场上市的才纳入监控"""
+        sources = defaultdict(list)
+        for venue, (exchange, (_, type_, subtype)) in enumerate(
+            zip(self.exchanges, self.venues)
+        ):
+            markets = symbol_markets(
+                index_markets(exchange.markets),
+                type_,
+                subtype,
+                self.quote_currency,
+                self.symbols,
+            )
+            for key, symbols in markets.items():
+                for symbol in symbols:
+                    sources[key].append((venue, symbol))
+
+        for (base, quote), key_sources in sorted(sources.items()):
+            if len({venue for venue, _ in key_sources}) < 2:
+                continue
+            book = len(self.books)
+            labels = []
+            for source, (venue, symbol) in enumerate(key_sources):
+                self.symbol_map[venue][symbol] = (book, source)
+                label = self.markets[venue]
+                if sum(v == venue for v, _ in key_sources) > 1:
+                    label = f"{label}:{symbol}"
+                labels.append(label)
+            self.names.append(f"{base}/{quote}")
+            self.books.append(BestQuotes(labels))
+
+    async def monitor(self, exchange, venue, shard):
+        if self.feed == "ticker":
+            await self.monitor_tickers(exchange, venue, shard)
+            return
+
+        depths = OrderbookMonitor.support_depths.get(exchange.id, [None])
+        stats = metrics.feed(exchange.id, self.feed, shard)
+        estimator = clock_estimator(exchange)
+        while self.running and shard.symbols:
+            try:
+                order_book = await exchange.watch_order_book_for_symbols(
+                    shard.symbols, limit=depths[0]
+                )
+                estimator.observe(order_book["timestamp"])
+                self.planners[venue].record(order_book["symbol"])
+                start = time.perf_counter_ns()
+                self.process_order_book(
+                    order_book, venue, self.clocks[venue]["time_diff"]
+                )
+                stats.record(time.perf_counter_ns() - start)
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                metrics.error(exchange.id, self.feed, shard)
+                print(f"Excpetion({self.markets[venue]}): {traceback.format_exc()}")
+                await asyncio.sleep(5)
+
+    async def monitor_tickers(self, exchange, venue, shard):
+        stats = metrics.feed(exchange.id, self.feed, shard)
+        estimator = clock_estimator(exchange)
+        while self.running and shard.symbols:
+            try:
+                tickers = await exchange.watch_tickers(shard.symbols)
+                time_diff = self.clocks[venue]["time_diff"]
+                for symbol, ticker in tickers.items():
+                    estimator.observe(ticker["timestamp"])
+                    self.planners[venue].record(symbol)
+                    start = time.perf_counter_ns()
+                    self.process_ticker(symbol, ticker, venue, time_diff)
+                    stats.record(time.perf_counter_ns() - start)
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                metrics.error(exchange.id, self.feed, shard)
+                print(f"Excpetion({self.markets[venue]}): {traceback.format_exc()}")
+                await asyncio.sleep(5)
+
+    async def unwatch(self, exchange, symbols):
+        try:
+            if self.feed == "ticker":
+                await exchange.un_watch_tickers(symbols)
+            else:
+                await exchange.un_watch_order_book_for_symbols(symbols)
+        except Exception as e:
+            print(f"取消订阅失败: {e}")
+
+    def process_order_book(self, order_book, venue, time_diff):
+        bids, asks = order_book["bids"], order_book["asks"]
+        self.update_quote(
+            order_book["symbol"],
+            venue,
+            bids[0][0] if len(bids) else 0.0,
+            asks[0][0] if len(asks) else 0.0,
+            order_book["timestamp"],
+            time_diff,
+        )
+
+    def process_ticker(self, symbol, ticker, venue, time_diff):
+        self.update_quote(
+            symbol,
+            venue,
+            ticker["bid"] or 0.0,
+            ticker["ask"] or 0.0,
+            ticker["timestamp"],
+            time_diff,
+        )
+
+    def update_quote(self, symbol, venue, bid, ask, timestamp, time_diff):
+        route = self.symbol_map[venue].get(symbol)
+        if route is None:
+            return
+
+        book, source = route
+        self.books[book].update(
+            source, bid, ask, time.time() * 1e3 - (timestamp + time_diff)
+        )
+
+        self.stats["updates"] += 1
+        self.changed.set()
+        if self.coalesce:
+            self.dirty.add(book)
+        else:
+            self.calculate_spread(book)
+            self.stats["recomputes"] += 1
+
+    def calculate_spread(self, book):
+        best = self.books[book].best()
+        if best is None:
+            self.ranking.remove(book)
+        else:
+            self.ranking.update(book, best[0])
+
+    def flush(self):
+        if not self.dirty:
+            return
+        start = time.perf_counter_ns()
+        for book in self.dirty:
+            self.calculate_spread(book)
+        self.stats["recomputes"] += len(self.dirty)
+        self.dirty.clear()
+        self.calculate_stats.record(time.perf_counter_ns() - start)
+
+    def row(self, book):
+        quotes = self.books[book]
+        spread_pct, (bid, bid_source), (ask, ask_source) = quotes.best()
+        return {
+            "pair_name": self.names[book],
+            "spread_pct": spread_pct,
+            "bid_price": bid,
+            "bid_venue": quotes.sources[bid_source],
+            "ask_price": ask,
+            "ask_venue": quotes.sources[ask_source],
+            "venues": len(quotes.sources),
+            "elapsed_time": max(
+                quotes.elapsed_time[bid_source], quotes.elapsed_time[ask_source]
+            ),
+        }
+
+    def top(self, n):
+        self.flush()
+        rows = [self.row(book) for book in self.ranking.top(n)]
+        self.mark_first_row(rows)
+        return rows
+
+    def start(self):
+        self.running = True
+        self.monitor_tasks = []
+        self.start_feeds()
+
+
+async def run_monitor(markets):
+    monitor = BestQuoteMonitor(markets)
+
+    try:
+        await monitor.load_markets()
+        monitor.start()
+        while True:
+            print(monitor.top(5))
+            print(format_startup(monitor.startup))
+            await asyncio.sleep(10)
+    except BaseException as e:
+        print(f"监控已停止: {e}")
+        await monitor.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_monitor(["binance.spot", "okx.spot", "bybit.spot"]))
+    except KeyboardInterrupt:
+        print("程序已终止")
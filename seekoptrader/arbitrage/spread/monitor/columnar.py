@@ -0,0 +1,125 @@
+from multiprocessing.shared_memory import SharedMemory
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖，仅 columnar 后端需要
+    np = None
+
+
+class ResultBoard:
+    """
+    共享内存结果表
+
+    布局为 columns × size 的 float64 矩阵、size 个 active 标记，
+    以及每个工作进程的 (updates, recomputes) 计数。工作进程直接写入各自负责的槽位，
+    主进程按同样的布局映射后即可读取，无需序列化。
+    """
+
+    def __init__(self, size, columns, workers=1, name=None):
+        if np is None:
+            raise ImportError(
+                "The result board requires numpy, install it with `pip install numpy`"
+            )
+        self.size = size
+        self.column_names = tuple(columns)
+        self.workers = workers
+
+        matrix_bytes = len(self.column_names) * size * 8
+        stats_bytes = workers * 2 * 8
+        nbytes = max(1, matrix_bytes + stats_bytes + size)
+        if name is None:
+            self.shm = SharedMemory(create=True, size=nbytes)
+        else:
+            self.shm = SharedMemory(name=name)
+        self.owner = name is None
+
+        self.matrix = np.ndarray(
+            (len(self.column_names), size), dtype=np.float64, buffer=self.shm.buf
+        )
+        self.stats = np.ndarray(
+            (workers, 2), dtype=np.float64, buffer=self.shm.buf, offset=matrix_bytes
+        )
+        self.active = np.ndarray(
+            (size,), dtype=bool, buffer=self.shm.buf, offset=matrix_bytes + stats_bytes
+        )
+        if self.owner:
+            self.matrix[:] = 0
+            self.stats[:] = 0
+            self.active[:] = False
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def columns(self):
+        return {column: self.matrix[i] for i, column in enumerate(self.column_names)}
+
+    def close(self):
+        # 释放 numpy 视图后才能关闭共享内存，仍有外部视图时交由进程退出时回收
+        self.matrix = self.stats = self.active = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+        if self.owner:
+            self.shm.unlink()
+
+
+class ColumnarPairStore:
+    """
+    列式交易对存储
+
+    每个数值字段对应一个预分配的 NumPy 数组，按交易对槽位索引。
+    行情更新只写数组并标记脏槽位，价差在读取前一次性向量化重算，
+    top(n) 通过 argpartition 取前 n 名。
+    """
+
+    def __init__(self, size, columns, board=None):
+        if np is None:
+            raise ImportError(
+                "The columnar backend requires numpy, install it with `pip install numpy`"
+            )
+        if board is not None:
+            self.columns = board.columns()
+            self.active = board.active
+        else:
+            self.columns = {column: np.zeros(size) for column in columns}
+            self.active = np.zeros(size, dtype=bool)
+        self.dirty = np.zeros(size, dtype=bool)
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def route(self, slots):
+        return np.array(slots, dtype=np.intp)
+
+    def set(self, slots, column, value):
+        self.columns[column][slots] = value
+
+    def touch(self, slots):
+        self.active[slots] = True
+        self.dirty[slots] = True
+
+    def recompute(self, calculate):
+        """对所有脏槽位调用一次向量化计算函数 calculate(columns, slots)"""
+        slots = np.flatnonzero(self.dirty)
+        if len(slots):
+            calculate(self.columns, slots)
+            self.dirty[slots] = False
+        return len(slots)
+
+    def row(self, slot):
+        return {column: values[slot].item() for column, values in self.columns.items()}
+
+    def top(self, n, key):
+        slots = np.flatnonzero(self.active)
+        if n <= 0 or not len(slots):
+            return []
+
+        scores = -self.columns[key][slots]
+        if n < len(slots):
+            candidates = np.argpartition(scores, n - 1)[:n]
+        else:
+            candidates = np.arange(len(slots))
+        order = candidates[np.argsort(scores[candidates], kind="stable")]
+        return slots[order].tolist()
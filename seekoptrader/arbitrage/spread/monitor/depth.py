@@ -0,0 +1,53 @@
+class DepthCache:
+    """
+    单侧盘口的累计深度缓存，用于计算成交目标金额（计价币）的成交均价
+
+    只缓存到满足目标金额为止的档位及其累计成交额/数量。行情更新时从第一个
+    发生变化的档位开始重算，满足目标金额之后的档位变化直接忽略，
+    因此深度很深的盘口每次更新也只需要处理成交所需的前几档。
+    """
+
+    def __init__(self, notional):
+        if not notional > 0:
+            raise ValueError(f"Notional must be positive: {notional}")
+        self.notional = notional
+        self.levels = []
+        self.cum_notional = []
+        self.cum_amount = []
+        self.filled = False
+        self.vwap = 0
+
+    def update(self, levels):
+        cached = self.levels
+        k = 0
+        n = min(len(cached), len(levels))
+        while k < n and cached[k][0] == levels[k][0] and cached[k][1] == levels[k][1]:
+            k += 1
+
+        if k == len(cached) and self.filled:
+            return self.vwap
+
+        del cached[k:]
+        del self.cum_notional[k:]
+        del self.cum_amount[k:]
+        total_notional = self.cum_notional[-1] if k else 0.0
+        total_amount = self.cum_amount[-1] if k else 0.0
+
+        while total_notional < self.notional and k < len(levels):
+            price, amount = levels[k][0], levels[k][1]
+            total_notional += price * amount
+            total_amount += amount
+            cached.append((price, amount))
+            self.cum_notional.append(total_notional)
+            self.cum_amount.append(total_amount)
+            k += 1
+
+        self.filled = total_notional >= self.notional
+        if self.filled:
+            # 最后一档只成交一部分
+            price = cached[-1][0]
+            amount = total_amount - (total_notional - self.notional) / price
+            self.vwap = self.notional / amount
+        else:
+            self.vwap = 0
+        return self.vwap
@@ -2,87 +2,238 @@ import time
 import traceback
 import asyncio
 
-from .base import MonitorBase
+from seekoptrader.metrics import metrics
+from seekoptrader.utils import clock_estimator, format_startup
+
+from .base import SIDES, MonitorBase
+from .columnar import np
+from .depth import DepthCache
 
 
 class OrderbookMonitor(MonitorBase):
+    columns = (
+        "spread_pct",
+        "buy_a_sell_b_spread",
+        "buy_a_sell_b_spread_pct",
+        "buy_b_sell_a_spread",
+        "buy_b_sell_a_spread_pct",
+        "bid_price_a",
+        "bid_volume_a",
+        "ask_price_a",
+        "ask_volume_a",
+        "bid_price_b",
+        "bid_volume_b",
+        "ask_price_b",
+        "ask_volume_b",
+        "elapsed_time_a",
+        "elapsed_time_b",
+        "sized_spread_pct",
+        "sized_buy_a_sell_b_spread_pct",
+        "sized_buy_b_sell_a_spread_pct",
+        "vwap_bid_a",
+        "vwap_ask_a",
+        "vwap_bid_b",
+        "vwap_ask_b",
+    )
+    size_fields = (
+        "buy_a_sell_b_spread_pct",
+        "buy_b_sell_a_spread_pct",
+        "ask_volume_a",
+        "bid_volume_b",
+        "ask_volume_b",
+        "bid_volume_a",
+    )
+    side_fields = (
+        "bid_price",
+        "bid_volume",
+        "ask_price",
+        "ask_volume",
+        "elapsed_time",
+        "vwap_bid",
+        "vwap_ask",
+    )
+    feed = "orderbook"
+
     support_depths = {
-        "binance": [5],
+        "binance": [5, 10, 20],
         "bybit": [1, 50],
         "okx": [1, 50],
     }
 
-    async def monitor(self, exchange, index: str, symbols):
+    def __init__(self, *args, notional=None, **kwargs):
+        """
+        :param notional: 目标成交金额（计价币），设置后按盘口深度计算成交均价价差
+        """
+        super().__init__(*args, **kwargs)
+        self.notional = notional
+        self.depth_caches = {"a": {}, "b": {}}
+
+    def _init_pair_data(self, board=None):
+        super()._init_pair_data(board)
+        if self.notional:
+            self.depth_caches = {
+                index: {
+                    symbol: (DepthCache(self.notional), DepthCache(self.notional))
+                    for symbol in routes
+                }
+                for index, routes in self.symbol_map.items()
+            }
+
+    async def monitor(self, exchange, index: str, shard):
         """
         统一监控方法
         :param exchange: 交易所实例
         :param index: 来源索引 ('a'或'b')
+        :param shard: 订阅批次，symbol 列表可能在运行中被重新分配
         """
         exchange_name = exchange.name.lower()
-        limit = self.support_depths.get(exchange_name, [None])[0]
-        while self.running:
+        # 计算成交均价时需要更深的盘口
+        depths = self.support_depths.get(exchange_name, [None])
+        limit = depths[-1] if self.notional else depths[0]
+        stats = metrics.feed(exchange.id, self.feed, shard)
+        estimator = clock_estimator(exchange)
+        while self.running and shard.symbols:
             try:
                 order_book = await exchange.watch_order_book_for_symbols(
-                    symbols, limit=limit
-                )
-                await self.process_order_book(
-                    order_book, index, self.latencies[exchange_name].get("time_diff", 0)
+                    shard.symbols, limit=limit
                 )
+                estimator.observe(order_book["timestamp"])
+                self.planners[index].record(order_book["symbol"])
+                time_diff = self.latencies[exchange_name].get("time_diff", 0)
+                if self.recorder is not None:
+                    self.recorder.order_book(order_book, SIDES.index(index), time_diff)
+                start = time.perf_counter_ns()
+                self.process_order_book(order_book, index, time_diff)
+                stats.record(time.perf_counter_ns() - start)
             except asyncio.CancelledError:
                 break
             except Exception as e:
+                metrics.error(exchange.id, self.feed, shard)
                 print(f"Excpetion({index}): {traceback.format_exc()}")
                 await asyncio.sleep(5)
 
-    async def process_order_book(self, order_book, index, time_diff):
+    async def unwatch(self, exchange, symbols):
+        try:
+            await exchange.un_watch_order_book_for_symbols(symbols)
+        except Exception as e:
+            print(f"取消订阅失败: {e}")
+
+    def process_order_book(self, order_book, index, time_diff):
         symbol = order_book["symbol"]
-        if symbol not in self.symbol_map[index]:
+        slots = self.symbol_map[index].get(symbol)
+        if slots is None:
             return
 
-        pair_map = self.symbol_map[index][symbol]
-        pair_names = pair_map["pair_names"]
-        for pair_name in pair_names:
-            if pair_name not in self.pair_data:
-                self.pair_data[pair_name] = {
-                    "pair_name": pair_name,
-                    "spread_pct": 0,
-                    "buy_a_sell_b_spread_pct": 0,
-                    "buy_b_sell_a_spread_pct": 0,
-                    "bid_price_a": 0,
-                    "bid_volume_a": 0,
-                    "ask_price_a": 0,
-                    "ask_volume_a": 0,
-                    "bid_price_b": 0,
-                    "bid_volume_b": 0,
-                    "ask_price_b": 0,
-                    "ask_volume_b": 0,
-                    "elapsed_time_a": 0,
-                    "elapsed_time_b": 0,
-                }
+        bids, asks = order_book["bids"], order_book["asks"]
+        (
+            bid_price_key,
+            bid_volume_key,
+            ask_price_key,
+            ask_volume_key,
+            elapsed_time_key,
+            vwap_bid_key,
+            vwap_ask_key,
+        ) = self.side_keys[index]
+        elapsed_time = time.time() * 1e3 - (order_book["timestamp"] + time_diff)
+
+        if self.notional:
+            bid_cache, ask_cache = self.depth_caches[index][symbol]
+            vwap_bid = bid_cache.update(bids)
+            vwap_ask = ask_cache.update(asks)
+
+        if self.store is not None:
+            store = self.store
+            if len(bids):
+                store.set(slots, bid_price_key, bids[0][0])
+                store.set(slots, bid_volume_key, bids[0][1])
+            if len(asks):
+                store.set(slots, ask_price_key, asks[0][0])
+                store.set(slots, ask_volume_key, asks[0][1])
+            store.set(slots, elapsed_time_key, elapsed_time)
+            if self.notional:
+                store.set(slots, vwap_bid_key, vwap_bid)
+                store.set(slots, vwap_ask_key, vwap_ask)
+            self.mark_dirty(slots)
+            return
+
+        for slot in slots:
+            data = self.pair_data[slot]
+            if len(bids):
+                data[bid_price_key] = bids[0][0]
+                data[bid_volume_key] = bids[0][1]
+            if len(asks):
+                data[ask_price_key] = asks[0][0]
+                data[ask_volume_key] = asks[0][1]
+            data[elapsed_time_key] = elapsed_time
+            if self.notional:
+                data[vwap_bid_key] = vwap_bid
+                data[vwap_ask_key] = vwap_ask
+        self.mark_dirty(slots)
+
+    def calculate_spreads(self, columns, slots):
+        bid_a = columns["bid_price_a"][slots]
+        ask_a = columns["ask_price_a"][slots]
+        bid_b = columns["bid_price_b"][slots]
+        ask_b = columns["ask_price_b"][slots]
 
-            if len(order_book["bids"]):
-                self.pair_data[pair_name][f"bid_price_{index}"] = order_book["bids"][0][
-                    0
-                ]
-                self.pair_data[pair_name][f"bid_volume_{index}"] = order_book["bids"][
-                    0
-                ][1]
-
-            if len(order_book["asks"]):
-                self.pair_data[pair_name][f"ask_price_{index}"] = order_book["asks"][0][
-                    0
-                ]
-                self.pair_data[pair_name][f"ask_volume_{index}"] = order_book["asks"][
-                    0
-                ][1]
-
-            self.pair_data[pair_name][f"elapsed_time_{index}"] = time.time() * 1e3 - (
-                order_book["timestamp"] + time_diff
-            )
-            await self.calculate_spread(pair_name)
-
-    async def calculate_spread(self, pair_name):
-        data = self.pair_data[pair_name]
+        ready = (bid_a != 0) & (ask_a != 0) & (bid_b != 0) & (ask_b != 0)
+        slots = slots[ready]
+        bid_a, ask_a, bid_b, ask_b = (
+            bid_a[ready],
+            ask_a[ready],
+            bid_b[ready],
+            ask_b[ready],
+        )
+
+        buy_b_sell_a_spread = bid_a - ask_b
+        buy_a_sell_b_spread = bid_b - ask_a
+        buy_b_sell_a_spread_pct = buy_b_sell_a_spread / ask_b
+        buy_a_sell_b_spread_pct = buy_a_sell_b_spread / ask_a
+
+        columns["buy_b_sell_a_spread"][slots] = buy_b_sell_a_spread
+        columns["buy_b_sell_a_spread_pct"][slots] = buy_b_sell_a_spread_pct
+        columns["buy_a_sell_b_spread"][slots] = buy_a_sell_b_spread
+        columns["buy_a_sell_b_spread_pct"][slots] = buy_a_sell_b_spread_pct
+        columns["spread_pct"][slots] = np.maximum(
+            buy_b_sell_a_spread_pct, buy_a_sell_b_spread_pct
+        )
+
+        if self.notional:
+            self.calculate_sized_spreads(columns, slots)
+
+    def opportunity_sizes(self, values):
+        """价差较大的方向上，两条腿一档数量的较小值"""
+        return np.where(
+            values["buy_a_sell_b_spread_pct"] >= values["buy_b_sell_a_spread_pct"],
+            np.minimum(values["ask_volume_a"], values["bid_volume_b"]),
+            np.minimum(values["ask_volume_b"], values["bid_volume_a"]),
+        )
+
+    def calculate_sized_spreads(self, columns, slots):
+        bid_a = columns["vwap_bid_a"][slots]
+        ask_a = columns["vwap_ask_a"][slots]
+        bid_b = columns["vwap_bid_b"][slots]
+        ask_b = columns["vwap_ask_b"][slots]
+
+        ready = (bid_a != 0) & (ask_a != 0) & (bid_b != 0) & (ask_b != 0)
+        slots = slots[ready]
+        bid_a, ask_a, bid_b, ask_b = (
+            bid_a[ready],
+            ask_a[ready],
+            bid_b[ready],
+            ask_b[ready],
+        )
+
+        buy_b_sell_a_spread_pct = (bid_a - ask_b) / ask_b
+        buy_a_sell_b_spread_pct = (bid_b - ask_a) / ask_a
+        columns["sized_buy_b_sell_a_spread_pct"][slots] = buy_b_sell_a_spread_pct
+        columns["sized_buy_a_sell_b_spread_pct"][slots] = buy_a_sell_b_spread_pct
+        columns["sized_spread_pct"][slots] = np.maximum(
+            buy_b_sell_a_spread_pct, buy_a_sell_b_spread_pct
+        )
+
+    def calculate_spread(self, slot):
+        data = self.pair_data[slot]
         try:
             if (
                 data["ask_price_a"]
@@ -101,8 +252,25 @@ class OrderbookMonitor(MonitorBase):
                 data["spread_pct"] = max(
                     data["buy_b_sell_a_spread_pct"], data["buy_a_sell_b_spread_pct"]
                 )
+            if (
+                data["vwap_ask_a"]
+                and data["vwap_bid_a"]
+                and data["vwap_ask_b"]
+                and data["vwap_bid_b"]
+            ):
+                data["sized_buy_b_sell_a_spread_pct"] = (
+                    data["vwap_bid_a"] - data["vwap_ask_b"]
+                ) / data["vwap_ask_b"]
+                data["sized_buy_a_sell_b_spread_pct"] = (
+                    data["vwap_bid_b"] - data["vwap_ask_a"]
+                ) / data["vwap_ask_a"]
+                data["sized_spread_pct"] = max(
+                    data["sized_buy_b_sell_a_spread_pct"],
+                    data["sized_buy_a_sell_b_spread_pct"],
+                )
         except (TypeError, ZeroDivisionError) as e:
-            print(f"Calculate spread error for {pair_name}: {str(e)}")
+            print(f"Calculate spread error for {self.pair_name(slot)}: {str(e)}")
+        self.ranking.update(slot, data["spread_pct"])
 
 
 async def run_monitor(market_a, market_b, symbols=None):
@@ -113,6 +281,8 @@ async def run_monitor(market_a, market_b, symbols=None):
         monitor.start()
         while True:
             print(monitor.top(5))
+            print(format_startup(monitor.startup))
+            print(monitor.coalesce_stats())
             await asyncio.sleep(10)
     except BaseException as e:
         print(f"监控已停止: {e}")
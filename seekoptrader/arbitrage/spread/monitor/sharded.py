@@ -0,0 +1,186 @@
+import time
+import asyncio
+import multiprocessing
+import traceback
+
+from collections import defaultdict
+
+from seekoptrader.utils import load_markets, release_exchange
+
+from .columnar import ColumnarPairStore, ResultBoard
+
+
+def split_slots(groups, workers):
+    """把交易对分组按大小贪心分配给各工作进程，同一分组的 symbol 只在一个进程订阅"""
+    buckets = [[] for _ in range(workers)]
+    for group in sorted(groups, key=len, reverse=True):
+        min(buckets, key=len).extend(group)
+    return [sorted(bucket) for bucket in buckets]
+
+
+def run_worker(**kwargs):
+    asyncio.run(_worker(**kwargs))
+
+
+async def _worker(
+    monitor_class, params, pair_symbols, slots, board_name, workers, worker, stop
+):
+    board = ResultBoard(
+        len(pair_symbols), monitor_class.columns, workers=workers, name=board_name
+    )
+    monitor = monitor_class(**params)
+    try:
+        await load_markets(monitor.exchange_a, monitor.type_a, monitor.market_cache)
+        await load_markets(monitor.exchange_b, monitor.type_b, monitor.market_cache)
+        monitor.attach(pair_symbols, slots, board)
+        monitor.start()
+        while not stop.is_set():
+            await asyncio.sleep(0.1)
+            monitor.flush()
+            board.stats[worker] = (
+                monitor.stats["updates"],
+                monitor.stats["recomputes"],
+            )
+    except Exception:
+        print(f"Worker {worker} exception: {traceback.format_exc()}")
+    finally:
+        await monitor.stop()
+        monitor.store = None
+        board.close()
+
+
+class ShardedMonitor:
+    """
+    多进程价差监控
+
+    主进程只负责加载市场并切分交易对，每个工作进程运行一个只负责部分交易对的
+    monitor_class 实例，价差写入共享内存结果表；top() 直接读取结果表。
+    设置 universe 时只在启动时按流动性筛选一次，运行中不再重新排名。
+    """
+
+    def __init__(self, monitor_class, workers, **params):
+        if params.get("record") or params.get("replay"):
+            # 各进程各自接收行情，无法写入或回放同一份行情日志
+            raise ValueError("Feed record/replay is not supported with workers")
+        if params.get("history"):
+            raise ValueError("Opportunity history is not supported with workers")
+        self.monitor_class = monitor_class
+        self.workers = workers
+        self.params = params
+        self.params["backend"] = "columnar"
+
+        self.pair_symbols = []
+        self.worker_slots = []
+        self.board = None
+        self.store = None
+        self.processes = []
+        self.stop_event = None
+        self.updates = 0
+        self.startup = {}
+        self.created_at = time.perf_counter()
+
+    async def load_markets(self):
+        monitor = self.monitor_class(**self.params)
+        try:
+            await monitor.load_markets()
+            self.pair_symbols = monitor.pair_symbols
+            self.startup = monitor.startup
+
+            slots = monitor.universe_slots
+            if slots is None:
+                slots = range(len(self.pair_symbols))
+
+            groups = defaultdict(list)
+            for slot in slots:
+                market = monitor.exchange_a.markets[self.pair_symbols[slot][0]]
+                groups[market["base"], market["quote"]].append(slot)
+            self.worker_slots = split_slots(groups.values(), self.workers)
+        finally:
+            await release_exchange(monitor.exchange_a, monitor)
+            await release_exchange(monitor.exchange_b, monitor)
+
+        self.board = ResultBoard(
+            len(self.pair_symbols), self.monitor_class.columns, workers=self.workers
+        )
+        self.store = ColumnarPairStore(
+            len(self.pair_symbols), self.monitor_class.columns, board=self.board
+        )
+
+    def pair_name(self, slot):
+        symbol_a, symbol_b = self.pair_symbols[slot]
+        return f"{symbol_a}-{symbol_b}"
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        self.stop_event = context.Event()
+        self.processes = [
+            context.Process(
+                target=run_worker,
+                kwargs={
+                    "monitor_class": self.monitor_class,
+                    # 交易对已在主进程按流动性筛选，工作进程不再重新排名
+                    "params": {**self.params, "universe": None},
+                    "pair_symbols": self.pair_symbols,
+                    "slots": slots,
+                    "board_name": self.board.name,
+                    "workers": self.workers,
+                    "worker": i,
+                    "stop": self.stop_event,
+                },
+                daemon=True,
+            )
+            for i, slots in enumerate(self.worker_slots)
+            if slots
+        ]
+        for process in self.processes:
+            process.start()
+
+    async def wait_changed(self, poll=0.05):
+        """工作进程的行情计数变化即视为有更新"""
+        while True:
+            updates = self.board.stats[:, 0].sum()
+            if updates != self.updates:
+                self.updates = updates
+                return
+            await asyncio.sleep(poll)
+
+    def pop_notices(self):
+        """工作进程中的提示不回传主进程"""
+        return []
+
+    def coalesce_stats(self):
+        updates, recomputes = self.board.stats.sum(axis=0)
+        return {
+            "updates": int(updates),
+            "recomputes": int(recomputes),
+            "saved": int(updates - recomputes),
+        }
+
+    def top(self, n):
+        slots = self.store.top(n, "spread_pct")
+        rows = [self.store.row(slot) for slot in slots]
+        for slot, row in zip(slots, rows):
+            row["pair_name"] = self.pair_name(slot)
+
+        if rows and "first_row_ms" not in self.startup:
+            self.startup["first_row_ms"] = (time.perf_counter() - self.created_at) * 1e3
+        return rows
+
+    async def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+        for process in self.processes:
+            await asyncio.to_thread(process.join, 10)
+            if process.is_alive():
+                process.terminate()
+
+        if self.board is not None:
+            self.store = None
+            self.board.close()
+            self.board = None
+
+
+def create_monitor(monitor_class, workers=1, **params):
+    if workers > 1:
+        return ShardedMonitor(monitor_class, workers, **params)
+    return monitor_class(**params)
@@ -1,59 +1,97 @@
 import time
 import asyncio
 
-from .base import MonitorBase
+from seekoptrader.metrics import metrics
+from seekoptrader.utils import clock_estimator
+
+from .base import SIDES, MonitorBase
+from .columnar import np
 
 
 class TickerMonitor(MonitorBase):
-    async def monitor(self, exchange, index: str, symbols):
+    columns = (
+        "spread",
+        "spread_pct",
+        "price_a",
+        "price_b",
+        "elapsed_time_a",
+        "elapsed_time_b",
+    )
+    side_fields = ("price", "elapsed_time")
+    feed = "ticker"
+
+    async def monitor(self, exchange, index: str, shard):
         """
         统一监控方法
         :param exchange: 交易所实例
         :param index: 来源索引 ('a'或'b')
+        :param shard: 订阅批次，symbol 列表可能在运行中被重新分配
         """
         exchange_name = exchange.name.lower()
-        while self.running:
+        stats = metrics.feed(exchange.id, self.feed, shard)
+        estimator = clock_estimator(exchange)
+        while self.running and shard.symbols:
             try:
-                tickers = await exchange.watch_tickers(symbols)
+                tickers = await exchange.watch_tickers(shard.symbols)
+                time_diff = self.latencies[exchange_name].get("time_diff", 0)
                 for symbol, ticker in tickers.items():
-                    await self.process_ticker(
-                        symbol,
-                        ticker,
-                        index,
-                        self.latencies[exchange_name].get("time_diff", 0),
-                    )
+                    estimator.observe(ticker["timestamp"])
+                    self.planners[index].record(symbol)
+                    if self.recorder is not None:
+                        self.recorder.ticker(
+                            symbol, ticker, SIDES.index(index), time_diff
+                        )
+                    start = time.perf_counter_ns()
+                    self.process_ticker(symbol, ticker, index, time_diff)
+                    stats.record(time.perf_counter_ns() - start)
             except asyncio.CancelledError:
                 break
             except Exception as e:
+                metrics.error(exchange.id, self.feed, shard)
                 print(f"Excpetion({index}): {str(e)}")
                 await asyncio.sleep(5)
 
-    async def process_ticker(self, symbol, ticker, index, time_diff):
-        if symbol not in self.symbol_map[index]:
+    async def unwatch(self, exchange, symbols):
+        try:
+            await exchange.un_watch_tickers(symbols)
+        except Exception as e:
+            print(f"取消订阅失败: {e}")
+
+    def process_ticker(self, symbol, ticker, index, time_diff):
+        slots = self.symbol_map[index].get(symbol)
+        if slots is None:
             return
 
-        pair_map = self.symbol_map[index][symbol]
-        pair_names = pair_map["pair_names"]
-        for pair_name in pair_names:
-            if pair_name not in self.pair_data:
-                self.pair_data[pair_name] = {
-                    "pair_name": pair_name,
-                    "spread": 0,
-                    "spread_pct": 0,
-                    "price_a": 0,
-                    "price_b": 0,
-                    "elapsed_time_a": 0,
-                    "elapsed_time_b": 0,
-                }
-            self.pair_data[pair_name][f"price_{index}"] = ticker["last"]
-            self.pair_data[pair_name][f"elapsed_time_{index}"] = time.time() * 1e3 - (
-                ticker["timestamp"] + time_diff
-            )
+        price_key, elapsed_time_key = self.side_keys[index]
+        price = ticker["last"]
+        elapsed_time = time.time() * 1e3 - (ticker["timestamp"] + time_diff)
+
+        if self.store is not None:
+            self.store.set(slots, price_key, price or 0)
+            self.store.set(slots, elapsed_time_key, elapsed_time)
+            self.mark_dirty(slots)
+            return
+
+        for slot in slots:
+            data = self.pair_data[slot]
+            data[price_key] = price
+            data[elapsed_time_key] = elapsed_time
+        self.mark_dirty(slots)
+
+    def calculate_spreads(self, columns, slots):
+        price_a = columns["price_a"][slots]
+        price_b = columns["price_b"][slots]
+
+        ready = (price_a != 0) & (price_b != 0)
+        slots = slots[ready]
+        price_a, price_b = price_a[ready], price_b[ready]
 
-            await self.calculate_spread(pair_name)
+        spread = np.abs(price_a - price_b)
+        columns["spread"][slots] = spread
+        columns["spread_pct"][slots] = spread / np.minimum(price_a, price_b)
 
-    async def calculate_spread(self, pair_key):
-        data = self.pair_data[pair_key]
+    def calculate_spread(self, slot):
+        data = self.pair_data[slot]
         try:
             if data["price_a"] and data["price_b"]:
                 min_price = min(data["price_a"], data["price_b"])
@@ -62,4 +100,5 @@ class TickerMonitor(MonitorBase):
                 data["spread"] = spread
                 data["spread_pct"] = spread_pct
         except (TypeError, ZeroDivisionError) as e:
-            print(f"Calculate spread error for {pair_key}: {str(e)}")
+            print(f"Calculate spread error for {self.pair_name(slot)}: {str(e)}")
+        self.ranking.update(slot, data["spread_pct"])
@@ -1,2 +1,3 @@
 from .orderbook import OrderbookPanel
 from .ticker import TickerPanel
+from .best import BestQuotePanel
@@ -0,0 +1,91 @@
+import asyncio
+
+from textual.app import ComposeResult
+from textual.widgets import DataTable, Static
+
+from seekoptrader.utils import format_startup
+
+from ...render import TableRenderer, TopWatcher
+from ..monitor import BestQuoteMonitor
+
+
+class BestQuotePanel(Static):
+    def __init__(self, *args, monitor_params=None, **kwargs):
+        """
+        :param monitor_params: 本面板的监控参数，默认使用 app.monitor_params
+        """
+        super().__init__(*args, **kwargs)
+        self.monitor_params = monitor_params
+
+    def compose(self) -> ComposeResult:
+        yield DataTable()
+
+    def _format_row(self, index, row):
+        return (
+            index,
+            row["pair_name"],
+            f"{(row['spread_pct'] * 100):4f}%",
+            row["ask_venue"],
+            str(row["ask_price"]),
+            row["bid_venue"],
+            str(row["bid_price"]),
+            row["venues"],
+            f"{row['elapsed_time']:2f}ms",
+        )
+
+    async def load_data(self):
+        top_n = self.monitor_params["top_n"]
+        params = self.monitor_params.copy()
+        del params["top_n"]
+        fps = params.pop("fps", 5)
+
+        monitor = BestQuoteMonitor(**params)
+
+        renderer = TableRenderer(self.query_one(DataTable), self.column_keys)
+        try:
+            await monitor.load_markets()
+            self.app.notify(format_startup(monitor.startup))
+            monitor.start()
+            first_row = False
+            watcher = TopWatcher(monitor, top_n, fps)
+            while True:
+                # 两帧之间的更新合并为一次刷新，排名和显示内容都没有变化时不刷新；
+                # 不可见的面板只接收行情，不读取排名、不刷新表格
+                data, notices = await watcher.next(lambda: self.is_on_screen)
+                for message in notices:
+                    self.app.notify(message)
+                self.app.set_status(
+                    self,
+                    "价差重算 {recomputes} 次，合并节省 {saved} 次".format(
+                        **monitor.coalesce_stats()
+                    ),
+                )
+                if data and not first_row:
+                    first_row = True
+                    self.app.notify(format_startup(monitor.startup))
+                renderer.render(
+                    [
+                        (row["pair_name"], self._format_row(i, row))
+                        for i, row in enumerate(data)
+                    ]
+                )
+        except Exception:
+            pass
+        finally:
+            await monitor.stop()
+
+    async def on_mount(self):
+        if self.monitor_params is None:
+            self.monitor_params = self.app.monitor_params
+        self.column_keys = self.query_one(DataTable).add_columns(
+            "序号",
+            "交易对",
+            "价差（%）",
+            "买入市场",
+            "卖一价",
+            "卖出市场",
+            "买一价",
+            "市场数",
+            "实时",
+        )
+        asyncio.create_task(self.load_data())
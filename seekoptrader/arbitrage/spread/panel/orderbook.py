@@ -4,61 +4,34 @@ import click
 from textual.app import App, ComposeResult
 from textual.widgets import DataTable, Header, Footer, Static
 
-from ..monitor import OrderbookMonitor
+from seekoptrader.utils import format_startup
+
+from ...history import HISTORY_COLUMNS, history_cells
+from ...render import TableRenderer, TopWatcher
+from ..monitor import OrderbookMonitor, create_monitor
 
 
 class OrderbookPanel(Static):
+    def __init__(self, *args, monitor_params=None, **kwargs):
+        """
+        :param monitor_params: 本面板的监控参数，默认使用 app.monitor_params
+        """
+        super().__init__(*args, **kwargs)
+        self.monitor_params = monitor_params
+
     def compose(self) -> ComposeResult:
         yield DataTable()
 
-    def _add_or_update_row(self, table: DataTable, index, row):
-        row_key = str(index)
-        if index < table.row_count:
-            table.update_cell(row_key, self.column_keys[0], index)
-            table.update_cell(row_key, self.column_keys[1], row["pair_name"])
-            table.update_cell(
-                row_key, self.column_keys[2], f"{(row['spread_pct'] * 100):4f}%"
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[3],
-                f"{(row['buy_a_sell_b_spread_pct'] * 100):4f}%",
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[4],
-                f"{(row['buy_b_sell_a_spread_pct'] * 100):4f}%",
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[5],
-                f"{row['bid_price_a']}/{row['bid_volume_a']}",
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[6],
-                f"{row['ask_price_a']}/{row['ask_volume_a']}",
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[7],
-                f"{row['bid_price_b']}/{row['bid_volume_b']}",
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[8],
-                f"{row['ask_price_b']}/{row['ask_volume_b']}",
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[9],
-                f"{row['elapsed_time_a']:2f}ms/{row['elapsed_time_b']:2f}ms",
-            )
-        else:
-            table.add_row(
-                index,
-                row["pair_name"],
-                f"{row['spread_pct'] * 100:4f}%",
+    def _format_row(self, index, row):
+        cells = [
+            index,
+            row["pair_name"],
+            f"{(row['spread_pct'] * 100):4f}%",
+        ]
+        if self.notional:
+            cells.append(f"{(row['sized_spread_pct'] * 100):4f}%")
+        cells.extend(
+            [
                 f"{(row['buy_a_sell_b_spread_pct'] * 100):4f}%",
                 f"{(row['buy_b_sell_a_spread_pct'] * 100):4f}%",
                 f"{row['bid_price_a']}/{row['bid_volume_a']}",
@@ -66,37 +39,63 @@ class OrderbookPanel(Static):
                 f"{row['bid_price_b']}/{row['bid_volume_b']}",
                 f"{row['ask_price_b']}/{row['ask_volume_b']}",
                 f"{row['elapsed_time_a']:2f}ms/{row['elapsed_time_b']:2f}ms",
-                key=row_key,
-            )
+            ]
+        )
+        if self.history:
+            cells.extend(history_cells(row))
+        return cells
 
     async def load_data(self):
-        top_n = self.app.monitor_params["top_n"]
-        params = self.app.monitor_params.copy()
+        top_n = self.monitor_params["top_n"]
+        params = self.monitor_params.copy()
         del params["top_n"]
+        fps = params.pop("fps", 5)
 
-        monitor = OrderbookMonitor(**params)
+        monitor = create_monitor(OrderbookMonitor, **params)
 
-        table = self.query_one(DataTable)
+        renderer = TableRenderer(self.query_one(DataTable), self.column_keys)
         try:
             await monitor.load_markets()
+            self.app.notify(format_startup(monitor.startup))
             monitor.start()
+            first_row = False
+            watcher = TopWatcher(monitor, top_n, fps)
             while True:
-                await asyncio.sleep(1)
-                data = monitor.top(top_n)
-                for i, row in enumerate(data):
-                    self._add_or_update_row(table, i, row)
-                while table.row_count > len(data):
-                    table.remove_row(str(table.row_count - 1))
+                # 两帧之间的更新合并为一次刷新，排名和显示内容都没有变化时不刷新；
+                # 不可见的面板只接收行情，不读取排名、不刷新表格
+                data, notices = await watcher.next(lambda: self.is_on_screen)
+                for message in notices:
+                    self.app.notify(message)
+                self.app.set_status(
+                    self,
+                    "价差重算 {recomputes} 次，合并节省 {saved} 次".format(
+                        **monitor.coalesce_stats()
+                    ),
+                )
+                if data and not first_row:
+                    first_row = True
+                    self.app.notify(format_startup(monitor.startup))
+                renderer.render(
+                    [
+                        (row["pair_name"], self._format_row(i, row))
+                        for i, row in enumerate(data)
+                    ]
+                )
         except Exception:
             pass
         finally:
             await monitor.stop()
 
     async def on_mount(self):
+        if self.monitor_params is None:
+            self.monitor_params = self.app.monitor_params
+        self.notional = self.monitor_params.get("notional")
+        self.history = self.monitor_params.get("history")
+        columns = ["序号", "交易对", "价差"]
+        if self.notional:
+            columns.append(f"深度价差（{self.notional:g}）")
         self.column_keys = self.query_one(DataTable).add_columns(
-            "序号",
-            "交易对",
-            "价差",
+            *columns,
             "买A卖B",
             "买B卖A",
             "买一价/量（A）",
@@ -104,5 +103,6 @@ class OrderbookPanel(Static):
             "买一价/量（B）",
             "卖一价/量（B）",
             "实时（A/B）",
+            *(HISTORY_COLUMNS if self.history else ()),
         )
         asyncio.create_task(self.load_data())
@@ -0,0 +1,102 @@
+import time
+
+from textual.app import ComposeResult
+from textual.widgets import DataTable, Static
+
+from seekoptrader.metrics import metrics
+
+from .render import TableRenderer
+
+
+def format_ns(value):
+    if value >= 1e6:
+        return f"{value / 1e6:.2f}ms"
+    return f"{value / 1e3:.1f}us"
+
+
+class StatusPanel(Static):
+    """
+    运行指标面板
+
+    每个订阅批次一行：消息速率、处理耗时分位数和异常次数；
+    另有各 monitor 的价差重算耗时和事件循环延迟，用于定位延迟升高的交易所或批次。
+    """
+
+    def __init__(self, *args, interval=1.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.interval = interval
+        self.last_counts = {}
+        self.last_time = None
+
+    def compose(self) -> ComposeResult:
+        yield DataTable()
+
+    def rows(self):
+        now = time.monotonic()
+        elapsed = now - self.last_time if self.last_time else None
+        self.last_time = now
+
+        # 已丢弃的批次不再保留上一次的计数
+        last_counts, self.last_counts = self.last_counts, {}
+        for key, stats in metrics.feeds.items():
+            last = last_counts.get(key, stats.messages)
+            self.last_counts[key] = stats.messages
+            rate = f"{(stats.messages - last) / elapsed:.0f}" if elapsed else "-"
+            histogram = stats.process
+            yield f"feed:{key}", (
+                "行情",
+                f"{stats.exchange} {stats.feed} #{stats.batch}",
+                rate,
+                str(stats.messages),
+                format_ns(histogram.percentile(0.5)),
+                format_ns(histogram.percentile(0.99)),
+                format_ns(histogram.max),
+                str(stats.errors),
+            )
+        for name, histogram in metrics.calculate.items():
+            if histogram.count:
+                yield f"calculate:{name}", (
+                    "重算",
+                    name,
+                    "-",
+                    str(histogram.count),
+                    format_ns(histogram.percentile(0.5)),
+                    format_ns(histogram.percentile(0.99)),
+                    format_ns(histogram.max),
+                    "-",
+                )
+        histogram = metrics.loop_lag
+        yield "loop_lag", (
+            "事件循环",
+            "延迟",
+            "-",
+            str(histogram.count),
+            format_ns(histogram.percentile(0.5)),
+            format_ns(histogram.percentile(0.99)),
+            format_ns(histogram.max),
+            "-",
+        )
+
+    def refresh_metrics(self):
+        self.renderer.render(
+            [(key, (i, *cells)) for i, (key, cells) in enumerate(self.rows())]
+        )
+
+    async def on_mount(self):
+        table = self.query_one(DataTable)
+        self.renderer = TableRenderer(
+            table,
+            table.add_columns(
+                "序号",
+                "类别",
+                "名称",
+                "消息/秒",
+                "次数",
+                "P50",
+                "P99",
+                "最大",
+                "异常",
+            ),
+        )
+        metrics.start()
+        self.set_interval(self.interval, self.refresh_metrics)
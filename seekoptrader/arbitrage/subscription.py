@@ -0,0 +1,204 @@
+import time
+import heapq
+import math
+import itertools
+
+from collections import defaultdict
+
+# 每个订阅批次（一个 watch 循环）的规模：
+#   max_symbols - 单批次最多订阅的 symbol 数量
+#   target_rate - 单批次的目标消息速率（条/秒），超过时迁出热点 symbol
+# 同一交易所的各批次共用一个 ccxt 客户端和 websocket 连接，target_rate 只用于在
+# watch 循环之间均衡处理负载，并不限制单个连接上的消息速率
+EXCHANGE_LIMITS = {
+    "binance": {"max_symbols": 200, "target_rate": 200},
+    "okx": {"max_symbols": 100, "target_rate": 200},
+    "bybit": {"max_symbols": 10, "target_rate": 100},
+}
+DEFAULT_LIMITS = {"max_symbols": 50, "target_rate": 100}
+
+
+class Shard:
+    """一个订阅批次，symbols 可在运行中被调整，watch 循环每次读取最新列表"""
+
+    # 进程内唯一的批次编号，运行指标按此区分各 watch 循环
+    ids = itertools.count()
+
+    def __init__(self, symbols=None):
+        self.symbols = list(symbols or [])
+        self.rate = 0.0
+        # 已规划迁入、尚未放入 symbols 的数量
+        self.incoming = 0
+        self.id = next(self.ids)
+
+    def __repr__(self):
+        return f"Shard(symbols={len(self.symbols)}, rate={self.rate:.1f}/s)"
+
+
+class SubscriptionPlanner:
+    """
+    watch 循环的批次规划
+
+    按交易所的批次规模和各 symbol 的实际消息速率，把 symbol 分配到若干 watch 循环中；
+    运行时定期采样速率，把超出目标速率的批次中最热的 symbol 迁移到较空闲的批次，
+    其余 symbol 的订阅保持不变。各批次共用同一个连接，这里均衡的是 watch 循环的负载。
+    """
+
+    def __init__(self, exchange_name, max_symbols=None, target_rate=None, alpha=0.5):
+        limits = EXCHANGE_LIMITS.get(exchange_name, DEFAULT_LIMITS)
+        self.max_symbols = max_symbols or limits["max_symbols"]
+        self.target_rate = target_rate or limits["target_rate"]
+        self.alpha = alpha
+
+        self.counts = defaultdict(int)
+        self.rates = {}
+        self.shards = []
+        # rebalance 挑出、尚未 assign 的 symbol -> 目标批次
+        self.moving = {}
+        self.sampled_at = time.monotonic()
+
+    def rate(self, symbol):
+        # 未采样过的 symbol 按每秒一条估算
+        return self.rates.get(symbol, 1.0)
+
+    def plan(self, symbols):
+        symbols = sorted(symbols, key=self.rate, reverse=True)
+        if not symbols:
+            self.shards = []
+            return self.shards
+
+        total_rate = sum(self.rate(symbol) for symbol in symbols)
+        shard_count = max(
+            math.ceil(len(symbols) / self.max_symbols),
+            math.ceil(total_rate / self.target_rate),
+        )
+        shards = [Shard() for _ in range(shard_count)]
+
+        # 最长处理时间优先：最热的 symbol 优先放入当前速率最低的批次
+        heap = [(0.0, i) for i in range(shard_count)]
+        for symbol in symbols:
+            full = []
+            rate, i = heapq.heappop(heap)
+            while len(shards[i].symbols) >= self.max_symbols:
+                full.append((rate, i))
+                rate, i = heapq.heappop(heap)
+            shards[i].symbols.append(symbol)
+            shards[i].rate = rate + self.rate(symbol)
+            heapq.heappush(heap, (shards[i].rate, i))
+            for item in full:
+                heapq.heappush(heap, item)
+
+        self.shards = shards
+        return shards
+
+    def record(self, symbol):
+        self.counts[symbol] += 1
+
+    def sample(self):
+        now = time.monotonic()
+        elapsed = now - self.sampled_at
+        if elapsed <= 0:
+            return
+        self.sampled_at = now
+
+        for shard in self.shards:
+            shard.rate = 0.0
+            for symbol in shard.symbols:
+                observed = self.counts.pop(symbol, 0) / elapsed
+                rate = self.alpha * observed + (1 - self.alpha) * self.rates.get(
+                    symbol, observed
+                )
+                self.rates[symbol] = rate
+                shard.rate += rate
+        self.counts.clear()
+
+    def rebalance(self):
+        """
+        挑出超出目标速率的批次中的热点 symbol，返回迁移计划 [(symbol, 目标批次)]
+
+        symbol 立即从原批次移除，原 watch 循环下一次订阅时不再包含它；
+        调用方取消其在原批次中的订阅后，再用 assign 放入目标批次。
+        """
+        self.sample()
+
+        moves = []
+        new_shards = []
+        for shard in list(self.shards):
+            while shard.rate > self.target_rate and len(shard.symbols) > 1:
+                symbol = max(shard.symbols, key=self.rate)
+                rate = self.rate(symbol)
+
+                candidates = [
+                    s
+                    for s in self.shards + new_shards
+                    if s is not shard
+                    and len(s.symbols) + s.incoming < self.max_symbols
+                    and s.rate + rate <= self.target_rate
+                ]
+                if candidates:
+                    target = min(candidates, key=lambda s: s.rate)
+                else:
+                    target = Shard()
+                    new_shards.append(target)
+
+                shard.symbols.remove(symbol)
+                shard.rate -= rate
+                target.rate += rate
+                target.incoming += 1
+                self.moving[symbol] = target
+                moves.append((symbol, target))
+        return moves
+
+    def assign(self, moves):
+        """把 rebalance 挑出的 symbol 放入目标批次，返回新建的批次（需要为其启动 watch 循环）"""
+        new_shards = []
+        for symbol, target in moves:
+            # 迁移期间 replan 已不再需要的 symbol 直接丢弃
+            if self.moving.pop(symbol, None) is not target:
+                continue
+            if target not in self.shards:
+                self.shards.append(target)
+                new_shards.append(target)
+            target.symbols.append(symbol)
+            target.incoming -= 1
+        return new_shards
+
+    def replan(self, symbols):
+        """
+        订阅范围变化时就地调整批次，返回新建的批次（需要为其启动 watch 循环）
+
+        不再需要的 symbol 从所在批次移除，清空的批次被丢弃，其 watch 循环随之退出；
+        新增的 symbol 放入当前速率最低且未满的批次，其余订阅保持不变。
+        """
+        symbols = set(symbols)
+        for symbol in list(self.moving):
+            if symbol not in symbols:
+                target = self.moving.pop(symbol)
+                target.incoming -= 1
+                target.rate -= self.rate(symbol)
+        for shard in self.shards:
+            shard.symbols = [symbol for symbol in shard.symbols if symbol in symbols]
+            shard.rate = sum(self.rate(symbol) for symbol in shard.symbols)
+        self.shards = [shard for shard in self.shards if shard.symbols]
+
+        current = {symbol for shard in self.shards for symbol in shard.symbols}
+        current.update(self.moving)
+        new_shards = []
+        for symbol in sorted(symbols - current, key=self.rate, reverse=True):
+            rate = self.rate(symbol)
+            candidates = [
+                s
+                for s in self.shards
+                if len(s.symbols) < self.max_symbols
+                and s.rate + rate <= self.target_rate
+            ]
+            if candidates:
+                target = min(candidates, key=lambda s: s.rate)
+            else:
+                target = Shard()
+                self.shards.append(target)
+                new_shards.append(target)
+
+            target.symbols.append(symbol)
+            target.rate += rate
+        return new_shards
@@ -0,0 +1,197 @@
+import math
+import time
+
+from ..ranking import RankIndex
+from .monitor import FIAT_CURRENCIES, STABLE_CURRENCIES, Monitor
+
+
+def find_cycles(markets, max_length=4, max_cycles=100000):
+    """
+    枚举长度 3 ~ max_length 的有向套利环路
+
+    每个交易对 base/quote 对应两条有向边：base -> quote 以买一价卖出 base，
+    quote -> base 以卖一价买入 base。每个环路只从编号最小的货币出发枚举一次，
+    路径上其余货币的编号必须更大，因此同一环路的不同旋转不会重复出现。
+    法币和稳定币的限制与 valid_currencies 一致：不含法币，最多一个稳定币。
+
+    :return: {环路名称: ((symbol, "bid" | "ask"), ...)}，数量超过 max_cycles 时截断
+    """
+    fiat_currencies = set(FIAT_CURRENCIES)
+    stable_currencies = set(STABLE_CURRENCIES)
+
+    currency_ids = {}
+    edges = {}
+    for m in markets:
+        base, quote = m["base"], m["quote"]
+        if base == quote or base in fiat_currencies or quote in fiat_currencies:
+            continue
+        for currency in (base, quote):
+            if currency not in currency_ids:
+                currency_ids[currency] = len(currency_ids)
+        base_id, quote_id = currency_ids[base], currency_ids[quote]
+        edges[base_id, quote_id] = (m["symbol"], "bid")
+        edges[quote_id, base_id] = (m["symbol"], "ask")
+
+    currencies = list(currency_ids)
+    stable = [currency in stable_currencies for currency in currencies]
+    neighbors = [[] for _ in currencies]
+    for source, target in edges:
+        neighbors[source].append(target)
+    for targets in neighbors:
+        targets.sort()
+
+    cycles = {}
+
+    def add_cycle(path):
+        # 名称从稳定币（若有）开始，便于阅读；路径本身仍是同一个环路
+        start = next((i for i, c in enumerate(path) if stable[c]), 0)
+        path = path[start:] + path[:start]
+        name = "→".join(currencies[c] for c in path + [path[0]])
+        cycles[name] = tuple(
+            edges[source, target] for source, target in zip(path, path[1:] + path[:1])
+        )
+
+    def extend(path, visited, has_stable):
+        last = path[-1]
+        for target in neighbors[last]:
+            if len(cycles) >= max_cycles:
+                return
+            if target == path[0]:
+                if len(path) >= 3:
+                    add_cycle(path)
+                continue
+            if target < path[0] or target in visited or len(path) >= max_length:
+                continue
+            if stable[target] and has_stable:
+                continue
+            path.append(target)
+            visited.add(target)
+            extend(path, visited, has_stable or stable[target])
+            visited.discard(target)
+            path.pop()
+
+    for start in range(len(currencies)):
+        if len(cycles) >= max_cycles:
+            print(f"环路数量超过 {max_cycles}，已截断")
+            break
+        extend([start], {start}, stable[start])
+    return cycles
+
+
+class CycleEngine:
+    """
+    对数空间的增量环路引擎
+
+    每条边的权重为 log(汇率)，环路的收益为各边权重之和，大于 0 即有套利空间
+    （等价于 -log 权重下的负环）。行情更新只改动该 symbol 的两条边，
+    并只重算经过这两条边的环路，不会在每次行情时对全图重跑 Bellman-Ford。
+    """
+
+    def __init__(self, cycles):
+        self.names = list(cycles)
+        self.symbols = sorted(
+            {symbol for legs in cycles.values() for symbol, _ in legs}
+        )
+
+        self.edge_ids = {}
+        self.cycle_edges = []
+        self.edge_cycles = []
+        for cycle, legs in enumerate(cycles.values()):
+            edge_ids = []
+            for leg in legs:
+                edge = self.edge_ids.get(leg)
+                if edge is None:
+                    edge = self.edge_ids[leg] = len(self.edge_ids)
+                    self.edge_cycles.append([])
+                self.edge_cycles[edge].append(cycle)
+                edge_ids.append(edge)
+            self.cycle_edges.append(tuple(edge_ids))
+
+        self.edge_legs = list(self.edge_ids)
+        self.weights = [-math.inf] * len(self.edge_ids)
+        self.prices = {}
+        self.elapsed_time = {}
+        self.ranking = RankIndex()
+
+    def update(self, symbol, bid, ask, elapsed_time):
+        self.prices[symbol] = (bid, ask)
+        self.elapsed_time[symbol] = elapsed_time
+
+        touched = set()
+        for side, weight in (
+            ("bid", math.log(bid) if bid > 0 else -math.inf),
+            ("ask", -math.log(ask) if ask > 0 else -math.inf),
+        ):
+            edge = self.edge_ids.get((symbol, side))
+            if edge is not None and self.weights[edge] != weight:
+                self.weights[edge] = weight
+                touched.update(self.edge_cycles[edge])
+
+        weights = self.weights
+        for cycle in touched:
+            # 直接对环路上的几条边求和，避免增量累加带来的浮点漂移
+            self.ranking.update(
+                cycle, sum(weights[edge] for edge in self.cycle_edges[cycle])
+            )
+        return len(touched)
+
+    def row(self, cycle):
+        legs = [self.edge_legs[edge] for edge in self.cycle_edges[cycle]]
+        log_rate = sum(self.weights[edge] for edge in self.cycle_edges[cycle])
+        return {
+            "name": self.names[cycle],
+            "exchange_rate": math.exp(log_rate),
+            "log_rate": log_rate,
+            "legs": len(legs),
+            "prices": [
+                self.prices[symbol][0 if side == "bid" else 1] for symbol, side in legs
+            ],
+            "elapsed_time": max(self.elapsed_time[symbol] for symbol, _ in legs),
+        }
+
+    def top(self, n):
+        return [
+            self.row(cycle)
+            for cycle in self.ranking.top(n)
+            if self.ranking.scores[cycle] > -math.inf
+        ]
+
+
+class CycleMonitor(Monitor):
+    """监控长度不超过 max_length 的多腿套利环路，行情订阅和市场加载沿用三角监控"""
+
+    def __init__(self, exchange_name, max_length=4, max_cycles=100000, **kwargs):
+        if kwargs.get("backend", "dict") != "dict":
+            raise ValueError("The cycle engine only supports the dict backend")
+        if kwargs.get("history"):
+            raise ValueError("Opportunity history is not supported for cycles")
+        super().__init__(exchange_name, **kwargs)
+        self.max_length = max_length
+        self.max_cycles = max_cycles
+        self.cycle_engine = None
+
+    def find_triangles(self, markets):
+        return find_cycles(markets, self.max_length, self.max_cycles)
+
+    def leg_symbols(self, legs):
+        return [symbol for symbol, _ in legs]
+
+    def init_data(self, cycles):
+        self.cycle_engine = CycleEngine(cycles)
+
+    def watch_symbols(self):
+        return self.cycle_engine.symbols
+
+    def process_order_book(self, order_book):
+        bids, asks = order_book["bids"], order_book["asks"]
+        if not len(bids) or not len(asks):
+            return
+        self.cycle_engine.update(
+            order_book["symbol"],
+            bids[0][0],
+            asks[0][0],
+            time.time() * 1e3 - (order_book["timestamp"] + self.clock["time_diff"]),
+        )
+
+    def top(self, n):
+        return self.cycle_engine.top(n)
@@ -0,0 +1,121 @@
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖，仅 columnar 后端需要
+    np = None
+
+
+RATE_NAMES = (
+    "exchange_rate_abc",
+    "exchange_rate_acb",
+    "exchange_rate_bac",
+    "exchange_rate_bca",
+    "exchange_rate_cab",
+    "exchange_rate_cba",
+)
+
+
+class TriangleEngine:
+    """
+    向量化三角汇率计算
+
+    每个 symbol 的买一/卖一价保存在扁平数组中，每个三角组合保存为三条腿的
+    symbol 下标。行情更新只写价格数组并标记 symbol，读取前对所有受影响的
+    三角组合用一次向量化表达式重算六个方向的汇率及其最大值。
+    """
+
+    def __init__(self, triangles):
+        if np is None:
+            raise ImportError(
+                "The columnar backend requires numpy, install it with `pip install numpy`"
+            )
+        self.names = list(triangles)
+        self.symbols = sorted(
+            {symbol for legs in triangles.values() for symbol in legs}
+        )
+        self.symbol_ids = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.legs = np.array(
+            [
+                [self.symbol_ids[symbol] for symbol in legs]
+                for legs in triangles.values()
+            ],
+            dtype=np.intp,
+        ).reshape(-1, 3)
+
+        symbol_count = len(self.symbols)
+        self.bid = np.zeros(symbol_count)
+        self.ask = np.zeros(symbol_count)
+        self.timestamp = np.zeros(symbol_count)
+        self.elapsed_time = np.zeros(symbol_count)
+        self.dirty = np.zeros(symbol_count, dtype=bool)
+
+        triangle_count = len(self.names)
+        self.rates = np.zeros((triangle_count, len(RATE_NAMES)))
+        self.rate = np.zeros(triangle_count)
+        self.triangle_elapsed_time = np.zeros(triangle_count)
+
+    def update(self, symbol, bid, ask, timestamp, elapsed_time):
+        i = self.symbol_ids.get(symbol)
+        if i is None:
+            return
+        self.bid[i] = bid
+        self.ask[i] = ask
+        self.timestamp[i] = timestamp
+        self.elapsed_time[i] = elapsed_time
+        self.dirty[i] = True
+
+    def recompute(self):
+        """:return: 重算过的三角组合下标"""
+        if not self.dirty.any():
+            return np.empty(0, dtype=np.intp)
+        touched = np.flatnonzero(self.dirty[self.legs].any(axis=1))
+        self.dirty[:] = False
+
+        legs = self.legs[touched]
+        bid, ask = self.bid[legs], self.ask[legs]
+        ready = (bid != 0).all(axis=1) & (ask != 0).all(axis=1)
+        touched, legs, bid, ask = touched[ready], legs[ready], bid[ready], ask[ready]
+
+        bid_a, bid_b, bid_c = bid[:, 0], bid[:, 1], bid[:, 2]
+        ask_a, ask_b, ask_c = ask[:, 0], ask[:, 1], ask[:, 2]
+        rates = np.column_stack(
+            (
+                1 / ask_a / ask_b * bid_c,
+                1 / ask_c * bid_b * bid_a,
+                1 * bid_a / ask_c * bid_b,
+                1 / ask_b * bid_c / ask_a,
+                1 * bid_c / ask_a / ask_b,
+                1 * bid_b * bid_a / ask_c,
+            )
+        )
+        self.rates[touched] = rates
+        self.rate[touched] = rates.max(axis=1)
+
+        # 延迟取最近一次更新的那条腿
+        latest = self.timestamp[legs].argmax(axis=1)
+        self.triangle_elapsed_time[touched] = np.take_along_axis(
+            self.elapsed_time[legs], latest[:, None], axis=1
+        )[:, 0]
+        return touched
+
+    def row(self, i):
+        legs = self.legs[i]
+        row = {"name": self.names[i], "exchange_rate": self.rate[i].item()}
+        row.update(zip(RATE_NAMES, self.rates[i].tolist()))
+        for index, leg in zip("abc", legs):
+            row[f"bid_price_{index}"] = self.bid[leg].item()
+            row[f"ask_price_{index}"] = self.ask[leg].item()
+        row["elapsed_time"] = self.triangle_elapsed_time[i].item()
+        return row
+
+    def top(self, n):
+        self.recompute()
+        if n <= 0 or not len(self.rate):
+            return []
+
+        scores = -self.rate
+        if n < len(scores):
+            candidates = np.argpartition(scores, n - 1)[:n]
+        else:
+            candidates = np.arange(len(scores))
+        order = candidates[np.argsort(scores[candidates], kind="stable")]
+        return [self.row(i) for i in order]
@@ -1,11 +1,25 @@
+import math
 import time
 import click
-import networkx as nx
 import asyncio
 import traceback
 
 from collections import defaultdict
-from seekoptrader.utils import create_exchange
+from seekoptrader.metrics import metrics
+from seekoptrader.utils import (
+    create_exchange,
+    clock_estimator,
+    exchange_clock,
+    load_markets,
+    refresh_markets,
+)
+
+from ..feedlog import ORDER_BOOK, FeedRecorder, preload_markets, replay_feed
+from ..history import OpportunityHistory
+from ..ranking import RankIndex
+from ..spread.monitor.base import FeedMonitorBase
+from ..universe import fetch_scores, rank_by_liquidity
+from .engine import TriangleEngine, np
 
 
 FIAT_CURRENCIES = [
@@ -41,15 +55,79 @@ STABLE_CURRENCIES = [
 ]
 
 
-class Monitor:
-    def __init__(self, exchange_name):
+class Monitor(FeedMonitorBase):
+    """
+    单个交易所内的三角套利监控
+
+    只有一个行情来源（下标 0），订阅、对时、批次迁移和停止等流程沿用 FeedMonitorBase。
+    """
+
+    feed = "orderbook"
+
+    def __init__(
+        self,
+        exchange_name,
+        use_market_cache=True,
+        backend="dict",
+        universe=None,
+        universe_metric="volume",
+        record=None,
+        replay=None,
+        replay_speed=1.0,
+        history=False,
+        history_threshold=0.001,
+        history_dir=None,
+    ):
+        """
+        :param universe: 只订阅流动性最好的 universe 个三角组合，None 表示全部订阅
+        :param universe_metric: 流动性评分方式，volume 或 spread
+        :param record: 把收到的盘口录制到该行情日志
+        :param replay: 从该行情日志回放，代替交易所的实时行情
+        :param replay_speed: 回放倍速，0 为尽快回放
+        :param history: 记录各组合的收益率（汇率 - 1）历史，排名结果附带机会的持续时间和占比
+        :param history_threshold: 收益率高于该值视为存在机会
+        :param history_dir: 收益率历史的溢出目录，None 表示不写文件
+        """
+        if replay and universe:
+            raise ValueError("universe is not supported when replaying a feed log")
+        if backend not in ("dict", "columnar"):
+            raise ValueError(f"Unsupported backend: {backend}")
+        self.exchange = create_exchange(exchange_name, self)
+        # dict 后端在 process_order_book 中直接计算汇率，columnar 后端在 top() 中批量计算
+        super().__init__(
+            ((0, self.exchange),),
+            f"triangle {exchange_name}",
+            use_market_cache=use_market_cache,
+        )
+
         self.symbol_map = defaultdict(list)
         self.triangles = {}
         self.triangle_data = {}
-
-        self.exchange = create_exchange(exchange_name)
-        self.monitor_tasks = []
-        self.server_timediff = 0
+        self.ranking = RankIndex()
+        self.backend = backend
+        self.engine = None
+
+        # 同一交易所的各 monitor 共享一份时钟偏差，sync_clock 原地更新
+        self.clock = exchange_clock(self.exchange)
+
+        self.universe = universe
+        self.universe_metric = universe_metric
+        self.universe_names = None
+        # 每个 symbol 最近一次的盘口（ccxt 原地更新的同一对象），切换组合时用于回放
+        self.order_books = {}
+
+        self.record = record
+        self.recorder = None
+        self.replay = replay
+        self.replay_speed = replay_speed
+
+        self.history = history
+        self.history_threshold = history_threshold
+        self.history_dir = history_dir
+        self.opportunities = None
+        # 组合名称 -> 历史中的槽位，覆盖全部组合，重新挑选 universe 时不变
+        self.history_slots = {}
+        self.engine_slots = None
 
     def valid_currencies(self, currencies):
         return (
@@ -58,29 +136,58 @@ class Monitor:
         )
 
     def find_triangles(self, markets):
-        G = nx.DiGraph()
+        """
+        枚举三角组合 a-b-c，即 b/a、c/b、c/a 三个交易对都存在
+
+        货币按整数编号，邻接集合为 base -> quote；对每条边 c -> b，
+        a 取 c 与 b 的 quote 集合的交集。法币和稳定币的限制以节点掩码的形式
+        在枚举时提前过滤，与 valid_currencies 的规则一致。
+        """
+        fiat_currencies = set(FIAT_CURRENCIES)
+        stable_currencies = set(STABLE_CURRENCIES)
+
+        currency_ids = {}
+        symbols = {}
         for m in markets:
-            base, quote, symbol = m["base"], m["quote"], m["symbol"]
-            G.add_edge(base, quote, symbol=symbol)
+            base, quote = m["base"], m["quote"]
+            if base == quote or base in fiat_currencies or quote in fiat_currencies:
+                continue
+            for currency in (base, quote):
+                if currency not in currency_ids:
+                    currency_ids[currency] = len(currency_ids)
+            symbols[currency_ids[base], currency_ids[quote]] = m["symbol"]
+
+        currencies = list(currency_ids)
+        stable = [currency in stable_currencies for currency in currencies]
+        quotes = [set() for _ in currencies]
+        for base, quote in symbols:
+            quotes[base].add(quote)
 
         triangles = {}
-        currencies = G.nodes()
-        for b in currencies:
-            for a in G[b]:
-                for c in currencies:
-                    if c == b or c == a:
+        for c, c_quotes in enumerate(quotes):
+            for b in c_quotes:
+                if stable[c] and stable[b]:
+                    continue
+                for a in c_quotes & quotes[b]:
+                    if stable[a] and (stable[b] or stable[c]):
                         continue
-                    if c in G and b in G[c]:
-                        if a in G[c]:
-                            if self.valid_currencies([b, a, c]):
-                                triangles[f"{a}-{b}-{c}"] = (
-                                    G[b][a]["symbol"],
-                                    G[c][b]["symbol"],
-                                    G[c][a]["symbol"],
-                                )
+                    triangles[f"{currencies[a]}-{currencies[b]}-{currencies[c]}"] = (
+                        symbols[b, a],
+                        symbols[c, b],
+                        symbols[c, a],
+                    )
         return triangles
 
     def init_data(self, triangles):
+        if self.backend == "columnar":
+            self.engine = TriangleEngine(triangles)
+            if self.opportunities is not None:
+                self.engine_slots = np.array(
+                    [self.history_slots[name] for name in self.engine.names],
+                    dtype=np.intp,
+                )
+            return
+
         for name, triangle in triangles.items():
             self.symbol_map[triangle[0]].append({"name": name, "index": "a"})
             self.symbol_map[triangle[1]].append({"name": name, "index": "b"})
@@ -102,39 +209,137 @@ class Monitor:
                 "ask_price_c": 0,
                 "elapsed_time": 0,
             }
+            self.ranking.update(name, 0)
 
     async def load_markets(self):
-        markets = await self.exchange.load_markets()
-        markets = [m for m in markets.values() if m["spot"] and m["active"]]
-        triangles = self.find_triangles(markets)
-        self.init_data(triangles)
-
-    async def sync_time(self):
+        start_time = time.perf_counter()
+        if self.replay:
+            preload_markets(self.replay, (self.exchange,))
+        warm = await load_markets(self.exchange, "spot", self.market_cache)
+        self.triangles = self.find_triangles(self.spot_markets())
+        if self.history:
+            self.history_slots = {name: i for i, name in enumerate(self.triangles)}
+            self.opportunities = OpportunityHistory(
+                list(self.triangles),
+                self.history_threshold,
+                spill_dir=self.history_dir,
+                label=f"triangle {self.exchange.id}",
+            )
+        if self.universe:
+            self.apply_universe(await self.select_universe())
+        else:
+            self.init_data(self.triangles)
+
+        self.startup = {
+            "warm": warm,
+            "load_markets_ms": (time.perf_counter() - start_time) * 1e3,
+        }
+
+    def spot_markets(self):
+        return [m for m in self.exchange.markets.values() if m["spot"] and m["active"]]
+
+    def leg_symbols(self, legs):
+        return legs
+
+    async def select_universe(self):
+        """一次批量拉取行情快照，按最差一条腿的流动性挑选组合"""
+        symbols = {
+            symbol
+            for legs in self.triangles.values()
+            for symbol in self.leg_symbols(legs)
+        }
+        scores = await fetch_scores(self.exchange, symbols, self.universe_metric)
+        items = {
+            name: [scores.get(symbol, -math.inf) for symbol in self.leg_symbols(legs)]
+            for name, legs in self.triangles.items()
+        }
+        return rank_by_liquidity(items, self.universe)
+
+    def apply_universe(self, names):
+        """按选中的组合重建路由和计算数据，并回放仍在订阅的 symbol 的最新盘口"""
+        self.symbol_map = defaultdict(list)
+        self.triangle_data = {}
+        self.ranking = RankIndex()
+        self.init_data({name: self.triangles[name] for name in names})
+        self.universe_names = names
+
+        symbols = set(self.watch_symbols())
+        for symbol in list(self.order_books):
+            if symbol in symbols:
+                self.process_order_book(self.order_books[symbol])
+            else:
+                del self.order_books[symbol]
+
+    async def rerank(self, interval=300):
+        """定期按流动性重新挑选组合，在线替换订阅"""
         while self.running:
+            await asyncio.sleep(interval)
             try:
-                start_time = time.time() * 1000
-                server_time = await self.exchange.fetch_time()
-                end_time = time.time() * 1000
-
-                rtt = end_time - start_time
-                latency = rtt / 2
-
-                self.server_timediff = end_time - (server_time + latency)
+                names = await self.select_universe()
             except Exception:
                 print(f"Excpetion: {traceback.format_exc()}")
-            await asyncio.sleep(10)
+                continue
+            if set(names) == set(self.universe_names):
+                continue
+
+            self.apply_universe(names)
+            symbols = set(self.watch_symbols())
+            for shard in self.planners[0].replan(symbols):
+                self.monitor_tasks.append(
+                    asyncio.create_task(self.watch_shard(self.exchange, 0, shard))
+                )
+            await self.resubscribe(0, self.exchange, symbols)
+
+    async def unwatch(self, exchange, symbols):
+        try:
+            await exchange.un_watch_order_book_for_symbols(symbols)
+        except Exception as e:
+            print(f"取消订阅失败: {e}")
+
+    async def reconcile_markets(self):
+        await refresh_markets(self.exchange, self.market_cache)
+        current = self.triangles.keys()
+        fresh = self.find_triangles(self.spot_markets()).keys()
+        if fresh != current:
+            self.notice(
+                f"{self.exchange.id} 市场列表已更新："
+                f"新增 {len(fresh - current)} 个三角组合，"
+                f"下线 {len(current - fresh)} 个三角组合，重启后生效"
+            )
 
-    async def watch(self, symbols):
-        while self.is_running:
+    async def monitor(self, exchange, index, shard):
+        stats = metrics.feed(exchange.id, self.feed, shard)
+        estimator = clock_estimator(exchange)
+        while self.running and shard.symbols:
             try:
-                order_book = await self.exchange.watch_order_book_for_symbols(symbols)
+                order_book = await exchange.watch_order_book_for_symbols(shard.symbols)
+                estimator.observe(order_book["timestamp"])
+                self.planners[index].record(order_book["symbol"])
+                if self.recorder is not None:
+                    self.recorder.order_book(order_book, 0, self.clock["time_diff"])
+                self.order_books[order_book["symbol"]] = order_book
+                start = time.perf_counter_ns()
                 self.process_order_book(order_book)
+                stats.record(time.perf_counter_ns() - start)
+                self.changed.set()
             except Exception as e:
+                metrics.error(exchange.id, self.feed, shard)
                 print("异常：", e)
                 await asyncio.sleep(5)
 
     def process_order_book(self, order_book):
         symbol = order_book["symbol"]
+        if self.engine is not None:
+            timestamp = order_book["timestamp"]
+            self.engine.update(
+                symbol,
+                order_book["bids"][0][0],
+                order_book["asks"][0][0],
+                timestamp,
+                time.time() * 1e3 - (timestamp + self.clock["time_diff"]),
+            )
+            return
+
         triangle_infos = self.symbol_map[symbol]
         for info in triangle_infos:
             index, name = info["index"], info["name"]
@@ -181,38 +386,80 @@ class Monitor:
                 data["exchange_rate_cab"],
                 data["exchange_rate_cba"],
             )
-            data["elapsed_time"] = time.time() * 1e3 - (
-                timestamp + self.server_timediff
-            )
+            now = time.time() * 1e3
+            data["elapsed_time"] = now - (timestamp + self.clock["time_diff"])
+            self.ranking.update(name, data["exchange_rate"])
+            if self.opportunities is not None:
+                self.opportunities.add(
+                    self.history_slots[name], now, data["exchange_rate"] - 1
+                )
+
+    def replay_message(self, kind, source, message, time_diff):
+        """回放一条录制的盘口，见 feedlog.replay_feed"""
+        if kind != ORDER_BOOK:
+            raise ValueError("Triangle monitors can only replay order book feeds")
+        # 按录制时的时钟偏差还原，elapsed_time 与录制时一致
+        message["timestamp"] += time_diff - self.clock["time_diff"]
+        self.order_books[message["symbol"]] = message
+        self.process_order_book(message)
+        self.changed.set()
 
     def top(self, n):
-        data = list(self.triangle_data.values())
-        return sorted(data, key=lambda x: x["exchange_rate"], reverse=True)[
-            : min(n, len(data))
-        ]
-
-    def start(self):
-        self.is_running = True
-        symbols = list(self.symbol_map.keys())
-
-        batch_size = 20
-        self.monitor_tasks = [
-            asyncio.create_task(self.watch(symbols[i : i + batch_size]))
-            for i in range(0, len(symbols), batch_size)
-        ]
-        self.monitor_tasks.append(asyncio.create_task(self.sync_time()))
+        if self.engine is not None:
+            start = time.perf_counter_ns()
+            touched = self.engine.recompute()
+            rows = self.engine.top(n)
+            self.calculate_stats.record(time.perf_counter_ns() - start)
+            if self.opportunities is not None and len(touched):
+                self.opportunities.record(
+                    self.engine_slots[touched],
+                    time.time() * 1e3,
+                    self.engine.rate[touched] - 1,
+                )
+        else:
+            rows = [self.triangle_data[name] for name in self.ranking.top(n)]
+        if self.opportunities is not None:
+            # dict 后端暂存的采样由 flush_history 在后台写入，这里不补写
+            self.opportunities.annotate(
+                [self.history_slots[row["name"]] for row in rows],
+                rows,
+                time.time() * 1e3,
+            )
+        return rows
 
-    async def stop(self):
-        self.running = False
-        for task in self.monitor_tasks:
-            task.cancel()
+    def watch_symbols(self):
+        if self.engine is not None:
+            return self.engine.symbols
+        return self.symbol_map.keys()
 
-        try:
-            await asyncio.gather(*self.monitor_tasks, return_exceptions=True)
-        except asyncio.CancelledError:
-            pass
+    def feed_symbols(self, index):
+        return self.watch_symbols()
 
-        await self.exchange.close()
+    def start(self):
+        self.running = True
+        self.monitor_tasks = []
+        if self.opportunities is not None and self.engine is None:
+            self.monitor_tasks.append(asyncio.create_task(self.flush_history()))
+        if self.replay:
+            self.monitor_tasks.append(
+                asyncio.create_task(replay_feed(self, self.replay, self.replay_speed))
+            )
+            return
+        if self.record:
+            self.recorder = FeedRecorder(self.record)
+            self.recorder.markets(self.exchange, self.spot_markets())
+        self.start_feeds()
+        if self.startup.get("warm"):
+            self.monitor_tasks.append(asyncio.create_task(self.reconcile_markets()))
+        if self.universe:
+            self.monitor_tasks.append(asyncio.create_task(self.rerank()))
+
+    def cleanup(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.opportunities is not None:
+            self.opportunities.close()
 
 
 async def run_monitor(exchange_name):
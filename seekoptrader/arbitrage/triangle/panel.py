@@ -4,95 +4,87 @@ import click
 from textual.app import App, ComposeResult
 from textual.widgets import DataTable, Header, Footer, Static
 
+from seekoptrader.utils import format_startup
+
+from ..history import HISTORY_COLUMNS, history_cells
+from ..render import TableRenderer, TopWatcher
+from .cycles import CycleMonitor
 from .monitor import Monitor
 
 
 class Panel(Static):
+    def __init__(self, *args, monitor_params=None, **kwargs):
+        """
+        :param monitor_params: 本面板的监控参数，默认使用 app.monitor_params
+        """
+        super().__init__(*args, **kwargs)
+        self.monitor_params = monitor_params
+
     def compose(self) -> ComposeResult:
         yield DataTable()
 
-    def _add_or_update_row(self, table: DataTable, index, row):
-        row_key = str(index)
-        if index < table.row_count:
-            table.update_cell(row_key, self.column_keys[0], index)
-            table.update_cell(row_key, self.column_keys[1], row["name"])
-            table.update_cell(
-                row_key, self.column_keys[2], f"{row['exchange_rate']:4f}"
-            )
-            table.update_cell(
-                row_key, self.column_keys[3], f"{row['exchange_rate_abc']:4f}"
-            )
-            table.update_cell(
-                row_key, self.column_keys[4], f"{row['exchange_rate_acb']:4f}"
-            )
-            table.update_cell(
-                row_key, self.column_keys[5], f"{row['exchange_rate_bac']:4f}"
-            )
-            table.update_cell(
-                row_key, self.column_keys[6], f"{row['exchange_rate_bca']:4f}"
-            )
-            table.update_cell(
-                row_key, self.column_keys[7], f"{row['exchange_rate_cab']:4f}"
-            )
-            table.update_cell(
-                row_key, self.column_keys[8], f"{row['exchange_rate_cba']:4f}"
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[9],
-                f"{row['bid_price_a']}/{row['ask_price_a']}",
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[10],
-                f"{row['bid_price_b']}/{row['ask_price_b']}",
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[11],
-                f"{row['bid_price_c']}/{row['ask_price_c']}",
-            )
-            table.update_cell(
-                row_key,
-                self.column_keys[12],
-                f"{row['elapsed_time']:2f}ms",
-            )
-        else:
-            table.add_row(
-                index,
-                row["name"],
-                f"{row['exchange_rate']:4f}",
-                f"{row['exchange_rate_abc']:4f}",
-                f"{row['exchange_rate_acb']:4f}",
-                f"{row['exchange_rate_bac']:4f}",
-                f"{row['exchange_rate_bca']:4f}",
-                f"{row['exchange_rate_cab']:4f}",
-                f"{row['exchange_rate_cba']:4f}",
-                f"{row['bid_price_a']}/{row['ask_price_a']}",
-                f"{row['bid_price_b']}/{row['ask_price_b']}",
-                f"{row['bid_price_c']}/{row['ask_price_c']}",
-                f"{row['elapsed_time']:2f}ms",
-                key=row_key,
-            )
+    def _format_row(self, index, row):
+        if self.max_length > 3:
+            return self._format_cycle_row(index, row)
+        cells = [
+            index,
+            row["name"],
+            f"{row['exchange_rate']:4f}",
+            f"{row['exchange_rate_abc']:4f}",
+            f"{row['exchange_rate_acb']:4f}",
+            f"{row['exchange_rate_bac']:4f}",
+            f"{row['exchange_rate_bca']:4f}",
+            f"{row['exchange_rate_cab']:4f}",
+            f"{row['exchange_rate_cba']:4f}",
+            f"{row['bid_price_a']}/{row['ask_price_a']}",
+            f"{row['bid_price_b']}/{row['ask_price_b']}",
+            f"{row['bid_price_c']}/{row['ask_price_c']}",
+            f"{row['elapsed_time']:2f}ms",
+        ]
+        if self.history:
+            cells.extend(history_cells(row))
+        return cells
+
+    def _format_cycle_row(self, index, row):
+        return (
+            index,
+            row["name"],
+            row["legs"],
+            f"{row['exchange_rate']:4f}",
+            "/".join(f"{price}" for price in row["prices"]),
+            f"{row['elapsed_time']:2f}ms",
+        )
 
     async def load_data(self):
-        top_n = self.app.monitor_params["top_n"]
-        params = self.app.monitor_params.copy()
+        top_n = self.monitor_params["top_n"]
+        params = self.monitor_params.copy()
         del params["top_n"]
+        fps = params.pop("fps", 5)
+        max_length = params.pop("max_length", 3)
 
-        monitor = Monitor(**params)
+        if max_length > 3:
+            monitor = CycleMonitor(max_length=max_length, **params)
+        else:
+            monitor = Monitor(**params)
 
-        table = self.query_one(DataTable)
+        renderer = TableRenderer(self.query_one(DataTable), self.column_keys)
         try:
             await monitor.load_markets()
+            self.app.notify(format_startup(monitor.startup))
             monitor.start()
+            watcher = TopWatcher(monitor, top_n, fps)
             while True:
-                await asyncio.sleep(1)
-                data = monitor.top(top_n)
-                for i, row in enumerate(data):
-                    self._add_or_update_row(table, i, row)
-                while table.row_count > len(data):
-                    table.remove_row(str(table.row_count - 1))
+                # 两帧之间的更新合并为一次刷新，排名和显示内容都没有变化时不刷新；
+                # 不可见的面板只接收行情，不读取排名、不刷新表格
+                data, notices = await watcher.next(lambda: self.is_on_screen)
+                for message in notices:
+                    self.app.notify(message)
+                renderer.render(
+                    [
+                        (row["name"], self._format_row(i, row))
+                        for i, row in enumerate(data)
+                    ]
+                )
         except Exception as e:
             print(e)
             pass
@@ -100,6 +92,22 @@ class Panel(Static):
             await monitor.stop()
 
     async def on_mount(self):
+        if self.monitor_params is None:
+            self.monitor_params = self.app.monitor_params
+        self.max_length = self.monitor_params.get("max_length", 3)
+        self.history = self.monitor_params.get("history")
+        if self.max_length > 3:
+            self.column_keys = self.query_one(DataTable).add_columns(
+                "序号",
+                "环路",
+                "腿数",
+                "汇率",
+                "逐腿成交价",
+                "实时",
+            )
+            asyncio.create_task(self.load_data())
+            return
+
         self.column_keys = self.query_one(DataTable).add_columns(
             "序号",
             "交易对",
@@ -114,5 +122,6 @@ class Panel(Static):
             "买/卖一价（B）",
             "买/卖一价（C）",
             "实时",
+            *(HISTORY_COLUMNS if self.history else ()),
         )
         asyncio.create_task(self.load_data())
@@ -0,0 +1,40 @@
+import heapq
+import math
+
+# 流动性评分方式：
+#   volume - 24 小时计价币成交额，越大越好
+#   spread - 买卖价差占中间价的比例，越小越好
+METRICS = ("volume", "spread")
+
+
+def liquidity_score(ticker, metric="volume"):
+    if metric == "volume":
+        volume = ticker.get("quoteVolume")
+        if volume is None and ticker.get("baseVolume") and ticker.get("last"):
+            volume = ticker["baseVolume"] * ticker["last"]
+        return volume or 0.0
+    elif metric == "spread":
+        bid, ask = ticker.get("bid"), ticker.get("ask")
+        if not bid or not ask:
+            return -math.inf
+        return -(ask - bid) / ((ask + bid) / 2)
+    else:
+        raise ValueError(f"Unsupported liquidity metric: {metric}")
+
+
+async def fetch_scores(exchange, symbols, metric="volume"):
+    """一次批量 fetch_tickers 获取所有 symbol 的流动性评分"""
+    tickers = await exchange.fetch_tickers(list(symbols))
+    return {
+        symbol: liquidity_score(ticker, metric) for symbol, ticker in tickers.items()
+    }
+
+
+def rank_by_liquidity(items, k):
+    """
+    按流动性挑选前 k 个组合
+
+    :param items: {key: 各条腿的评分}，组合的流动性取决于最差的一条腿
+    :return: 评分从高到低的 key 列表
+    """
+    return heapq.nlargest(k, items, key=lambda key: min(items[key]))
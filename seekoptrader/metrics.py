@@ -0,0 +1,215 @@
+import asyncio
+
+from collections import defaultdict
+
+# 对数-线性直方图：每个 2 的幂区间再等分为 2**SUB_BITS 个桶，相对误差不超过 1/2**SUB_BITS
+SUB_BITS = 3
+SUB_BUCKETS = 1 << SUB_BITS
+
+
+class Histogram:
+    """
+    对数-线性直方图，记录非负整数（纳秒）
+
+    桶下标只用 bit_length 和移位计算，记录一次是常数时间，不需要排序和加锁；
+    所有记录都在事件循环线程内进行，读取方看到的计数最多落后一次记录。
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (SUB_BUCKETS * 64)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        if value < SUB_BUCKETS:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - SUB_BITS - 1
+            index = ((shift + 1) << SUB_BITS) + (value >> shift) - SUB_BUCKETS
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @staticmethod
+    def upper_bound(index):
+        """桶内的最大值"""
+        if index < SUB_BUCKETS:
+            return index
+        shift = (index >> SUB_BITS) - 1
+        return ((SUB_BUCKETS + (index & (SUB_BUCKETS - 1)) + 1) << shift) - 1
+
+    def percentile(self, q):
+        """:param q: 0-1 之间的分位，返回所在桶的上界"""
+        if not self.count:
+            return 0
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+
+class FeedStats:
+    """一个订阅批次（watch 循环）的消息计数和处理耗时"""
+
+    __slots__ = ("exchange", "feed", "batch", "messages", "process", "errors")
+
+    def __init__(self, exchange, feed, batch):
+        self.exchange = exchange
+        self.feed = feed
+        self.batch = batch
+        self.messages = 0
+        self.process = Histogram()
+        # watch 循环因异常重新订阅的次数
+        self.errors = 0
+
+    def record(self, elapsed_ns):
+        self.messages += 1
+        self.process.record(elapsed_ns)
+
+
+class Metrics:
+    """
+    进程内的运行指标
+
+    - 各交易所、各订阅批次的消息数和 process_order_book / process_ticker 耗时
+    - 各 monitor 重算价差（calculate_spread / flush）的耗时
+    - 各订阅批次的 watch 循环因异常重新订阅的次数（连接断开重连也经此路径）
+    - 事件循环延迟
+
+    状态面板和 Prometheus 文本接口都从这里读取。
+    """
+
+    def __init__(self):
+        self.feeds = {}
+        self.calculate = defaultdict(Histogram)
+        self.loop_lag = Histogram()
+        self.lag_task = None
+
+    def feed(self, exchange, feed, shard):
+        """返回订阅批次的统计，同一批次重复调用返回同一对象"""
+        key = (exchange, feed, shard.id)
+        stats = self.feeds.get(key)
+        if stats is None:
+            stats = self.feeds[key] = FeedStats(exchange, feed, shard.id)
+        return stats
+
+    def error(self, exchange, feed, shard):
+        self.feed(exchange, feed, shard).errors += 1
+
+    def drop(self, exchange, feed, shard):
+        """移除已丢弃批次的统计"""
+        self.feeds.pop((exchange, feed, shard.id), None)
+
+    def start(self):
+        """启动事件循环延迟采样，重复调用只启动一次"""
+        if self.lag_task is None or self.lag_task.done():
+            self.lag_task = asyncio.create_task(self.watch_loop_lag())
+
+    async def watch_loop_lag(self, interval=0.1):
+        """定期测量 sleep 的实际唤醒时间与预期的偏差"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.record(int(max(loop.time() - expected, 0) * 1e9))
+
+    def render(self):
+        """Prometheus 文本格式，耗时以 summary 输出分位数"""
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def summary(name, help_text, series):
+            header(name, "summary", help_text)
+            for labels, histogram in series:
+                for q in (0.5, 0.9, 0.99):
+                    value = histogram.percentile(q) / 1e9
+                    lines.append(
+                        f"{name}{format_labels(labels, quantile=q)} {value:.9f}"
+                    )
+                labels = format_labels(labels)
+                lines.append(f"{name}_sum{labels} {histogram.total / 1e9:.9f}")
+                lines.append(f"{name}_count{labels} {histogram.count}")
+
+        feeds = [
+            ({"exchange": s.exchange, "feed": s.feed, "batch": s.batch}, s)
+            for s in self.feeds.values()
+        ]
+        header(
+            "seekoptrader_messages_total", "counter", "Market data messages received"
+        )
+        for labels, stats in feeds:
+            lines.append(
+                f"seekoptrader_messages_total{format_labels(labels)} {stats.messages}"
+            )
+        summary(
+            "seekoptrader_process_seconds",
+            "Time spent processing one market data message",
+            [(labels, stats.process) for labels, stats in feeds],
+        )
+        summary(
+            "seekoptrader_calculate_seconds",
+            "Time spent recomputing spreads or rates",
+            [({"monitor": name}, h) for name, h in self.calculate.items()],
+        )
+        header(
+            "seekoptrader_watch_errors_total",
+            "counter",
+            "Watch loop failures followed by a resubscribe",
+        )
+        for labels, stats in feeds:
+            lines.append(
+                f"seekoptrader_watch_errors_total{format_labels(labels)} {stats.errors}"
+            )
+        summary(
+            "seekoptrader_event_loop_lag_seconds",
+            "Delay between the scheduled and actual wakeup of the event loop",
+            [({}, self.loop_lag)],
+        )
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+metrics = Metrics()
+
+
+async def serve_metrics(host="127.0.0.1", port=9464):
+    """
+    本地 HTTP 文本接口，任意路径都返回 Prometheus 格式的 metrics
+    :return: asyncio.Server
+    """
+
+    async def handle(reader, writer):
+        try:
+            # 只需要读完请求头，内容与路径无关
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            body = metrics.render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                + f"Content-Length: {len(body)}\r\n".encode()
+                + b"Connection: close\r\n\r\n"
+                + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
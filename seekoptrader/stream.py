@@ -0,0 +1,169 @@
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+
+from .arbitrage.render import TopWatcher
+
+
+class NDJSONWriter:
+    """
+    异步缓冲的 NDJSON 输出
+
+    write() 只把序列化后的行放入缓冲区，由后台任务按 flush_interval 或缓冲区大小批量写出，
+    文件和标准输出的写入放在线程中执行，Unix socket 通过 StreamWriter 写入，
+    行情处理不会被输出端阻塞。
+
+    输出到标准输出时，标准输出只留给 NDJSON：monitor 打印的异常和提示信息
+    （包括工作进程中的）在 close() 之前都转到标准错误。
+    """
+
+    def __init__(self, output="-", flush_interval=0.2, max_buffer=1 << 16):
+        """
+        :param output: "-" 为标准输出，"unix:<path>" 为 Unix socket，其余视为文件路径（追加写入）
+        """
+        self.output = output
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+
+        self.buffer = []
+        self.buffered = 0
+        self.file = None
+        self.writer = None
+        # 被转到标准错误的原标准输出 fd，close() 时恢复
+        self.stdout_fd = None
+        self.wakeup = asyncio.Event()
+        self.flush_task = None
+
+    async def open(self):
+        if self.output == "-":
+            self.claim_stdout()
+        elif self.output.startswith("unix:"):
+            _, self.writer = await asyncio.open_unix_connection(self.output[5:])
+        else:
+            self.file = open(self.output, "a")
+        self.flush_task = asyncio.create_task(self.run())
+
+    def claim_stdout(self):
+        """复制一份标准输出的 fd 用于写入 NDJSON，原 fd 指向标准错误"""
+        sys.stdout.flush()
+        try:
+            fd = sys.stdout.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            # 标准输出不是真实文件时（例如被替换为 StringIO）只替换 sys.stdout
+            self.file, sys.stdout = sys.stdout, sys.stderr
+            return
+        self.file = os.fdopen(os.dup(fd), "w")
+        os.dup2(sys.stderr.fileno(), fd)
+        self.stdout_fd = fd
+
+    def release_stdout(self):
+        if self.stdout_fd is not None:
+            sys.stdout.flush()
+            self.file.flush()
+            os.dup2(self.file.fileno(), self.stdout_fd)
+            self.file.close()
+            self.stdout_fd = None
+        elif sys.stdout is sys.stderr:
+            sys.stdout = self.file
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        self.buffer.append(line)
+        self.buffered += len(line)
+        if self.buffered >= self.max_buffer:
+            self.wakeup.set()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        data = "".join(self.buffer)
+        self.buffer.clear()
+        self.buffered = 0
+
+        if self.writer is not None:
+            self.writer.write(data.encode())
+            await self.writer.drain()
+        else:
+            await asyncio.to_thread(self._write_file, data)
+
+    def _write_file(self, data):
+        self.file.write(data)
+        self.file.flush()
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def close(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            try:
+                await self.flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+        elif self.output == "-":
+            self.release_stdout()
+        elif self.file is not None:
+            self.file.close()
+
+
+def diff_rows(previous, rows, key):
+    """
+    对比两次 top(n) 的结果，生成逐行变化事件
+    :return: (事件列表, 本次的 {key: (名次, row)})
+    """
+    # 部分 monitor 返回的是内部数据本身，需要复制一份用于下次对比
+    current = {row[key]: (rank, dict(row)) for rank, row in enumerate(rows)}
+    events = []
+    for name, (rank, row) in current.items():
+        if previous.get(name) != (rank, row):
+            events.append({"type": "change", "key": name, "rank": rank, "row": row})
+    for name in previous.keys() - current.keys():
+        events.append({"type": "remove", "key": name})
+    return events, current
+
+
+async def stream_monitor(monitor, top_n, key, output="-", events="snapshot", fps=5):
+    """
+    不启动界面，把监控结果以 NDJSON 持续输出
+    :param key: 行的身份字段，价差为 pair_name，三角套利为 name
+    :param events: snapshot 每次输出完整的 top_n，change 只输出变化的行
+    """
+    writer = NDJSONWriter(output)
+    await writer.open()
+    try:
+        await monitor.load_markets()
+        writer.write({"type": "startup", "ts": time.time() * 1e3, **monitor.startup})
+        monitor.start()
+
+        watcher = TopWatcher(monitor, top_n, fps)
+        previous = {}
+        while True:
+            # 与面板相同：两帧之间的更新合并为一次，排名和各行内容都没有变化时不输出
+            rows, notices = await watcher.next()
+            ts = time.time() * 1e3
+            for message in notices:
+                writer.write({"type": "notice", "ts": ts, "message": message})
+            if events == "snapshot":
+                writer.write({"type": "snapshot", "ts": ts, "rows": rows})
+            else:
+                changes, previous = diff_rows(previous, rows, key)
+                for event in changes:
+                    event["ts"] = ts
+                    writer.write(event)
+    finally:
+        await monitor.stop()
+        await writer.close()
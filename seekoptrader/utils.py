@@ -1,6 +1,14 @@
 import os
+import json
+import math
+import time
+import asyncio
+import tempfile
+import traceback
 import ccxt.pro as ccxtpro
 
+from collections import Counter, defaultdict, deque
+
 
 params = {
     "enableRateLimit": True,
@@ -13,5 +21,392 @@ params = {
 }
 
 
-def create_exchange(name):
-    return getattr(ccxtpro, name)(params)
+class ClockEstimator:
+    """
+    交易所时钟偏差估计（time_diff = 本地时间 - 交易所时间）
+
+    参照 NTP 的时钟过滤：一次 REST 对时给出偏差所在的区间 [中点 - rtt/2, 中点 + rtt/2]，
+    区间半宽（样本距离）随样本的年龄按最大频偏增长。滑动窗口中取距离最小的一半样本，
+    按 1/距离² 加权平均，往返时间最短的样本占主导。
+
+    websocket 消息的事件时间戳给出偏差的上界：消息不可能在事件发生之前收到，
+    接收时间 - 事件时间戳 = 偏差 + 单向延迟 >= 偏差。取最近两个对时周期内的最小值与 REST
+    区间求交，REST 估计落在交集之外时截到上界，不增加 REST 请求就能收窄误差。
+
+    估计稳定时对时间隔逐次加倍，直到 max_interval；估计变化超过误差范围时减半。
+    新样本与原估计的区间不相交时认为本地时钟发生了跳变，清空窗口并恢复最短对时间隔；
+    本地时间相对单调时钟的差值在两次对时之间变化超过误差范围时，同样视为跳变，立即对时；
+    事件时间戳与 REST 估计矛盾时提前对时复核，多次矛盾则认为该交易所的事件时间戳不可靠
+    （例如由本地时间填充），不再使用。
+    """
+
+    # 本地时钟的最大频偏，毫秒/秒（15 ppm，与 NTP 相同）
+    MAX_DRIFT = 0.015
+    # 交易所时间的分辨率，毫秒
+    RESOLUTION = 1
+    # 估计变化在此范围内视为稳定，毫秒
+    TOLERANCE = 1
+    MAX_CONFLICTS = 3
+
+    def __init__(self, window=8, min_samples=4, min_interval=2, max_interval=300):
+        self.clock = {"latency": 0, "time_diff": 0, "error": math.inf}
+        # (往返时间, 偏差, 单调时钟采样时间)
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.requests = 0
+
+        # REST 估计的偏差及其误差
+        self.offset = None
+        self.error = math.inf
+        # 事件时间戳给出的上界，当前和上一个对时周期
+        self.bound = math.inf
+        self.previous_bound = math.inf
+        self.use_events = True
+        self.conflict = False
+        self.conflicts = 0
+        self.resync = asyncio.Event()
+        # 上次对时的本地时间 - 单调时钟，毫秒
+        self.anchor = None
+
+    def add_sample(self, local_time, rtt, server_time):
+        """
+        :param local_time: 请求往返中点的本地时间，毫秒
+        :param rtt: 往返时间，毫秒
+        :param server_time: 交易所时间，毫秒
+        """
+        now = time.monotonic()
+        offset = local_time - server_time
+        previous = self.clock["time_diff"] if self.offset is not None else None
+        self.requests += 1
+
+        step = (
+            self.offset is not None
+            and abs(offset - self.offset) > self.error + rtt / 2 + self.RESOLUTION
+        )
+        if step:
+            self.samples.clear()
+            self.bound = self.previous_bound = math.inf
+        elif self.conflict:
+            # 新样本确认 REST 估计无误，矛盾来自事件时间戳
+            self.conflicts += 1
+            self.use_events = self.conflicts < self.MAX_CONFLICTS
+            self.bound = math.inf
+        self.samples.append((rtt, offset, now))
+        self.previous_bound, self.bound = self.bound, math.inf
+        self.conflict = False
+        self.resync.clear()
+        self.anchor = (time.time() - time.monotonic()) * 1e3
+
+        distances = sorted(
+            (r / 2 + self.RESOLUTION + (now - at) * self.MAX_DRIFT, o)
+            for r, o, at in self.samples
+        )
+        best = distances[: max(len(distances) // 2, 1)]
+        weights = [1 / distance**2 for distance, _ in best]
+        self.offset = sum(w * o for w, (_, o) in zip(weights, best)) / sum(weights)
+        self.error = best[0][0]
+        self.clock["latency"] = min(r for r, _, _ in self.samples) / 2
+        self.update()
+
+        if step or len(self.samples) < self.min_samples:
+            self.interval = self.min_interval
+        elif abs(self.clock["time_diff"] - previous) <= max(
+            self.TOLERANCE, self.clock["error"] / 2
+        ):
+            self.interval = min(self.interval * 2, self.max_interval)
+        else:
+            self.interval = max(self.interval / 2, self.min_interval)
+
+    def observe(self, timestamp):
+        """记录一条 websocket 消息的事件时间戳（毫秒），在 watch 循环中调用"""
+        now = time.time() * 1e3
+        if (
+            self.anchor is not None
+            and abs(now - time.monotonic() * 1e3 - self.anchor) > self.error
+            and not self.resync.is_set()
+        ):
+            # 本地时钟跳变，不等到下次对时
+            self.interval = self.min_interval
+            self.resync.set()
+        if timestamp and self.use_events:
+            bound = now - timestamp
+            if bound < self.bound:
+                self.bound = bound
+                if bound < self.previous_bound:
+                    self.update()
+
+    def update(self):
+        if self.offset is None:
+            return
+        low, high = self.offset - self.error, self.offset + self.error
+        bound = min(self.bound, self.previous_bound)
+        if bound < low:
+            if self.use_events and not self.conflict:
+                # 与 REST 估计矛盾，暂不采用，提前对时复核
+                self.conflict = True
+                self.interval = self.min_interval
+                self.resync.set()
+        elif bound < high:
+            high = bound
+        # REST 估计超出上界时截到上界，误差取可行区间的半宽
+        self.clock["time_diff"] = min(self.offset, high)
+        self.clock["error"] = (high - low) / 2
+
+    async def wait(self):
+        """等待到下次对时，发现时钟跳变或事件时间戳矛盾时提前返回"""
+        try:
+            await asyncio.wait_for(self.resync.wait(), self.interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+class SharedExchange:
+    """注册表中的一个交易所客户端及其在各 monitor 之间共享的状态"""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        # 使用方（id(owner)，未指明时为 None）-> 获取次数，
+        # 同一个 monitor 的两侧是同一交易所时只算一个使用方
+        self.owners = Counter()
+        # 已加载的市场类型 -> 是否命中缓存，"*" 表示已从交易所下载全部市场
+        self.market_types = {}
+        self.markets_lock = asyncio.Lock()
+        self.clock_estimator = ClockEstimator()
+        self.clock = self.clock_estimator.clock
+        self.clock_lock = asyncio.Lock()
+        self.synced_at = None
+        # 订阅类型（orderbook/ticker） -> symbol -> 订阅方数量
+        self.subscriptions = defaultdict(Counter)
+
+
+class ExchangeRegistry:
+    """
+    进程内共享的交易所连接表
+
+    同名交易所只创建一个 ccxt.pro 客户端，按使用方计数，在最后一个使用方释放时关闭。
+    各 monitor 共用同一个 websocket 连接：ccxt 按消息哈希合并相同的订阅，
+    同一份盘口或行情会同时唤醒所有等待它的 watch 循环。市场数据和时钟偏差也只各维护一份。
+    """
+
+    def __init__(self):
+        self.shared = {}
+        self.clients = {}
+
+    def acquire(self, name, owner=None):
+        """
+        :param owner: 使用方，同一使用方多次获取同一交易所只算一个引用；
+                      为 None 时每次获取都视为不同的使用方
+        """
+        shared = self.shared.get(name)
+        if shared is None:
+            shared = self.register(name, getattr(ccxtpro, name)(params))
+        shared.owners[None if owner is None else id(owner)] += 1
+        return shared.client
+
+    def register(self, name, client):
+        """登记外部创建的客户端（例如基准测试中的模拟交易所），之后 acquire(name) 返回该客户端"""
+        shared = SharedExchange(name, client)
+        self.shared[name] = shared
+        self.clients[id(client)] = shared
+        return shared
+
+    def get(self, exchange):
+        """返回客户端对应的共享状态，未经注册表创建的客户端单独维护一份"""
+        shared = self.clients.get(id(exchange))
+        if shared is None:
+            shared = SharedExchange(exchange.id, exchange)
+            self.clients[id(exchange)] = shared
+        return shared
+
+    def refs(self, exchange):
+        """使用方数量"""
+        owners = self.get(exchange).owners
+        return len(owners) - (None in owners) + owners[None]
+
+    async def release(self, exchange, owner=None):
+        shared = self.get(exchange)
+        key = None if owner is None else id(owner)
+        shared.owners[key] -= 1
+        if shared.owners[key] <= 0:
+            del shared.owners[key]
+        if shared.owners:
+            return
+        self.clients.pop(id(exchange), None)
+        if self.shared.get(shared.name) is shared:
+            del self.shared[shared.name]
+        await exchange.close()
+
+    def subscribe(self, exchange, kind, symbols):
+        self.get(exchange).subscriptions[kind].update(symbols)
+
+    def exclusive(self, exchange, kind, symbols):
+        """symbols 中只有一个订阅方的 symbol，取消其订阅不会影响其他 monitor"""
+        subscriptions = self.get(exchange).subscriptions[kind]
+        return [symbol for symbol in symbols if subscriptions[symbol] <= 1]
+
+    def unsubscribe(self, exchange, kind, symbols):
+        """减少订阅计数，返回已没有任何订阅方、可以取消订阅的 symbol"""
+        subscriptions = self.get(exchange).subscriptions[kind]
+        removable = []
+        for symbol in symbols:
+            subscriptions[symbol] -= 1
+            if subscriptions[symbol] <= 0:
+                del subscriptions[symbol]
+                removable.append(symbol)
+        return removable
+
+
+exchange_registry = ExchangeRegistry()
+
+
+def create_exchange(name, owner=None):
+    """
+    从进程内注册表获取交易所客户端，同名交易所共享一个连接，用完需以同一 owner 调用 release_exchange
+    """
+    return exchange_registry.acquire(name, owner)
+
+
+async def release_exchange(exchange, owner=None):
+    await exchange_registry.release(exchange, owner)
+
+
+def exchange_clock(exchange):
+    """交易所共享的时钟偏差，sync_clock 原地更新，可以长期持有"""
+    return exchange_registry.get(exchange).clock
+
+
+def clock_estimator(exchange):
+    return exchange_registry.get(exchange).clock_estimator
+
+
+async def sync_clock(exchange, max_age=0):
+    """
+    与交易所对时，max_age 秒内已有其他使用方对过时则直接复用
+    :return: 共享的时钟偏差 {"latency", "time_diff", "error"}
+    """
+    shared = exchange_registry.get(exchange)
+    async with shared.clock_lock:
+        if (
+            shared.synced_at is not None
+            and time.monotonic() - shared.synced_at < max_age
+        ):
+            return shared.clock
+
+        # 往返时间用单调时钟测量，不受本地时钟调整影响
+        start_time = time.time() * 1000
+        start = time.perf_counter()
+        server_time = await exchange.fetch_time()
+        rtt = (time.perf_counter() - start) * 1000
+
+        shared.clock_estimator.add_sample(start_time + rtt / 2, rtt, server_time)
+        shared.synced_at = time.monotonic()
+    return shared.clock
+
+
+class MarketCache:
+    """
+    本地市场元数据缓存，按交易所和市场类型分文件保存，例如 okx.spot.json
+
+    缓存在 ttl 秒内有效，启动时直接从磁盘恢复市场列表，避免每次下载完整的市场数据。
+    """
+
+    def __init__(self, cache_dir=None, ttl=24 * 3600):
+        self.cache_dir = cache_dir or os.getenv(
+            "SEEKOPTRADER_CACHE_DIR",
+            os.path.join(os.path.expanduser("~"), ".cache", "seekoptrader", "markets"),
+        )
+        self.ttl = ttl
+
+    def path(self, exchange_name, type_):
+        return os.path.join(self.cache_dir, f"{exchange_name}.{type_}.json")
+
+    def read(self, exchange_name, type_):
+        path = self.path(exchange_name, type_)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, exchange_name, markets):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        markets_by_type = defaultdict(list)
+        for market in markets.values():
+            markets_by_type[market["type"]].append(market)
+
+        for type_, type_markets in markets_by_type.items():
+            # 先写临时文件再替换，避免并发读取到写了一半的缓存
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(type_markets, f)
+            os.replace(tmp_path, self.path(exchange_name, type_))
+
+
+market_cache = MarketCache()
+
+
+async def load_markets(exchange, type_, cache=None):
+    """
+    加载交易所市场，优先使用本地缓存
+    :param type_: 需要的市场类型，缓存命中时只恢复该类型的市场
+    :return: 是否命中缓存
+
+    共享同一客户端的使用方只加载一次，已加载的市场类型直接复用。
+    """
+    shared = exchange_registry.get(exchange)
+    async with shared.markets_lock:
+        if "*" in shared.market_types:
+            return shared.market_types["*"]
+        if type_ in shared.market_types:
+            return shared.market_types[type_]
+
+        if cache is not None:
+            markets = cache.read(exchange.id, type_)
+            if markets:
+                # 与其他使用方已加载的市场类型合并
+                loaded = list(exchange.markets.values()) if exchange.markets else []
+                exchange.set_markets(loaded + markets)
+                shared.market_types[type_] = True
+                return True
+
+        await exchange.load_markets(reload=bool(shared.market_types))
+        if cache is not None:
+            cache.write(exchange.id, exchange.markets)
+        shared.market_types["*"] = False
+        return False
+
+
+def index_markets(markets):
+    """按 (type, subtype, quote) 建立市场索引，值为 (base, quote) -> symbol 列表"""
+    index = defaultdict(lambda: defaultdict(list))
+    for m in markets.values():
+        for subtype in (None, "linear", "inverse"):
+            if subtype is None or m.get(subtype):
+                index[m["type"], subtype, m["quote"]][m["base"], m["quote"]].append(
+                    m["symbol"]
+                )
+    return index
+
+
+def format_startup(startup):
+    source = "本地缓存" if startup.get("warm") else "交易所下载"
+    message = f"市场数据加载完成（{source}），耗时 {startup['load_markets_ms']:.0f}ms"
+    if "first_row_ms" in startup:
+        message += f"，首行数据 {startup['first_row_ms']:.0f}ms"
+    return message
+
+
+async def refresh_markets(exchange, cache):
+    """后台重新下载市场数据并更新缓存"""
+    try:
+        await exchange.load_markets(reload=True)
+        cache.write(exchange.id, exchange.markets)
+        exchange_registry.get(exchange).market_types["*"] = False
+    except Exception:
+        print(f"Excpetion: {traceback.format_exc()}")
@@ -0,0 +1,101 @@
+import pytest
+
+from seekoptrader.utils import ClockEstimator
+
+
+def sample(estimator, offset, rtt, server_time=1.7e12):
+    """一次往返时间为 rtt、真实偏差为 offset 的对时"""
+    estimator.add_sample(server_time + offset, rtt, server_time)
+
+
+def test_estimate_prefers_short_round_trips():
+    estimator = ClockEstimator()
+    for rtt, error in ((80, 30), (10, 1), (60, -25), (12, -1)):
+        sample(estimator, 100 + error, rtt)
+
+    clock = estimator.clock
+    assert clock["time_diff"] == pytest.approx(100, abs=1.5)
+    assert clock["latency"] == 5
+    assert clock["error"] == pytest.approx(6, abs=0.1)
+
+
+def test_event_timestamps_bound_the_offset(monkeypatch):
+    monkeypatch.setattr("seekoptrader.utils.time.time", lambda: 1000.0)
+    estimator = ClockEstimator()
+    for _ in range(4):
+        sample(estimator, 100, 40)
+    assert estimator.clock["time_diff"] == pytest.approx(100)
+
+    # 接收时间 - 事件时间戳 = 偏差 + 单向延迟，给出偏差的上界 95
+    estimator.observe(1000.0 * 1e3 - 95)
+    assert estimator.clock["time_diff"] == 95
+    assert estimator.clock["error"] < 21
+    assert not estimator.conflict
+
+
+def test_interval_doubles_while_stable():
+    estimator = ClockEstimator(min_samples=4, min_interval=2, max_interval=30)
+    intervals = []
+    for _ in range(9):
+        sample(estimator, 100, 20)
+        intervals.append(estimator.interval)
+    assert intervals == [2, 2, 2, 4, 8, 16, 30, 30, 30]
+
+    # 往返时间更短的样本把估计拉开超过误差范围的一半（但不构成跳变）时减半
+    sample(estimator, 110, 2)
+    assert estimator.clock["time_diff"] == pytest.approx(109, abs=0.5)
+    assert estimator.interval == 15
+
+
+def test_clock_step_resets_window():
+    estimator = ClockEstimator(min_interval=2)
+    for _ in range(8):
+        sample(estimator, 100, 20)
+    assert estimator.interval > 2
+
+    # 与原估计的区间不相交：本地时钟跳变
+    sample(estimator, 600, 20)
+    assert len(estimator.samples) == 1
+    assert estimator.clock["time_diff"] == pytest.approx(600)
+    assert estimator.interval == 2
+
+
+def test_local_clock_step_triggers_resync(monkeypatch):
+    wall = {"now": 1000.0}
+    monkeypatch.setattr("seekoptrader.utils.time.time", lambda: wall["now"])
+    monkeypatch.setattr("seekoptrader.utils.time.monotonic", lambda: 50.0)
+    estimator = ClockEstimator(min_interval=2)
+    for _ in range(8):
+        sample(estimator, 100, 20)
+    estimator.observe(None)
+    assert not estimator.resync.is_set()
+
+    # 本地时间相对单调时钟跳了 250ms，不等到下次对时
+    wall["now"] += 0.25
+    estimator.observe(None)
+    assert estimator.resync.is_set()
+    assert estimator.interval == 2
+
+
+def test_conflicting_event_timestamps_are_dropped(monkeypatch):
+    monkeypatch.setattr("seekoptrader.utils.time.time", lambda: 1000.0)
+    now = 1000.0 * 1e3
+    estimator = ClockEstimator(min_interval=2)
+    for _ in range(8):
+        sample(estimator, 100, 40)
+
+    for conflicts in range(1, ClockEstimator.MAX_CONFLICTS + 1):
+        # 事件时间戳由本地时间填充：上界 0 远低于 REST 估计的下界
+        estimator.observe(now)
+        assert estimator.conflict and estimator.resync.is_set()
+        assert estimator.interval == 2
+        assert estimator.clock["time_diff"] == pytest.approx(100)
+        # 复核的 REST 样本与原估计一致，矛盾计入事件时间戳
+        sample(estimator, 100, 40)
+        assert estimator.conflicts == conflicts
+        assert not estimator.resync.is_set()
+
+    assert not estimator.use_events
+    estimator.observe(now)
+    assert not estimator.conflict
+    assert estimator.clock["time_diff"] == pytest.approx(100)
@@ -0,0 +1,47 @@
+import pytest
+
+from seekoptrader.arbitrage.spread.monitor.depth import DepthCache
+
+
+def vwap(levels, notional):
+    """逐档吃单到 notional 的成交均价，深度不够时为 0"""
+    remaining, amount = notional, 0.0
+    for price, size in levels:
+        take = min(size, remaining / price)
+        amount += take
+        remaining -= take * price
+        if remaining <= 1e-9:
+            return notional / amount
+    return 0
+
+
+def test_vwap_partial_last_level():
+    levels = [[100.0, 1.0], [101.0, 2.0], [102.0, 5.0]]
+    cache = DepthCache(250)
+    assert cache.update(levels) == pytest.approx(vwap(levels, 250))
+    # 只缓存到满足目标金额为止
+    assert len(cache.levels) == 2
+
+
+def test_updates_beyond_filled_levels_are_ignored():
+    levels = [[100.0, 1.0], [101.0, 2.0], [102.0, 5.0]]
+    cache = DepthCache(250)
+    first = cache.update(levels)
+    assert cache.update(levels[:2] + [[150.0, 9.0]]) == first
+
+    levels[0] = [100.0, 0.5]
+    assert cache.update(levels) == pytest.approx(vwap(levels, 250))
+
+
+def test_not_enough_depth():
+    cache = DepthCache(10000)
+    assert cache.update([[100.0, 1.0], [101.0, 2.0]]) == 0
+    assert not cache.filled
+    levels = [[100.0, 1.0], [101.0, 200.0]]
+    assert cache.update(levels) == pytest.approx(vwap(levels, 10000))
+
+
+@pytest.mark.parametrize("notional", [0, -100, float("nan")])
+def test_notional_must_be_positive(notional):
+    with pytest.raises(ValueError):
+        DepthCache(notional)
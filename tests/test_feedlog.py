@@ -0,0 +1,133 @@
+import math
+import time
+import asyncio
+
+from seekoptrader.arbitrage.feedlog import (
+    ORDER_BOOK,
+    TICKER,
+    FeedLog,
+    FeedRecorder,
+    replay_feed,
+)
+
+
+class FakeExchange:
+    id = "fake"
+
+
+MARKETS = [
+    {"symbol": "BTC/USDT", "base": "BTC", "quote": "USDT"},
+    {"symbol": "ETH/USDT", "base": "ETH", "quote": "USDT"},
+]
+
+
+def order_book(symbol, price, timestamp=1700000000000.0):
+    return {
+        "symbol": symbol,
+        "timestamp": timestamp,
+        "bids": [[price - 1, 1.5], [price - 2, 2.0]],
+        "asks": [[price + 1, 0.5]],
+    }
+
+
+def record(path, messages, markets=True):
+    recorder = FeedRecorder(str(path))
+    if markets:
+        recorder.markets(FakeExchange(), MARKETS)
+    for kind, message in messages:
+        if kind == ORDER_BOOK:
+            recorder.order_book(message, source=1, time_diff=12.5)
+        else:
+            recorder.ticker(message["symbol"], message, time_diff=-3.0)
+    recorder.close()
+
+
+def read(path):
+    with FeedLog(str(path)) as log:
+        return list(log)
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "feed.log"
+    ticker = {
+        "symbol": "ETH/USDT",
+        "timestamp": 1700000000500.0,
+        "last": None,
+        "bid": 1999.5,
+        "ask": 2000.5,
+    }
+    record(path, [(ORDER_BOOK, order_book("BTC/USDT", 100.0)), (TICKER, ticker)])
+
+    (kind, source, received, time_diff, book), (kind2, _, _, diff2, quote) = read(path)
+    assert (kind, source, time_diff) == (ORDER_BOOK, 1, 12.5)
+    assert book == order_book("BTC/USDT", 100.0)
+    assert abs(received - time.time() * 1e3) < 60000
+    assert (kind2, diff2) == (TICKER, -3.0)
+    assert quote == ticker
+
+    with FeedLog(str(path)) as log:
+        assert log.markets() == {"fake": MARKETS}
+
+
+def test_truncated_tail_is_dropped(tmp_path):
+    path = tmp_path / "feed.log"
+    record(path, [(ORDER_BOOK, order_book("BTC/USDT", price)) for price in (1, 2, 3)])
+    # 录制被中断：最后一条记录只写了一半
+    size = path.stat().st_size
+    with open(path, "r+b") as f:
+        f.truncate(size - 10)
+
+    messages = read(path)
+    assert [message["bids"][0][0] for *_, message in messages] == [0, 1]
+
+
+def test_recorder_appends_to_existing_log(tmp_path):
+    path = tmp_path / "feed.log"
+    record(path, [(ORDER_BOOK, order_book("BTC/USDT", 100.0))])
+    record(
+        path,
+        [
+            (ORDER_BOOK, order_book("ETH/USDT", 2000.0)),
+            (ORDER_BOOK, order_book("BTC/USDT", 101.0)),
+        ],
+        markets=False,
+    )
+
+    with FeedLog(str(path)) as log:
+        # 追加时沿用已有的编号，同一个 symbol 只登记一次
+        assert sorted(log.symbol_ids()) == [("BTC/USDT", 0), ("ETH/USDT", 1)]
+    messages = [message for *_, message in read(path)]
+    assert [(m["symbol"], m["asks"][0][0]) for m in messages] == [
+        ("BTC/USDT", 101.0),
+        ("ETH/USDT", 2001.0),
+        ("BTC/USDT", 102.0),
+    ]
+
+
+class ReplayMonitor:
+    def __init__(self):
+        self.messages = []
+
+    def replay_message(self, kind, source, message, time_diff):
+        self.messages.append((kind, source, message, time_diff))
+
+
+def test_replay_feed(tmp_path):
+    path = tmp_path / "feed.log"
+    books = [order_book("BTC/USDT", price, 1700000000000.0 + price) for price in (1, 2)]
+    record(path, [(ORDER_BOOK, book) for book in books])
+    with FeedLog(str(path)) as log:
+        delays = [received - message["timestamp"] for _, _, received, _, message in log]
+
+    monitor = ReplayMonitor()
+    count = asyncio.run(replay_feed(monitor, str(path), speed=0))
+    replayed_at = time.time() * 1e3
+
+    assert count == 2
+    for (kind, source, message, time_diff), book, delay in zip(
+        monitor.messages, books, delays
+    ):
+        assert (kind, source, time_diff) == (ORDER_BOOK, 1, 12.5)
+        assert message["bids"] == book["bids"] and message["asks"] == book["asks"]
+        # 时间戳平移到回放时刻，接收延迟与录制时一致
+        assert math.isclose(replayed_at - message["timestamp"], delay, abs_tol=1000)
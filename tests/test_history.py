@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from seekoptrader.arbitrage.history import (
+    MINUTE,
+    SECOND,
+    OpportunityHistory,
+    read_spill,
+)
+
+T0 = 1.7e12
+
+
+def test_duration_and_persistence():
+    history = OpportunityHistory(["a", "b"], threshold=0.001, window=10)
+    history.record([0, 1], T0, [0.002, 0.0])
+    history.record([0, 1], T0 + 4000, [0.003, 0.0])
+
+    rows = [{}, {}]
+    history.annotate([0, 1], rows, T0 + 5000)
+    assert rows[0]["duration"] == 5000
+    assert rows[0]["persistence"] == pytest.approx(1.0)
+    assert rows[1] == {"duration": 0.0, "persistence": 0.0}
+
+    # 机会消失后占比按时间衰减
+    history.record([0], T0 + 10000, [0.0])
+    assert history.duration(0, T0 + 20000) == 0
+    assert 0 < history.persistence_at(0, T0 + 20000) < 1
+
+
+def test_annotate_matches_scalar_reads():
+    rng = np.random.default_rng(1)
+    history = OpportunityHistory([str(i) for i in range(20)], threshold=0.0)
+    now = T0
+    for _ in range(200):
+        now += rng.uniform(1, 500)
+        slots = rng.choice(20, 5, replace=False)
+        history.record(slots, now, rng.normal(0, 1, 5))
+
+    slots = list(range(20))
+    rows = [{} for _ in slots]
+    history.annotate(slots, rows, now + 100)
+    for slot, row in zip(slots, rows):
+        assert row["duration"] == pytest.approx(history.duration(slot, now + 100))
+        assert row["persistence"] == pytest.approx(
+            history.persistence_at(slot, now + 100)
+        )
+
+
+def test_staged_samples_match_record():
+    samples = [(0, T0, 0.5), (0, T0 + 10, -0.5), (1, T0 + 5, 0.1), (0, T0 + 20, 0.2)]
+    staged = OpportunityHistory(["a", "b"], threshold=0.0)
+    recorded = OpportunityHistory(["a", "b"], threshold=0.0)
+    for slot, now, spread in samples:
+        staged.add(slot, now, spread)
+        recorded.record([slot], now, [spread])
+
+    staged.flush()
+    for slot in (0, 1):
+        for name, column in recorded.series(slot).items():
+            np.testing.assert_array_equal(staged.series(slot)[name], column)
+
+
+def test_sparse_feed_above_time():
+    """两次采样之间整段没有采样的桶也计入高于阈值的时长"""
+    history = OpportunityHistory(["a"], threshold=0.0)
+    history.record([0], T0 + 59500, [1.0])
+    history.record([0], T0 + 185300, [-1.0])
+    history.record([0], T0 + 400000, [-1.0])
+
+    held = 185300 - 59500
+    for resolution in (SECOND, MINUTE):
+        series = history.series(0, resolution)
+        assert series["above"].sum() == pytest.approx(held)
+        gap = series["count"] == 0
+        assert gap.sum() == 1 and np.isnan(series["max"][gap]).all()
+
+
+def test_spill_round_trip(tmp_path):
+    history = OpportunityHistory(
+        ["a", "b"], threshold=0.0, capacity=4, spill_dir=str(tmp_path)
+    )
+    for i in range(10):
+        history.record([0, 1], T0 + i * 100, [i, -i])
+    history.close()
+
+    spilled = {}
+    for path in sorted(tmp_path.glob("*.hist")):
+        for resolution, slot, columns in read_spill(str(path)):
+            spilled.setdefault((resolution, slot), []).append(columns["spread"])
+    for slot, sign in ((0, 1), (1, -1)):
+        spreads = np.concatenate(spilled[0, slot])
+        np.testing.assert_array_equal(spreads, sign * np.arange(10.0))
+    names = next(tmp_path.glob("*.names.json"))
+    assert json.loads(names.read_text()) == ["a", "b"]
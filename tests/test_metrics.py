@@ -0,0 +1,59 @@
+import random
+
+from seekoptrader.arbitrage.subscription import Shard
+from seekoptrader.metrics import SUB_BUCKETS, Histogram, Metrics
+
+
+def bucket(value):
+    histogram = Histogram()
+    histogram.record(value)
+    return histogram.counts.index(1)
+
+
+def test_bucket_bounds():
+    for value in [0, 1, 7, 8, 9, 15, 16, 1000, 123456789] + list(range(1, 300)):
+        index = bucket(value)
+        assert value <= Histogram.upper_bound(index)
+        if index:
+            assert value > Histogram.upper_bound(index - 1)
+
+
+def test_percentile_relative_error():
+    rng = random.Random(3)
+    values = [int(rng.lognormvariate(10, 2)) for _ in range(10000)]
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+
+    values.sort()
+    assert histogram.count == len(values)
+    assert histogram.total == sum(values)
+    assert histogram.max == values[-1]
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        assert exact <= histogram.percentile(q) <= exact * (1 + 1 / SUB_BUCKETS) + 1
+    assert histogram.percentile(1) == values[-1]
+    assert Histogram().percentile(0.5) == 0
+
+
+def test_errors_are_counted_per_batch():
+    metrics = Metrics()
+    shards = [Shard(["BTC/USDT"]), Shard(["ETH/USDT"])]
+    for shard in shards:
+        metrics.feed("okx", "orderbook", shard)
+    metrics.error("okx", "orderbook", shards[0])
+    metrics.error("okx", "orderbook", shards[0])
+
+    assert [stats.errors for stats in metrics.feeds.values()] == [2, 0]
+    errors = [
+        line
+        for line in metrics.render().splitlines()
+        if line.startswith("seekoptrader_watch_errors_total{")
+    ]
+    assert errors == [
+        f'seekoptrader_watch_errors_total{{exchange="okx",feed="orderbook",batch="{shard.id}"}} {count}'
+        for shard, count in zip(shards, (2, 0))
+    ]
+
+    metrics.drop("okx", "orderbook", shards[0])
+    assert [stats.batch for stats in metrics.feeds.values()] == [shards[1].id]
@@ -0,0 +1,26 @@
+from seekoptrader.arbitrage.ranking import RankIndex
+
+
+def test_top_follows_updates():
+    ranking = RankIndex()
+    for key, score in (("a", 1.0), ("b", 3.0), ("c", 2.0)):
+        ranking.update(key, score)
+    assert ranking.top(2) == ["b", "c"]
+
+    ranking.update("a", 5.0)
+    ranking.update("b", 3.0)
+    assert ranking.top(3) == ["a", "b", "c"]
+    assert len(ranking) == 3 and "a" in ranking
+
+
+def test_remove_and_ties():
+    ranking = RankIndex()
+    for key in ("y", "x", "z"):
+        ranking.update(key, 1.0)
+    # 同分按 key 排序
+    assert ranking.top(10) == ["x", "y", "z"]
+
+    ranking.remove("y")
+    ranking.remove("missing")
+    assert ranking.top(10) == ["x", "z"]
+    assert "y" not in ranking
@@ -0,0 +1,31 @@
+from seekoptrader.stream import diff_rows
+
+
+def test_diff_rows():
+    rows = [{"name": "a", "rate": 2.0}, {"name": "b", "rate": 1.0}]
+    events, previous = diff_rows({}, rows, "name")
+    assert [(e["type"], e["key"], e["rank"]) for e in events] == [
+        ("change", "a", 0),
+        ("change", "b", 1),
+    ]
+
+    events, previous = diff_rows(previous, rows, "name")
+    assert events == []
+
+    # monitor 原地修改返回的行，上一次的结果不受影响
+    rows[1]["rate"] = 3.0
+    rows.reverse()
+    rows.append({"name": "c", "rate": 0.5})
+    events, previous = diff_rows(previous, rows, "name")
+    assert [(e["type"], e["key"], e["rank"]) for e in events] == [
+        ("change", "b", 0),
+        ("change", "a", 1),
+        ("change", "c", 2),
+    ]
+
+    events, previous = diff_rows(previous, rows[:1], "name")
+    assert sorted((e["type"], e["key"]) for e in events) == [
+        ("remove", "a"),
+        ("remove", "c"),
+    ]
+    assert list(previous) == ["b"]
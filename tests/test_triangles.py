@@ -0,0 +1,57 @@
+import random
+import asyncio
+import itertools
+
+import pytest
+
+from seekoptrader.arbitrage.triangle.monitor import Monitor
+
+
+@pytest.fixture
+def monitor():
+    # 只构造客户端，不访问交易所
+    monitor = Monitor("okx", use_market_cache=False)
+    yield monitor
+    asyncio.run(monitor.stop())
+
+
+def markets(*symbols):
+    return [
+        {"symbol": symbol, "base": symbol.split("/")[0], "quote": symbol.split("/")[1]}
+        for symbol in symbols
+    ]
+
+
+def test_find_triangles(monitor):
+    triangles = monitor.find_triangles(
+        markets(
+            "BTC/USDT",
+            "ETH/BTC",
+            "ETH/USDT",
+            # 两个稳定币、法币的组合不计入
+            "USDC/USDT",
+            "ETH/USDC",
+            "BTC/EUR",
+            "ETH/EUR",
+        )
+    )
+    assert triangles == {"USDT-BTC-ETH": ("BTC/USDT", "ETH/BTC", "ETH/USDT")}
+
+
+def test_find_triangles_matches_brute_force(monitor):
+    rng = random.Random(7)
+    currencies = ["USDT", "USDC", "EUR", "BTC", "ETH", "SOL", "XRP", "DOGE"]
+    pairs = [
+        (base, quote)
+        for base, quote in itertools.permutations(currencies, 2)
+        if rng.random() < 0.4
+    ]
+    symbols = {pair: f"{pair[0]}/{pair[1]}" for pair in pairs}
+
+    expected = {}
+    for a, b, c in itertools.permutations(currencies, 3):
+        legs = (b, a), (c, b), (c, a)
+        if all(leg in symbols for leg in legs) and monitor.valid_currencies((a, b, c)):
+            expected[f"{a}-{b}-{c}"] = tuple(symbols[leg] for leg in legs)
+
+    assert monitor.find_triangles(markets(*symbols.values())) == expected